@@ -1,8 +1,10 @@
 
 import streamlit as st
-import pandas as pd
-import json
 import os
+import daily_stats
+import results_db
+import shared_state
+import storage
 
 st.set_page_config(page_title="学習履歴（管理者ビュー）", layout="wide")
 
@@ -10,45 +12,70 @@ st.title("👩‍🏫 学習者ごとの正答履歴")
 
 USER_HISTORY_DIR = "user_history"
 
-# 履歴ファイル一覧を取得
-if not os.path.exists(USER_HISTORY_DIR):
+# 保存先ごとの集計を読むための設定
+SOURCES = {
+    "JSON履歴（user_history）": f"jsonl:{USER_HISTORY_DIR}",
+    f"SQLite（{results_db.DB_PATH}）": f"sqlite:{results_db.DB_PATH}",
+}
+
+@st.cache_resource
+def get_storage(url):
+    # 集計はプロセス内で使い回し、JSON履歴は変わったファイルだけ読み直す
+    if url.startswith("jsonl:"):
+        return storage.open_storage(url, workers=os.cpu_count() or 1)
+    return storage.open_storage(url)
+
+@st.cache_resource
+def get_watcher(path):
+    return shared_state.VersionWatcher(path)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_all_stats(url, version):
+    # SQLite はどのレプリカで解答が書かれても "results" の番号が上がるので、そのときだけ集計し直す
+    return get_storage(url).all_stats()
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_trend(url, version, by, name, start, end, period):
+    # 日ごとの集計テーブルだけを読む。解答が書かれて "results" の番号が上がったときだけ読み直す
+    return daily_stats.trend(get_storage(url).writer, by, name, start, end, period)
+
+TREND_BY = {
+    "ユーザー": "user",
+    "単語": "word",
+}
+TREND_PERIODS = {
+    "日ごと": "day",
+    "週ごと": "week",
+}
+
+source = st.selectbox("データの保存先", list(SOURCES))
+
+if SOURCES[source].startswith("jsonl:") and not os.path.exists(USER_HISTORY_DIR):
     st.warning("履歴フォルダが存在しません。")
     st.stop()
 
-files = [f for f in os.listdir(USER_HISTORY_DIR) if f.endswith("_history.json")]
+url = SOURCES[source]
+if url.startswith("sqlite:"):
+    stats = load_all_stats(url, get_watcher(url.partition(":")[2]).version("results"))
+else:
+    # JSON履歴は get_storage の集計が変わったファイルだけ読み直す
+    stats = get_storage(url).all_stats()
+
+summary = stats.rename(columns={
+    "correct_count": "corrects",
+    "total_count": "attempts"
+})[["user", "word", "attempts", "corrects"]]
 
-if not files:
+if summary.empty:
     st.info("まだ履歴データがありません。")
     st.stop()
 
-data = []
-
-# ファイルごとに読み込む
-for file in files:
-    username = file.replace("_history.json", "")
-    with open(os.path.join(USER_HISTORY_DIR, file), "r", encoding="utf-8") as f:
-        records = json.load(f)
-        for r in records:
-            data.append({
-                "user": username,
-                "word": r["word"],
-                "correct": r["correct"]
-            })
-
-df = pd.DataFrame(data)
-
-st.write(f"📦 合計記録数: {len(df)} 件")
-
-# 集計表示
-summary = df.groupby(["user", "word"]).agg(
-    attempts=("correct", "count"),
-    corrects=("correct", "sum")
-).reset_index()
+st.write(f"📦 合計記録数: {summary['attempts'].sum()} 件")
 
 summary["accuracy (%)"] = (summary["corrects"] / summary["attempts"] * 100).round(1)
 
 # 表示設定
-selected_user = st.selectbox("ユーザーを選択", options=["すべて"] + sorted(df["user"].unique().tolist()))
+selected_user = st.selectbox("ユーザーを選択", options=["すべて"] + sorted(summary["user"].unique().tolist()))
 
 if selected_user != "すべて":
     filtered = summary[summary["user"] == selected_user]
@@ -57,11 +84,41 @@ else:
 
 st.dataframe(filtered.sort_values(by=["user", "accuracy (%)"]))
 
-# オプション: CSVダウンロード
-csv = filtered.to_csv(index=False, encoding="utf-8-sig")
-st.download_button(
-    label="📥 CSVとしてダウンロード",
-    data=csv,
-    file_name="user_accuracy_report.csv",
-    mime="text/csv"
-)
+# オプション: CSVダウンロード（再実行のたびに作らないよう、チェックしたときだけ作る）
+# 解答結果そのものの保管は results_archive.py（Parquet）で行う
+if st.checkbox("CSVを作成する"):
+    csv = filtered.to_csv(index=False, encoding="utf-8-sig")
+    st.download_button(
+        label="📥 CSVとしてダウンロード",
+        data=csv,
+        file_name="user_accuracy_report.csv",
+        mime="text/csv"
+    )
+
+# 正答率の推移（SQLite のみ。日ごとの集計テーブルから読む）
+if url.startswith("sqlite:"):
+    st.subheader("📈 正答率の推移")
+    col1, col2, col3 = st.columns(3)
+    by = TREND_BY[col1.radio("集計の対象", list(TREND_BY), horizontal=True)]
+    period = TREND_PERIODS[col2.radio("集計の単位", list(TREND_PERIODS), horizontal=True)]
+    dates = col3.date_input("期間", value=daily_stats.default_range())
+    # 期間を消したときは初期の8週間、終わりの日を選んでいる途中は1日だけを表示する
+    if not dates:
+        dates = daily_stats.default_range()
+    start, end = dates if len(dates) == 2 else (dates[0], dates[0])
+    if by == "user":
+        name = None if selected_user == "すべて" else selected_user
+    else:
+        words = sorted(filtered["word"].unique().tolist())
+        name = st.selectbox("単語を選択", options=["すべて"] + words)
+        name = None if name == "すべて" else name
+    version = get_watcher(url.partition(":")[2]).version("results")
+    trend = load_trend(url, version, by, name, start, end, period)
+    if trend.empty:
+        st.info("この期間の解答はありません。")
+    elif name is None:
+        # 全員（全単語）分を合計した正答率
+        total = trend.groupby("period")[["correct_count", "total_count"]].sum()
+        st.line_chart(total["correct_count"] / total["total_count"])
+    else:
+        st.line_chart(trend.set_index("period")["accuracy"])
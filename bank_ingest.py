@@ -0,0 +1,145 @@
+import os
+import unicodedata
+
+import pandas as pd
+
+# 問題 CSV の取り込み（コンパイル前に1回だけ行う検証・正規化・重複除去）
+#   英語の列は NFKC（ﬁ などの合字や全角英数字を直す）、日本語の列は NFC で正規化し、前後の空白を取り除く
+#   "\n" と書かれた改行（2文字）は本当の改行にそろえる
+#   選択肢は | で分けて空白を取り除き、空の選択肢と重複を除く
+#   正解の位置（answer_index）と和訳の有無（has_translation）をここで決めておき、画面側では行ごとの確認をしない
+# 取り込めなかった行は理由つきで一覧にする（question_bank.compile_bank が <CSV名>.rejects.csv に書き出す）
+
+ENGLISH_COLUMNS = ["word", "answer", "sentence_with_blank"]
+JAPANESE_COLUMNS = ["meaning_jp", "sentence_jp"]
+OPTIONAL_COLUMNS = ["level", "tag"]  # 出題の絞り込みに使う（無ければ None）
+REQUIRED_COLUMNS = ["answer", "choices", "sentence_with_blank"]
+BLANK = "__"
+MAX_CHOICES = 0x7F  # 解答は選択肢の番号を7ビットで記録する（question_bank.encode_answer）
+REJECT_COLUMNS = ["row", "id", "word", "reason"]
+
+
+def default_report_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".rejects.csv"
+
+
+def read_csv(csv_path):
+    # "NA" などの単語が欠損値にならないよう、すべて文字列のまま読む
+    df = pd.read_csv(csv_path, encoding="utf-8-sig", dtype=str, keep_default_na=False)
+    df.columns = [column.strip().lstrip("﻿") for column in df.columns]
+    return df
+
+
+def normalize_text(value, form="NFC"):
+    if not isinstance(value, str):
+        return None
+    text = unicodedata.normalize(form, value).replace("\r\n", "\n").replace("\\n", "\n")
+    text = "\n".join(line.strip() for line in text.strip().split("\n"))
+    return text or None
+
+
+def split_choices(value):
+    if not isinstance(value, str):
+        return []
+    choices = (normalize_text(choice, "NFKC") for choice in value.split("|"))
+    return list(dict.fromkeys(choice for choice in choices if choice))
+
+
+def ingest(df):
+    # 戻り値: (取り込めた行の DataFrame, 取り込めなかった行の DataFrame)
+    # 必須の列そのものが無いときは、行ごとに除外せず ValueError にする（CSV の見出しの誤り）
+    missing = [column for column in REQUIRED_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"必須の列がありません: {', '.join(missing)}")
+    rows = []
+    rejects = []
+    seen_ids = set()
+    seen_questions = set()
+    records = df.to_dict(orient="records")
+    for number, record in enumerate(records, start=1):
+        row = dict(record)
+        for column in ENGLISH_COLUMNS:
+            row[column] = normalize_text(record.get(column), "NFKC")
+        for column in JAPANESE_COLUMNS:
+            row[column] = normalize_text(record.get(column))
+        for column in OPTIONAL_COLUMNS:
+            row[column] = normalize_text(record.get(column), "NFKC")
+        choices = split_choices(record.get("choices"))
+        row["choices"] = "|".join(choices) or None
+        if row["word"] is None:
+            row["word"] = row["answer"]
+
+        qid = record.get("id", number)
+        try:
+            qid = int(qid)
+        except (TypeError, ValueError):
+            qid = None
+        row["id"] = qid
+
+        missing = [column for column in REQUIRED_COLUMNS if row[column] is None]
+        if qid is None:
+            reason = "id が整数ではない"
+        elif missing:
+            reason = f"必須の列が空: {', '.join(missing)}"
+        elif len(choices) < 2:
+            reason = "選択肢が2つ未満"
+        elif len(choices) > MAX_CHOICES:
+            reason = f"選択肢が {MAX_CHOICES} を超える"
+        elif row["answer"] not in choices:
+            reason = "正解が選択肢にない"
+        elif BLANK not in row["sentence_with_blank"]:
+            reason = "問題文に空欄（________）がない"
+        elif qid in seen_ids:
+            reason = "id が重複"
+        elif (row["answer"], row["sentence_with_blank"]) in seen_questions:
+            reason = "同じ問題が重複"
+        else:
+            reason = None
+        if reason is not None:
+            rejects.append((number, record.get("id"), record.get("word"), reason))
+            continue
+
+        seen_ids.add(qid)
+        seen_questions.add((row["answer"], row["sentence_with_blank"]))
+        row["answer_index"] = choices.index(row["answer"])
+        row["has_translation"] = row["sentence_jp"] is not None
+        rows.append(row)
+
+    clean = pd.DataFrame(rows, columns=list(dict.fromkeys(
+        ["id"] + ENGLISH_COLUMNS + ["choices"] + JAPANESE_COLUMNS + OPTIONAL_COLUMNS
+        + ["answer_index", "has_translation"] + list(df.columns)
+    )))
+    clean = clean.astype({"id": "int64", "answer_index": "int8", "has_translation": "bool"})
+    return clean, pd.DataFrame(rejects, columns=REJECT_COLUMNS)
+
+
+def write_report(rejects, report_path):
+    # 除外した行が無ければ古い一覧を消す
+    if rejects.empty:
+        if os.path.exists(report_path):
+            os.remove(report_path)
+        return None
+    rejects.to_csv(report_path, index=False, encoding="utf-8-sig")
+    return report_path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="問題 CSV の検証（取り込めない行と理由を表示する）")
+    parser.add_argument("csv", nargs="*", default=["words.csv"])
+    args = parser.parse_args()
+
+    failed = False
+    for path in args.csv:
+        try:
+            clean, rejects = ingest(read_csv(path))
+        except ValueError as e:
+            print(f"{path}: {e}")
+            failed = True
+            continue
+        print(f"{path}: {len(clean)} 行を取り込み、{len(rejects)} 行を除外")
+        for row in rejects.itertuples(index=False):
+            print(f"  {row.row} 行目 (id={row.id}, word={row.word}): {row.reason}")
+        failed = failed or not rejects.empty
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import question_bank
+import quiz_generator
+import shared_state
+
+# 問題バンクの版の管理
+#   words.csv の (inode, 更新時刻, サイズ) を数秒おきに確認し、変わっていれば新しい版を作って差し替える
+#   版は CSV の SHA-256 で表すので、同じ内容ならどのレプリカでも同じ番号になる（下流のキャッシュのキーに使う）
+#   表示用の選択肢・HTML は出題されたときに作り、前の版と中身が同じ行は作り直さずに使い回す
+#   版は作った後は変更しないので、解いている途中のクイズは作ったときの版を使い続けられる
+
+CHECK_INTERVAL = 2.0  # 秒
+KEEP_VERSIONS = 8  # 解いている途中のクイズのために残しておく古い版の数
+
+
+def version_of(bank):
+    source = bank.header.get("source") or {}
+    return (source.get("sha256") or question_bank.file_sha256(bank.path))[:16]
+
+
+class BankVersion:
+    def __init__(self, bank, previous=None):
+        self.version = version_of(bank)
+        self.bank = bank
+        self.frame = bank.to_frame()
+        self.store = question_bank.QuestionStore(bank)
+        self.index = quiz_generator.QuizIndex.from_frame(self.frame)
+        if previous is None:
+            self.changed = self.store.ids
+            self.rendered = question_bank.RenderedQuestions(self.store)
+        else:
+            self.changed = changed_ids(previous.frame, self.frame)
+            changed = set(self.changed)
+            self.rendered = question_bank.RenderedQuestions(self.store, {
+                qid: rendered for qid, rendered in previous.rendered.rendered.items()
+                if qid not in changed and qid in self.store
+            })
+
+
+def check_bank(bank, csv_path):
+    # 1問も無い版は公開しない（必須の列の名前を変えた CSV から作られた古い .bank など）
+    if not len(bank.ids):
+        raise ValueError(f"{csv_path} から取り込める問題がありません（{bank.header.get('rejects', 0)} 行を除外）")
+
+
+def changed_ids(old_frame, new_frame):
+    # 追加された行と中身が変わった行の問題ID
+    old_rows = dict(zip(old_frame["id"].tolist(), old_frame.itertuples(index=False, name=None)))
+    return [row[0] for row in new_frame.itertuples(index=False, name=None) if old_rows.get(row[0]) != row]
+
+
+class BankManager:
+    def __init__(self, csv_path="words.csv", bank_path=None, check_interval=CHECK_INTERVAL, keep=KEEP_VERSIONS):
+        self.csv_path = csv_path
+        self.bank_path = bank_path or question_bank.default_bank_path(csv_path)
+        self.check_interval = check_interval
+        self.keep = keep
+        self.lock = threading.Lock()
+        self.versions = OrderedDict()
+        self.error = None
+        self.file_version = shared_state.file_version(csv_path)
+        try:
+            bank = question_bank.load_bank(csv_path, self.bank_path)
+        except ValueError as e:
+            # CSV から1問も取り込めないときは、前にコンパイルした .bank があればそれで起動する
+            if not os.path.exists(self.bank_path):
+                raise
+            self.error = e
+            bank = question_bank.Bank(self.bank_path)
+        check_bank(bank, csv_path)
+        self._publish(BankVersion(bank))
+        self.checked_at = time.monotonic()
+
+    @property
+    def version(self):
+        return self.latest.version
+
+    def _publish(self, bank_version):
+        self.versions[bank_version.version] = bank_version
+        self.versions.move_to_end(bank_version.version)
+        while len(self.versions) > self.keep:
+            self.versions.popitem(last=False)
+        # 参照の差し替えは1回の代入なので、読む側はロックなしで古い版か新しい版のどちらかを得る
+        self.latest = bank_version
+
+    def current(self):
+        if time.monotonic() - self.checked_at >= self.check_interval:
+            self.refresh()
+        return self.latest
+
+    def get(self, version=None):
+        # version は BankVersion.version。残っていない（または指定なし）なら最新の版
+        return self.versions.get(version) or self.current()
+
+    def refresh(self):
+        # ほかのセッションが読み込み中なら待たずに今の版を使う（同時に何度も読み込まない）
+        if not self.lock.acquire(blocking=False):
+            return False
+        try:
+            self.checked_at = time.monotonic()
+            file_version = shared_state.file_version(self.csv_path)
+            if file_version is None or file_version == self.file_version:
+                return False
+            self.file_version = file_version
+            try:
+                # ほかのレプリカが先にコンパイルしていれば、その .bank を開くだけで済む
+                if question_bank.is_stale(self.csv_path, self.bank_path):
+                    question_bank.compile_bank(self.csv_path, self.bank_path)
+                bank = question_bank.Bank(self.bank_path)
+                check_bank(bank, self.csv_path)
+            except (OSError, ValueError, KeyError) as e:
+                # 書きかけの CSV や1問も取り込めない CSV は読み込まず、次にファイルが変わるまで今の版を使い続ける
+                self.error = e
+                return False
+            self.error = None
+            if version_of(bank) == self.latest.version:
+                # 更新時刻が変わっただけで中身は同じ
+                return False
+            self._publish(BankVersion(bank, self.latest))
+            return True
+        finally:
+            self.lock.release()
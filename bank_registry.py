@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+
+import bank_manager
+
+# 複数の問題バンク（英検の級ごと・先生が作った問題集ごとの CSV）をまとめて扱う
+#   EIKEN_BANK_DIR（既定 banks/）の *.csv を1つずつシャードとし、シャード名はファイル名（拡張子なし）
+#   一覧はディレクトリを見るだけで作り、各シャードは最初に選ばれたときに初めて読み込む（BankManager）
+#   選ばれていない級は読み込まないので、メモリも起動時間も使わない
+#   シャードの中の level / tag 列は QuizIndex のビットマップで絞り込める
+#   ディレクトリが無い（または CSV が1つも無い）ときは、従来どおり words.csv だけを扱う
+
+BANK_DIR = os.environ.get("EIKEN_BANK_DIR", "banks")
+DEFAULT_CSV = "words.csv"
+SCAN_INTERVAL = 10.0  # 秒（先生の問題集の追加に気付く間隔）
+LEVEL_LABELS = {
+    "eiken5": "英検5級",
+    "eiken4": "英検4級",
+    "eiken3": "英検3級",
+    "eiken_pre2": "英検準2級",
+    "eiken2": "英検2級",
+    "eiken_pre1": "英検準1級",
+    "eiken1": "英検1級",
+}
+
+
+def scan(directory, default_csv=DEFAULT_CSV):
+    # シャード名 → CSV のパス。英検の級を 5級 → 1級 の順に並べ、それ以外は名前順で後ろに置く
+    paths = {}
+    if os.path.isdir(directory):
+        for entry in os.scandir(directory):
+            if entry.is_file() and entry.name.endswith(".csv") and not entry.name.endswith(".rejects.csv"):
+                paths[entry.name[:-len(".csv")]] = entry.path
+    if not paths:
+        paths[os.path.splitext(os.path.basename(default_csv))[0]] = default_csv
+    order = list(LEVEL_LABELS)
+    return dict(sorted(paths.items(), key=lambda item: (
+        order.index(item[0]) if item[0] in order else len(order), item[0]
+    )))
+
+
+class BankRegistry:
+    def __init__(self, directory=BANK_DIR, default_csv=DEFAULT_CSV, scan_interval=SCAN_INTERVAL):
+        self.directory = directory
+        self.default_csv = default_csv
+        self.scan_interval = scan_interval
+        self.lock = threading.Lock()
+        self.managers = {}
+        self.paths = scan(directory, default_csv)
+        self.scanned_at = time.monotonic()
+
+    def names(self):
+        if time.monotonic() - self.scanned_at >= self.scan_interval:
+            self.scanned_at = time.monotonic()
+            self.paths = scan(self.directory, self.default_csv)
+        return list(self.paths)
+
+    def label(self, name):
+        return LEVEL_LABELS.get(name, name)
+
+    def loaded(self):
+        # 読み込み済みのシャード名
+        return list(self.managers)
+
+    def get(self, name=None):
+        # シャードの BankManager。name を省略すると一覧の先頭
+        # 一覧から消えたシャードも、読み込み済みなら解いている途中のクイズのために返す
+        name = name or self.names()[0]
+        manager = self.managers.get(name)
+        if manager is not None:
+            return manager
+        with self.lock:
+            if name not in self.managers:
+                self.managers[name] = bank_manager.BankManager(self.paths[name])
+            return self.managers[name]
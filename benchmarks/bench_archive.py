@@ -0,0 +1,105 @@
+# 解答結果の書き出し・読み戻しの比較
+#   書き出し: 全件を DataFrame にして CSV（admin_view と同じ to_csv） / チャンクごとに日付で分けた Parquet（results_archive）
+#   読み戻し: 1件ずつコミット / 1つのトランザクションで executemany（results_archive.import_results）
+# 1件ずつコミットは --baseline-rows 件だけ実測して件数倍する
+# 実行: python -m benchmarks.bench_archive --sizes 100000 1000000
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import pandas as pd
+
+import results_archive
+import results_db
+
+
+def make_results(path, total, users, words, seed):
+    rng = random.Random(seed)
+    now = int(time.time())
+    conn = results_db.connect(path)
+    results_db.init_db(conn)
+    user_ids, word_ids = {}, {}
+    with conn:
+        for start in range(0, total, 100_000):
+            rows = []
+            for i in range(start, min(total, start + 100_000)):
+                word = f"word{rng.randrange(words)}"
+                is_correct = rng.random() < 0.7
+                selected = word if is_correct else f"word{rng.randrange(words)}"
+                rows.append((f"user{rng.randrange(users)}", word, selected, word, is_correct,
+                             now - (total - i) * 30))
+            results_db.insert_answers(conn, rows, user_ids, word_ids)
+    conn.close()
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def export_csv(db_path, out_path):
+    conn = results_db.connect(db_path)
+    frame = pd.read_sql_query('''
+        SELECT r.id, u.name AS user, w.word, s.word AS selected, c.word AS correct, r.is_correct, r.answered_at
+        FROM results r
+        JOIN users u ON u.id = r.user_id
+        JOIN words w ON w.id = r.word_id
+        JOIN words s ON s.id = r.selected_id
+        JOIN words c ON c.id = r.correct_id
+        ORDER BY r.id
+    ''', conn)
+    conn.close()
+    frame.to_csv(out_path, index=False, encoding="utf-8-sig")
+    return frame
+
+
+def import_one_by_one(db_path, frame):
+    conn = results_db.connect(db_path)
+    results_db.init_db(conn)
+    user_ids, word_ids = {}, {}
+    for row in frame[results_archive.IMPORT_COLUMNS].itertuples(index=False):
+        with conn:
+            results_db.insert_answers(conn, [tuple(row)], user_ids, word_ids)
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--words", type=int, default=5000)
+    parser.add_argument("--baseline-rows", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'rows':>9} {'csv export (s)':>15} {'csv (MB)':>9} {'parquet export (s)':>19} {'parquet (MB)':>13} "
+          f"{'row commits (s)':>16} {'bulk import (s)':>16} {'import rows/s':>14}")
+    for total in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "quiz_results.db")
+            make_results(db_path, total, args.users, args.words, args.seed)
+
+            csv_path = os.path.join(tmp, "results.csv")
+            csv_time, frame = timed(lambda: export_csv(db_path, csv_path))
+            archive = os.path.join(tmp, "archive")
+            parquet_time, _ = timed(lambda: results_archive.export_results(db_path, archive))
+
+            sample = frame.head(args.baseline_rows)
+            baseline, _ = timed(lambda: import_one_by_one(os.path.join(tmp, "baseline.db"), sample))
+            baseline = baseline / len(sample) * total
+            bulk_time, imported = timed(lambda: results_archive.import_results(os.path.join(tmp, "bulk.db"), archive))
+            assert imported == total
+
+            print(f"{total:>9} {csv_time:15.2f} {os.path.getsize(csv_path) / 1e6:9.1f} {parquet_time:19.2f} "
+                  f"{dir_size(archive) / 1e6:13.1f} {baseline:16.1f} {bulk_time:16.2f} {total / bulk_time:14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# 問題バンクの読み込み時間のベンチマーク（CSV と コンパイル済み .bank の比較）
+# 実行: python -m benchmarks.bench_bank_load [words.csv]
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+import question_bank
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("csv", nargs="?", default="words.csv")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 100],
+                        help="CSV の行を何倍に増やして測るか")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    base = pd.read_csv(args.csv, encoding="utf-8-sig")
+    print(f"{'rows':>8} {'read_csv (ms)':>14} {'open bank (ms)':>15} {'row(0) (ms)':>12} {'to_frame (ms)':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scale:
+            df = pd.concat([base] * scale, ignore_index=True)
+            df["id"] = range(1, len(df) + 1)
+            csv_path = os.path.join(tmp, f"words_{scale}.csv")
+            df.to_csv(csv_path, index=False, encoding="utf-8-sig")
+            bank_path = question_bank.compile_bank(csv_path)
+
+            read_csv = timed(lambda: pd.read_csv(csv_path, encoding="utf-8-sig"), args.repeat)
+            open_bank = timed(lambda: question_bank.Bank(bank_path), args.repeat)
+            first_row = timed(lambda: question_bank.Bank(bank_path).row(0), args.repeat)
+            to_frame = timed(lambda: question_bank.Bank(bank_path).to_frame(), args.repeat)
+            print(f"{len(df):>8} {read_csv:14.2f} {open_bank:15.3f} {first_row:12.3f} {to_frame:14.2f}")
+
+
+if __name__ == "__main__":
+    main()
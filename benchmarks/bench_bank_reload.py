@@ -0,0 +1,73 @@
+# words.csv を更新したときの問題バンクの切り替え時間
+#   再起動: プロセスを立ち上げ直したのと同じく、コンパイル・DataFrame・表示用データ・インデックスをすべて作り直す
+#   差し替え: BankManager.refresh（変わった行だけ表示用データを作り直し、ほかは前の版から使い回す）
+#   再実行1回あたりの確認: BankManager.current（数秒に1回 stat するだけ）
+# 実行: python -m benchmarks.bench_bank_reload [words.csv] --scale 1 100 --changed 1 100
+import argparse
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+import bank_manager
+import question_bank
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def write_csv(df, path):
+    df.to_csv(path, index=False, encoding="utf-8-sig")
+    # 同じ秒のうちに書き直しても更新時刻が変わるように進めておく
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("csv", nargs="?", default="words.csv")
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 100],
+                        help="CSV の行を何倍に増やして測るか")
+    parser.add_argument("--changed", type=int, nargs="+", default=[1, 100], help="書き換える行数")
+    parser.add_argument("--reruns", type=int, default=10000)
+    args = parser.parse_args()
+
+    base = pd.read_csv(args.csv, encoding="utf-8-sig")
+    print(f"{'rows':>8} {'changed':>8} {'restart (ms)':>13} {'refresh (ms)':>13} {'current() (us)':>15}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scale:
+            df = pd.concat([base] * scale, ignore_index=True)
+            df["id"] = range(1, len(df) + 1)
+            csv_path = os.path.join(tmp, f"words_{scale}.csv")
+            write_csv(df, csv_path)
+            manager = bank_manager.BankManager(csv_path, check_interval=0)
+
+            manager.check_interval = bank_manager.CHECK_INTERVAL
+            start = time.perf_counter()
+            for _ in range(args.reruns):
+                manager.current()
+            current_us = (time.perf_counter() - start) / args.reruns * 1e6
+            manager.check_interval = 0
+
+            for changed in args.changed:
+                edited = df.copy()
+                rows = edited.index[:min(changed, len(edited))]
+                edited.loc[rows, "meaning_jp"] = edited.loc[rows, "meaning_jp"] + f"（改{changed}）"
+                write_csv(edited, csv_path)
+                restart_ms, _ = timed(lambda: bank_manager.BankVersion(question_bank.load_bank(csv_path)))
+
+                # restart でコンパイル済みなので、.bank を消してコンパイルから測る
+                os.remove(question_bank.default_bank_path(csv_path))
+                write_csv(edited, csv_path)
+                refresh_ms, swapped = timed(manager.refresh)
+                assert swapped and len(manager.latest.changed) == len(rows)
+                df = edited
+                print(f"{len(df):>8} {len(rows):>8} {restart_ms:13.1f} {refresh_ms:13.1f} {current_us:15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# 認証付きアプリの再実行1回あたりのユーザー情報の準備時間
+#   変更前: 再実行のたびに全員のパスワードを bcrypt でハッシュ化（stauth.Hasher(passwords).generate() 相当）
+#   変更後: 登録済みのハッシュを読み込んでおき（プロセスで1回）、再実行ではコピーするだけ。照合はログインする1人分
+# 変更前は1人分を実測して人数倍する（500人を毎回実際にハッシュ化すると数分かかるため）
+# 実行: python -m benchmarks.bench_credentials --users 3 50 500
+import argparse
+import copy
+import os
+import tempfile
+import time
+
+import credential_store
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, nargs="+", default=[3, 50, 500])
+    args = parser.parse_args()
+
+    per_hash, _ = timed(lambda: credential_store.hash_password("1234"))
+    print(f"bcrypt 1回（rounds={credential_store.BCRYPT_ROUNDS}）: {per_hash:.0f} ms")
+    print(f"{'users':>6} {'legacy rerun (ms)':>18} {'load once (ms)':>15} {'rerun (ms)':>11} {'login (ms)':>11}")
+    for n in args.users:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "credentials.db")
+            conn = credential_store.connect(path)
+            # 登録時のハッシュ化はベンチマークの対象外なので rounds を下げて速く済ませる
+            rounds, credential_store.BCRYPT_ROUNDS = credential_store.BCRYPT_ROUNDS, 4
+            credential_store.set_accounts(conn, [(f"student{i}", f"Student {i}", "1234") for i in range(n - 1)])
+            credential_store.BCRYPT_ROUNDS = rounds
+            # ログインを測るユーザーだけは本番と同じ rounds で登録する
+            credential_store.set_accounts(conn, [(f"student{n - 1}", f"Student {n - 1}", "1234")])
+            conn.close()
+
+            load, credentials = timed(lambda: credential_store.load_credentials(path))
+            rerun, _ = timed(lambda: copy.deepcopy(credentials))
+            login, ok = timed(lambda: credential_store.verify(credentials, f"student{n - 1}", "1234"))
+            assert ok
+            print(f"{n:>6} {per_hash * n:18.0f} {load:15.2f} {rerun:11.3f} {login:11.1f}")
+
+
+if __name__ == "__main__":
+    main()
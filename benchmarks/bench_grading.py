@@ -0,0 +1,118 @@
+# クイズの答え合わせ（quiz_grading）のコスト
+#   採点: 1問ずつ decode_answer して正解と比べる従来の方法と、quiz_grading.grade（numpy でまとめて比較）
+#   保存（SQLite）: 1解答ごとにコミットする方法と、ResultWriter.submit（1クイズ1トランザクション）
+#   保存（JSON 履歴）: quiz_id なしの追記と、quiz_id つきの追記（ファイル末尾で2回目の追記かを調べる）
+#   どのクイズも答え合わせを2回押したことにして、解答が2重に保存されないことも確かめる
+# 実行: python -m benchmarks.bench_grading --quiz-sizes 10 50 --quizzes 200
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import bank_manager
+import history_store
+import question_bank
+import quiz_grading
+import results_db
+
+
+def make_quizzes(store, rendered_questions, count, size, seed):
+    rng = random.Random(seed)
+    quizzes = []
+    for _ in range(count):
+        quiz = question_bank.quiz_ids(rng.sample(store.ids, size))
+        answers = bytearray()
+        for qid in quiz:
+            choices = rendered_questions[qid]["choices"]
+            selected = rng.choice(choices)
+            answers.append(question_bank.encode_answer(choices, selected, selected == store.get(qid, "answer")))
+        quizzes.append((quiz_grading.new_quiz_id(), quiz, answers))
+    return quizzes
+
+
+def grade_loop(quiz, answers, store, rendered_questions):
+    # 変更前のアプリの答え合わせ（1問ずつ）
+    score = 0
+    mistakes = []
+    for i, qid in enumerate(quiz):
+        q = store[qid]
+        user, _ = question_bank.decode_answer(rendered_questions[qid]["choices"], answers[i])
+        if user == q["answer"]:
+            score += 1
+        else:
+            mistakes.append(qid)
+    return score, mistakes
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("csv", nargs="?", default="words.csv")
+    parser.add_argument("--quiz-sizes", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--quizzes", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    version = bank_manager.BankVersion(question_bank.load_bank(args.csv))
+    store, rendered_questions = version.store, version.rendered
+    print(f"{'size':>5} {'grade loop (ms)':>16} {'grade() (ms)':>13} "
+          f"{'per-click (ms)':>15} {'submit (ms)':>12} {'jsonl (ms)':>11} {'jsonl+id (ms)':>14} {'rows':>7}")
+    for size in args.quiz_sizes:
+        size = min(size, len(store))
+        quizzes = make_quizzes(store, rendered_questions, args.quizzes, size, args.seed)
+        loop_ms = sum(timed(lambda: grade_loop(quiz, answers, store, rendered_questions), 10)
+                      for _, quiz, answers in quizzes) / len(quizzes)
+        grade_ms = sum(timed(lambda: quiz_grading.grade(quiz_id, quiz, answers, store, rendered_questions), 10)
+                       for quiz_id, quiz, answers in quizzes) / len(quizzes)
+        graded = [quiz_grading.grade(quiz_id, quiz, answers, store, rendered_questions)
+                  for quiz_id, quiz, answers in quizzes]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            # 1解答ごとにコミット（変更前の eiken_quiz_app はクリックのたびに1行ずつ書いていた）
+            writer = results_db.ResultWriter(os.path.join(tmp, "click.db"))
+            start = time.perf_counter()
+            for result in graded:
+                for user, word, selected, answer, is_correct, _ in result.result_rows("user0"):
+                    writer.add(user, word, selected, answer, is_correct)
+                    writer.flush()
+            click_ms = (time.perf_counter() - start) / len(graded) * 1000
+            writer.close()
+
+            writer = results_db.ResultWriter(os.path.join(tmp, "submit.db"))
+            start = time.perf_counter()
+            for result in graded:
+                writer.submit(result, "user0")
+            submit_ms = (time.perf_counter() - start) / len(graded) * 1000
+            # 答え合わせの2回目（ダブルクリック）は保存されない
+            assert not any(writer.submit(result, "user0") for result in graded)
+            rows = writer.read_sql("SELECT COUNT(*) AS n FROM results")["n"][0]
+            assert rows == size * len(graded), rows
+            writer.close()
+
+            plain_path = os.path.join(tmp, "plain_history.jsonl")
+            start = time.perf_counter()
+            for result in graded:
+                history_store.append(plain_path, result.history_records())
+            jsonl_ms = (time.perf_counter() - start) / len(graded) * 1000
+
+            id_path = os.path.join(tmp, "id_history.jsonl")
+            start = time.perf_counter()
+            for result in graded:
+                history_store.append(id_path, result.history_records(), result.quiz_id)
+            jsonl_id_ms = (time.perf_counter() - start) / len(graded) * 1000
+            assert not history_store.append(id_path, graded[-1].history_records(), graded[-1].quiz_id)
+            assert len(history_store.load_records(id_path)) == size * len(graded)
+
+        print(f"{size:>5} {loop_ms:16.3f} {grade_ms:13.3f} {click_ms:15.2f} {submit_ms:12.2f} "
+              f"{jsonl_ms:11.3f} {jsonl_id_ms:14.3f} {rows:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# 履歴ページの正答率グラフ: 全単語を1枚に描く方法（変更前）と、1ページ分だけ描いて PNG を使い回す方法の比較
+# 実行: python -m benchmarks.bench_history_chart --words 100 1000 5000
+import argparse
+import io
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import history_charts
+
+
+def make_stats(n, seed=0):
+    rng = np.random.default_rng(seed)
+    total = rng.integers(1, 20, size=n)
+    stats = pd.DataFrame({
+        "word": [f"word{i}" for i in range(n)],
+        "correct_count": rng.integers(0, total + 1),
+        "total_count": total,
+        "last_answered_at": rng.integers(1_700_000_000, 1_800_000_000, size=n),
+    })
+    stats["accuracy"] = stats["correct_count"] / stats["total_count"]
+    return stats.sort_values(by=["accuracy", "word"])
+
+
+def legacy_chart(stats):
+    # 変更前の eiken_quiz_app.py と同じ描き方（高さは単語数 × 0.4 インチ）
+    import matplotlib.pyplot as plt
+    import matplotlib.ticker as mtick
+
+    plt.rcParams["font.family"] = "DejaVu Sans"
+    fig, ax = plt.subplots(figsize=(8, len(stats) * 0.4))
+    ax.barh(stats["word"], stats["accuracy"], color="#6fa8dc")
+    ax.set_xlabel("正答率")
+    ax.set_xlim(0, 1.0)
+    ax.xaxis.set_major_formatter(mtick.PercentFormatter(1.0))
+    plt.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")  # st.pyplot と同じく PNG にする
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--words", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")  # DejaVu Sans に日本語のグリフが無い警告
+
+    import matplotlib
+    matplotlib.use("Agg")
+    cache = {}
+
+    print(f"{'words':>7} {'legacy (ms)':>12} {'legacy PNG (KB)':>16} {'page (ms)':>10} "
+          f"{'page PNG (KB)':>14} {'cache hit (ms)':>15}")
+    for n in args.words:
+        stats = make_stats(n)
+        try:
+            legacy, legacy_png = timed(lambda: legacy_chart(stats))
+            legacy_columns = f"{legacy:12.0f} {len(legacy_png) / 1024:16.0f}"
+        except ValueError:
+            # 高さが 2^16 ピクセルを超えると描けない（変更前のページはここで落ちていた）
+            legacy_columns = f"{'失敗':>12} {'-':>16}"
+
+        def cached_page():
+            key = ("user", history_charts.stats_version(stats), 1, args.page_size)
+            if key not in cache:
+                cache[key] = history_charts.accuracy_chart_png(history_charts.page_slice(stats, 1, args.page_size))
+            return cache[key]
+
+        page, page_png = timed(cached_page)
+        hit, _ = timed(cached_page)
+        print(f"{n:>7} {legacy_columns} {page:10.0f} "
+              f"{len(page_png) / 1024:14.0f} {hit:15.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# streamlit_app_final.py の苦手単語を優先する出題（スタート時の処理）のベンチマーク
+#   変更前: isin(苦手な単語 + 全単語のリスト) で絞り込み（実際には全件が残る）→ 全件シャッフル
+#   変更後: 集計と1回突き合わせて重みを付け、重複なしの重み付き抽選（Efraimidis-Spirakis）
+# 実行: python -m benchmarks.bench_low_score --bank-sizes 316 20000 200000 --history-sizes 1000 100000
+import argparse
+import random
+import time
+
+import quiz_generator
+import weighting
+from benchmarks.bench_weighting import make_data
+
+
+def legacy_start(df, stats, k):
+    low_score_words = stats[stats["accuracy"] < 0.5]["word"].tolist()
+    df = df[df["answer"].isin(low_score_words + df["answer"].tolist())]
+    return df.sample(frac=1).head(k)
+
+
+def new_start(df, stats, k, rng):
+    weights = weighting.compute_weights(df["answer"], stats, "low_score")
+    return df.iloc[quiz_generator.weighted_positions(rng, weights, k)]
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def low_share(quizzes, low_words):
+    picked = [word for quiz in quizzes for word in quiz["answer"]]
+    return sum(word in low_words for word in picked) / len(picked) * 100
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bank-sizes", type=int, nargs="+", default=[316, 20000, 200000])
+    parser.add_argument("--history-sizes", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--draws", type=int, default=200, help="苦手な単語の割合を見るための抽選回数")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'bank':>8} {'history':>8} {'legacy (ms)':>12} {'new (ms)':>9} "
+          f"{'low in bank':>12} {'low in legacy':>14} {'low in new':>11}")
+    for bank_size in args.bank_sizes:
+        for history_size in args.history_sizes:
+            words, stats = make_data(bank_size, history_size)
+            df = words.to_frame("answer")
+            low_words = set(stats.loc[stats["accuracy"] < weighting.LOW_SCORE_THRESHOLD, "word"])
+
+            legacy, _ = timed(lambda: legacy_start(df, stats, args.questions), args.repeat)
+            new, _ = timed(lambda: new_start(df, stats, args.questions, rng), args.repeat)
+            draws = max(1, args.draws * 20000 // max(bank_size, 20000))
+            legacy_low = low_share([legacy_start(df, stats, args.questions) for _ in range(draws)], low_words)
+            new_low = low_share([new_start(df, stats, args.questions, rng) for _ in range(draws)], low_words)
+            print(f"{bank_size:>8} {len(stats):>8} {legacy:12.2f} {new:9.2f} "
+                  f"{len(low_words) / bank_size * 100:11.1f}% {legacy_low:13.1f}% {new_low:10.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# クイズの問題選び: DataFrame を毎回 sample する方法と、出題用インデックス（quiz_generator）の比較
+#   uniform  : df.sample(frac=1).head(k) と QuizIndex.sample（Floyd の方法, O(k)）
+#   weighted : df.sample(n=k, weights=..., replace=True) と AliasTable（作成 O(n) / 抽選 O(1)）
+#   filtered : level と tag の条件で絞ってから sample する方法とビットマップでの絞り込み
+# 実行: python -m benchmarks.bench_quiz_generator --sizes 300 20000 1000000
+import argparse
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+import quiz_generator
+
+LEVELS = ["5", "4", "3", "pre2", "2"]
+TAGS = [f"tag{i}" for i in range(20)]
+
+
+def make_frame(n, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "answer": [f"word{i}" for i in range(n)],
+        "choices": "a|b|c|d",
+        "level": rng.choice(LEVELS, n),
+        "tag": rng.choice(TAGS, n),
+    })
+
+
+def per_call(fn, repeat):
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        best = min(best, (time.perf_counter() - start) / repeat)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[300, 20_000, 1_000_000])
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    k = args.questions
+
+    print(f"{'rows':>9} {'case':>9} {'DataFrame (ms)':>15} {'index (ms)':>11} {'index build (ms)':>17}")
+    for n in args.sizes:
+        df = make_frame(n, args.seed)
+        rng = random.Random(args.seed)
+        repeat = max(3, min(200, 2_000_000 // n))
+
+        start = time.perf_counter()
+        index = quiz_generator.QuizIndex.from_frame(df)
+        build = (time.perf_counter() - start) * 1000
+        before = per_call(lambda: df.sample(frac=1).head(k).to_dict(orient="records"), repeat)
+        after = per_call(lambda: index.sample(k, rng), 200)
+        print(f"{n:>9} {'uniform':>9} {before:15.3f} {after:11.4f} {build:17.1f}")
+
+        weights = np.random.default_rng(args.seed).random(n) + 0.1
+        start = time.perf_counter()
+        table = quiz_generator.AliasTable(weights)
+        build = (time.perf_counter() - start) * 1000
+        before = per_call(lambda: df.sample(n=k, weights=weights, replace=True), repeat)
+        after = per_call(lambda: index.weighted(k, table, rng), 200)
+        print(f"{n:>9} {'weighted':>9} {before:15.3f} {after:11.4f} {build:17.1f}")
+
+        level, tags = "3", TAGS[:3]
+        before = per_call(lambda: df[(df["level"] == level) & df["tag"].isin(tags)].sample(n=k), repeat)
+        index._candidates.clear()
+        start = time.perf_counter()
+        index.sample(k, rng, level=level, tag=tags)
+        first = (time.perf_counter() - start) * 1000
+        after = per_call(lambda: index.sample(k, rng, level=level, tag=tags), 200)
+        print(f"{n:>9} {'filtered':>9} {before:15.3f} {after:11.4f} {first:17.3f}  (初回の絞り込み)")
+
+
+if __name__ == "__main__":
+    main()
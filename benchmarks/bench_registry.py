@@ -0,0 +1,88 @@
+# 級ごとの問題バンク（bank_registry）のメモリ量と準備時間
+#   words.csv の行を増やして級ごとの CSV を作り（既定: 7級 × 7200行 ≒ 5万問）、コンパイルしておく
+#   新しいプロセスで次の3つを測る（増えた RSS と Python のヒープ、かかった時間）
+#     idle : レジストリを作って級の一覧を出すだけ（どの級も選ばれていない）
+#     one  : 1つの級を選んで出題の準備ができるまで
+#     all  : すべての級を読み込む（レジストリを使わずに全部を1つのアプリに載せた場合に相当）
+# 実行: python -m benchmarks.bench_registry --rows 7200
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+import bank_registry
+import question_bank
+
+CHILD = """
+import json, resource, sys, time, tracemalloc
+
+def rss_kb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+import bank_registry
+scenario, directory = sys.argv[1], sys.argv[2]
+before = rss_kb()
+tracemalloc.start()
+start = time.perf_counter()
+registry = bank_registry.BankRegistry(directory)
+names = registry.names()
+if scenario == "one":
+    registry.get(names[0]).current()
+elif scenario == "all":
+    for name in names:
+        registry.get(name).current()
+elapsed = time.perf_counter() - start
+heap, _ = tracemalloc.get_traced_memory()
+print(json.dumps({"ms": elapsed * 1000, "rss_kb": rss_kb() - before, "heap_kb": heap / 1024,
+                  "loaded": len(registry.loaded()), "levels": len(names)}))
+"""
+
+
+def make_shards(csv_path, directory, rows):
+    base = pd.read_csv(csv_path, encoding="utf-8-sig")
+    repeat = -(-rows // len(base))
+    for n, name in enumerate(bank_registry.LEVEL_LABELS):
+        df = pd.concat([base] * repeat, ignore_index=True).iloc[:rows].copy()
+        df["id"] = range(1, len(df) + 1)
+        # 同じ問題の重複として除外されないように問題文を変えておく
+        df["sentence_with_blank"] = df["sentence_with_blank"] + [f" ({name} #{i})" for i in range(len(df))]
+        df["tag"] = [f"unit{i % 20 + 1}" for i in range(len(df))]
+        path = os.path.join(directory, f"{name}.csv")
+        df.to_csv(path, index=False, encoding="utf-8-sig")
+        question_bank.compile_bank(path)
+
+
+def run(scenario, directory):
+    proc = subprocess.run([sys.executable, "-c", CHILD, scenario, directory], capture_output=True, text=True,
+                          env={**os.environ, "PYTHONPATH": os.getcwd()})
+    if proc.returncode:
+        raise SystemExit(proc.stderr)
+    return json.loads(proc.stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("csv", nargs="?", default="words.csv")
+    parser.add_argument("--rows", type=int, default=7200, help="級ごとの問題数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_shards(args.csv, tmp, args.rows)
+        print(f"{len(bank_registry.LEVEL_LABELS)} 級 × {args.rows} 問")
+        print(f"{'scenario':>9} {'loaded':>7} {'time (ms)':>10} {'RSS (MB)':>9} {'heap (MB)':>10}")
+        for scenario in ["idle", "one", "all"]:
+            result = run(scenario, tmp)
+            print(f"{scenario:>9} {result['loaded']:>3}/{result['levels']:<3} {result['ms']:10.1f} "
+                  f"{result['rss_kb'] / 1024:9.1f} {result['heap_kb'] / 1024:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
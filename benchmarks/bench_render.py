@@ -0,0 +1,70 @@
+# クイズページの再実行1回あたりの表示準備コスト（Streamlit の描画呼び出しを除く）の比較
+# 実行: python -m benchmarks.bench_render
+import argparse
+import random
+import time
+
+import pandas as pd
+
+import question_bank
+
+BUTTON_STYLE = """
+    <style>
+        div.stButton > button {
+            background-color: #e0f0ff;
+            margin-bottom: 8px;
+        }
+    </style>
+"""
+
+
+def rerun_before(q, idx):
+    # 変更前: 再実行のたびに split・グローバル乱数の再シード・replace・選択肢ごとの <style>
+    sentence = q["sentence_with_blank"].replace(chr(10), "<br>")
+    choices = q["choices"].split("|")
+    random.seed(idx)
+    choices = random.sample(choices, len(choices))
+    markup = [BUTTON_STYLE for _ in choices]
+    translation = q["sentence_jp"].replace(chr(10), "<br>") if pd.notna(q["sentence_jp"]) else None
+    return sentence, choices, markup, translation
+
+
+def rerun_after(rendered, orders, q, idx):
+    # 変更後: 事前に作った辞書と並び順を引くだけ。<style> はページに1回
+    r = rendered[q["id"]]
+    choices = question_bank.ordered_choices(r, orders[idx])
+    return r["sentence_html"], choices, BUTTON_STYLE, r["translation_html"]
+
+
+def per_call(fn, args_list, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for args in args_list:
+            fn(*args)
+        best = min(best, (time.perf_counter() - start) / len(args_list))
+    return best * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("csv", nargs="?", default="words.csv")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    df = question_bank.load_bank(args.csv).to_frame()
+    quiz = df.to_dict(orient="records")
+
+    start = time.perf_counter()
+    rendered = question_bank.render_questions(df)
+    orders = question_bank.choice_orders(question_bank.new_session_rng(), rendered, [q["id"] for q in quiz])
+    build = (time.perf_counter() - start) * 1000
+
+    before = per_call(rerun_before, [(q, i) for i, q in enumerate(quiz)], args.repeat)
+    after = per_call(lambda q, i: rerun_after(rendered, orders, q, i), [(q, i) for i, q in enumerate(quiz)], args.repeat)
+    print(f"事前計算: {len(rendered)} 問を {build:.2f} ms")
+    print(f"再実行1回あたり: 変更前 {before:.2f} µs / 変更後 {after:.2f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# 間隔反復スケジューラーの出題選択レイテンシのシミュレーション
+#   legacy : 変更前の pick_session（ユーザーの状態を全件読み、問題バンク全体との差分から未出題の単語を選ぶ）
+#   current: srs_scheduler.pick_session（期限順のインデックスを LIMIT 件ずつ読み、未出題の単語は無作為に引いて確かめる）
+#   大量のユーザー（既定 10万人 × 20語）に加えて、状態を大量に持つユーザー（既定 5万語）と大きな問題バンクでも測る
+# 実行: python -m benchmarks.bench_srs --users 100000 --words-per-user 20 --heavy-words 50000
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+import results_db
+import srs_scheduler
+
+HEAVY_USER = "heavy"
+
+
+def populate(conn, users, words_per_user, bank_size, heavy_words, seed):
+    rng = random.Random(seed)
+    now = int(time.time())
+    with conn:
+        conn.executemany("INSERT INTO users (id, name) VALUES (?, ?)",
+                         [(i, f"user{i}") for i in range(1, users + 1)] + [(users + 1, HEAVY_USER)])
+        conn.executemany("INSERT INTO words (id, word) VALUES (?, ?)",
+                         ((i, f"word{i}") for i in range(1, bank_size + 1)))
+
+    def state(user_id, word_id):
+        interval = rng.choice([srs_scheduler.RELEARN_INTERVAL, 1.0, 6.0, 15.0, 40.0])
+        last = now - rng.randint(0, 60 * 86400)
+        return (user_id, word_id, 2.5, interval, 1, 0, int(last + interval * 86400), last)
+
+    def states():
+        for user_id in range(1, users + 1):
+            for word_id in rng.sample(range(1, bank_size + 1), words_per_user):
+                yield state(user_id, word_id)
+        for word_id in rng.sample(range(1, bank_size + 1), heavy_words):
+            yield state(users + 1, word_id)
+
+    with conn:
+        conn.executemany('''
+            INSERT INTO srs_state
+                (user_id, word_id, ease, interval_days, reps, lapses, due_at, last_answered_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', states())
+
+
+def legacy_pick_session(writer, username, bank_words, n, now=None, rng=random):
+    # 変更前の実装（比較用）
+    now = time.time() if now is None else now
+    writer.flush()
+    bank = set(bank_words)
+    with writer.locked() as conn:
+        due = [(word, due_at) for word, due_at in conn.execute('''
+            SELECT w.word, s.due_at FROM srs_state s JOIN words w ON w.id = s.word_id
+            WHERE s.user_id = (SELECT id FROM users WHERE name = ?)
+            ORDER BY s.due_at
+        ''', (username,)) if word in bank]
+    seen = {word for word, _ in due}
+    overdue = [word for word, due_at in due if due_at <= now]
+    if len(overdue) >= n:
+        return overdue[:n]
+    unseen = [word for word in dict.fromkeys(bank_words) if word not in seen]
+    fresh = rng.sample(unseen, min(n - len(overdue), len(unseen)))
+    upcoming = [word for word, due_at in due if due_at > now]
+    return (overdue + fresh + upcoming)[:n]
+
+
+def measure(fn, usernames):
+    samples = []
+    for username in usernames:
+        start = time.perf_counter()
+        fn(username)
+        samples.append(time.perf_counter() - start)
+    return np.percentile(np.array(samples) * 1000, [50, 95, 99])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--words-per-user", type=int, default=20)
+    parser.add_argument("--bank-size", type=int, default=100000, help="問題バンク全体の単語数")
+    parser.add_argument("--pool-size", type=int, default=2000, help="1つの級・タグで出題できる単語数")
+    parser.add_argument("--heavy-words", type=int, default=50000, help="状態を大量に持つユーザーの単語数")
+    parser.add_argument("--session-size", type=int, default=10)
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "srs_bench.db")
+        writer = results_db.ResultWriter(path)
+        start = time.perf_counter()
+        populate(writer.conn, args.users, args.words_per_user, args.bank_size, args.heavy_words, args.seed)
+        print(f"srs_state: {args.users * args.words_per_user + args.heavy_words} 行を作成 "
+              f"({time.perf_counter() - start:.1f} 秒)")
+
+        rng = random.Random(args.seed)
+        all_words = [f"word{i}" for i in range(1, args.bank_size + 1)]
+        pools = [
+            # (名前, 出題できる単語)
+            ("whole bank", all_words),
+            ("one level", rng.sample(all_words, args.pool_size)),
+        ]
+        users = [f"user{rng.randint(1, args.users)}" for _ in range(args.samples)]
+        heavy = [HEAVY_USER] * max(args.samples // 10, 20)
+        n = args.session_size
+
+        # 同じ乱数列で選んだときに、出題される単語の数・期限切れの単語が同じになることを確かめる
+        for label, words in pools:
+            pool = srs_scheduler.WordPool(words)
+            for username in users[:50] + heavy[:5]:
+                now = time.time()
+                old = legacy_pick_session(writer, username, words, n, now=now, rng=random.Random(0))
+                new = srs_scheduler.pick_session(writer, username, pool, n, now=now, rng=random.Random(0))
+                assert len(old) == len(new) and len(set(new)) == len(new) and set(new) <= pool.members, label
+                with writer.locked() as conn:
+                    due_at = dict(conn.execute('''
+                        SELECT w.word, s.due_at FROM srs_state s JOIN words w ON w.id = s.word_id
+                        WHERE s.user_id = (SELECT id FROM users WHERE name = ?)
+                    ''', (username,)).fetchall())
+                # 期限の同じ単語の並びは実装によって違うので、期限の列で比べる
+                overdue = [due_at[word] for word in old if due_at.get(word, now + 1) <= now]
+                assert [due_at[word] for word in new[:len(overdue)]] == overdue, label
+
+        print(f"{'pool':>12} {'user':>8} {'impl':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}")
+        for label, words in pools:
+            pool = srs_scheduler.WordPool(words)
+            for who, usernames in [("typical", users), ("heavy", heavy)]:
+                for impl, fn in [
+                    ("legacy", lambda username: legacy_pick_session(writer, username, words, n, rng=rng)),
+                    ("current", lambda username: srs_scheduler.pick_session(writer, username, pool, n, rng=rng)),
+                ]:
+                    p50, p95, p99 = measure(fn, usernames)
+                    print(f"{label:>12} {who:>8} {impl:>8} {p50:9.3f} {p95:9.3f} {p99:9.3f}")
+        writer.close()
+
+
+if __name__ == "__main__":
+    main()
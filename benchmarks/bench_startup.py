@@ -0,0 +1,69 @@
+# 起動直後（新しいプロセス）の最初の描画までの時間。新しいコンテナで最初のリクエストを受けたときに相当する
+#   import   : streamlit.testing の読み込み（streamlit 本体を含む）
+#   first    : AppTest でアプリのスクリプトを1回実行するまで（アプリの import とキャッシュの作成を含む）
+# --budget-ms を付けると、first の中央値がそれを超えたアプリがあれば終了コード1にする（回帰チェック用）
+# 実行: python -m benchmarks.bench_startup eiken_quiz_app.py streamlit_app_final.py --repeat 5
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+CHILD = """
+import sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+done = time.perf_counter()
+error = at.exception[0].message.splitlines()[0] if at.exception else ""
+print(f"{imported - start}\\t{done - imported}\\t{error}")
+"""
+
+DEFAULT_APPS = [
+    "eiken_quiz_app.py",
+    "streamlit_app_final.py",
+    "streamlit_app_simple.py",
+    "streamlit_app_with_analytics_review.py",
+    "admin_view.py",
+]
+
+
+def run_once(app):
+    proc = subprocess.run([sys.executable, "-c", CHILD, os.path.abspath(app)], capture_output=True, text=True)
+    if proc.returncode:
+        return None, None, proc.stderr.strip().splitlines()[-1]
+    imported, first, error = proc.stdout.splitlines()[-1].split("\t", 2)
+    return float(imported), float(first), error
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("apps", nargs="*", default=DEFAULT_APPS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float, help="最初の描画（中央値）の上限")
+    args = parser.parse_args()
+
+    print(f"{'app':>40} {'import (ms)':>12} {'first p50 (ms)':>15} {'first max (ms)':>15}")
+    over_budget = []
+    for app in args.apps:
+        results = [run_once(app) for _ in range(args.repeat)]
+        errors = [error for _, _, error in results if error]
+        if any(first is None for _, first, _ in results):
+            print(f"{app:>40} {'起動できません':>12}  {errors[0]}")
+            continue
+        imported = statistics.median(r[0] for r in results) * 1000
+        firsts = [r[1] * 1000 for r in results]
+        p50 = statistics.median(firsts)
+        note = f"  （例外: {errors[0]}）" if errors else ""
+        print(f"{app:>40} {imported:12.0f} {p50:15.0f} {max(firsts):15.0f}{note}")
+        if args.budget_ms is not None and p50 > args.budget_ms:
+            over_budget.append(app)
+
+    if over_budget:
+        print(f"上限 {args.budget_ms:.0f} ms を超えました: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
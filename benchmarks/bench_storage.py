@@ -0,0 +1,88 @@
+# 保存先（SQLite / JSONL / メモリ）ごとの書き込みスループットと集計レイテンシの比較
+# 実行: python -m benchmarks.bench_storage --sizes 10000 1000000 10000000
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+import storage
+
+
+def answer_batches(total, users, words, batch_size, seed):
+    rng = random.Random(seed)
+    for start in range(0, total, batch_size):
+        batch = []
+        for _ in range(min(batch_size, total - start)):
+            user = f"user{rng.randrange(users)}"
+            word = f"word{rng.randrange(words)}"
+            is_correct = rng.random() < 0.7
+            batch.append((user, word, word if is_correct else f"word{rng.randrange(words)}", word, is_correct))
+        yield batch
+
+
+def percentiles(samples):
+    return np.percentile(np.array(samples) * 1000, [50, 95, 99])
+
+
+def run(backend, url, total, args):
+    store = storage.open_storage(url)
+    written = 0
+    write_time = 0.0
+    for batch in answer_batches(total, args.users, args.words, args.batch_size, args.seed):
+        start = time.perf_counter()
+        store.record_answers(batch)
+        write_time += time.perf_counter() - start
+        written += len(batch)
+    start = time.perf_counter()
+    store.flush()
+    write_time += time.perf_counter() - start
+
+    rng = random.Random(args.seed + 1)
+    user_samples = []
+    for _ in range(args.queries):
+        start = time.perf_counter()
+        store.user_stats(f"user{rng.randrange(args.users)}")
+        user_samples.append(time.perf_counter() - start)
+    # 解答がないユーザーも、どの保存先でも同じ列の空の集計になる
+    empty = store.user_stats("nobody")
+    assert empty.empty and list(empty.columns) == storage.STATS_COLUMNS, (backend, list(empty.columns))
+
+    start = time.perf_counter()
+    store.all_stats()
+    all_time = time.perf_counter() - start
+    store.close()
+
+    p50, p95, p99 = percentiles(user_samples)
+    print(f"{backend:>7} {total:>10} {written / write_time:14.0f} "
+          f"{p50:9.2f} {p95:9.2f} {p99:9.2f} {all_time * 1000:12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--backends", nargs="+", default=["sqlite", "jsonl", "memory"])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--words", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=10, help="1回の record_answers の件数（1クイズ分）")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'backend':>7} {'answers':>10} {'answers/sec':>14} "
+          f"{'user p50':>9} {'user p95':>9} {'user p99':>9} {'all (ms)':>12}")
+    for total in args.sizes:
+        for backend in args.backends:
+            with tempfile.TemporaryDirectory() as tmp:
+                url = {
+                    "sqlite": f"sqlite:{os.path.join(tmp, 'bench.db')}",
+                    "jsonl": f"jsonl:{os.path.join(tmp, 'user_history')}",
+                    "memory": "memory:",
+                }[backend]
+                run(backend, url, total, args)
+
+
+if __name__ == "__main__":
+    main()
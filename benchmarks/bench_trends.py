@@ -0,0 +1,131 @@
+# 正答率の推移の問い合わせ（daily_stats）のコスト
+#   groupby : results の行を範囲で読み出して pandas で日・週ごとに集計する（集計テーブルを使わない場合）
+#   SQL     : results に対して SQLite の GROUP BY で集計する
+#   rollup  : 日ごとの集計テーブル（daily_user_stats / daily_word_stats）だけを読む（daily_stats.trend）
+#   問い合わせ: 先生が全員分を週ごとに見る（直近90日）、1人の生徒を日ごとに見る、1つの単語を週ごとに見る（全期間）
+#   あわせて、解答の保存1回（1クイズ10問）あたりに集計テーブルの更新で増える時間を測る
+# 実行: python -m benchmarks.bench_trends --sizes 100000 1000000 10000000
+import argparse
+import datetime
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import daily_stats
+import results_db
+
+DAY = 24 * 60 * 60
+
+
+def fill_results(writer, size, args, now):
+    # results には SQL で直接入れ、集計テーブルは最後にまとめて作る（daily_stats.rebuild）
+    rng = np.random.default_rng(args.seed)
+    conn = writer.conn
+    with writer.locked(), conn:
+        conn.executemany("INSERT INTO users (id, name) VALUES (?, ?)",
+                         [(i + 1, f"user{i}") for i in range(args.users)])
+        conn.executemany("INSERT INTO words (id, word) VALUES (?, ?)",
+                         [(i + 1, f"word{i}") for i in range(args.words)])
+        for start in range(0, size, args.chunk_size):
+            n = min(args.chunk_size, size - start)
+            users = rng.integers(1, args.users + 1, n)
+            words = rng.integers(1, args.words + 1, n)
+            correct = (rng.random(n) < 0.7).astype(np.int64)
+            answered_at = np.sort(now - rng.integers(0, args.days * DAY, n))
+            conn.executemany('''
+                INSERT INTO results (user_id, word_id, selected_id, correct_id, is_correct, answered_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', zip(users.tolist(), words.tolist(), words.tolist(), words.tolist(),
+                     correct.tolist(), answered_at.tolist()))
+        start = time.perf_counter()
+        daily_stats.rebuild(conn)
+    return time.perf_counter() - start
+
+
+def groupby_trend(writer, key, key_id, since, period):
+    where = f"answered_at >= {since}" + (f" AND {key} = {key_id}" if key_id is not None else "")
+    df = writer.read_sql(f"SELECT {key}, is_correct, answered_at FROM results WHERE {where}")
+    # ローカル時刻の日付（夏時間は無視して今の時差を使う）
+    day = pd.to_datetime(df["answered_at"] + time.localtime().tm_gmtoff, unit="s").dt.floor("D")
+    df["period"] = day if period == "day" else day - pd.to_timedelta(day.dt.weekday, unit="D")
+    return df.groupby([key, "period"])["is_correct"].agg(["sum", "count"])
+
+
+def sql_trend(writer, key, key_id, since, period):
+    day = "date(answered_at, 'unixepoch', 'localtime')"
+    bucket = day if period == "day" else f"date({day}, '-6 days', 'weekday 1')"
+    where = f"answered_at >= {since}" + (f" AND {key} = {key_id}" if key_id is not None else "")
+    return writer.read_sql(f'''
+        SELECT {key}, {bucket} AS period, SUM(is_correct) AS sum, COUNT(*) AS count
+        FROM results WHERE {where} GROUP BY 1, 2
+    ''')
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--words", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=365, help="解答を散らばらせる日数")
+    parser.add_argument("--chunk-size", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--quizzes", type=int, default=1000, help="保存のコストを測るクイズの数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    now = int(time.time())
+    queries = [
+        # (名前, 集計の単位, 絞り込むID, 何日前から, 期間)
+        ("all users / week / 90d", "user", None, 90, "week"),
+        ("one user / day / all", "user", 1, args.days, "day"),
+        ("one word / week / all", "word", 1, args.days, "week"),
+    ]
+    print(f"{'rows':>10} {'query':>24} {'groupby (ms)':>13} {'SQL (ms)':>10} {'rollup (ms)':>12} {'answers':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = results_db.ResultWriter(os.path.join(tmp, "bench.db"))
+            build_s = fill_results(writer, size, args, now)
+            for label, by, key_id, days, period in queries:
+                key = daily_stats.TABLES[by][1]
+                # どの方法も同じ範囲（days 日前の0時から）を集計する
+                start_day = datetime.date.fromtimestamp(now) - datetime.timedelta(days=days - 1)
+                since = int(time.mktime(start_day.timetuple()))
+                name = None if key_id is None else f"{by}{key_id - 1}"
+                groupby_ms, grouped = timed(lambda: groupby_trend(writer, key, key_id, since, period), args.repeat)
+                sql_ms, summed = timed(lambda: sql_trend(writer, key, key_id, since, period), args.repeat)
+                rollup_ms, trend = timed(lambda: daily_stats.trend(writer, by, name, start=start_day, period=period),
+                                         args.repeat)
+                assert grouped["count"].sum() == summed["count"].sum() == trend["total_count"].sum()
+                assert len(grouped) == len(summed) == len(trend)
+                print(f"{size:>10} {label:>24} {groupby_ms:13.1f} {sql_ms:10.1f} {rollup_ms:12.2f} "
+                      f"{int(trend['total_count'].sum()):>10}")
+
+            # 保存1回あたりに集計テーブルの更新で増える時間（results_db.insert_answers の中の daily_stats.apply_answers）
+            rng = np.random.default_rng(args.seed + 1)
+            records = [
+                [(int(u), int(w), int(c), now) for u, w, c in zip(
+                    rng.integers(1, args.users + 1, 10), rng.integers(1, args.words + 1, 10), rng.random(10) < 0.7
+                )]
+                for _ in range(args.quizzes)
+            ]
+            start = time.perf_counter()
+            with writer.locked(), writer.conn:
+                for quiz in records:
+                    daily_stats.apply_answers(writer.conn, quiz)
+            apply_us = (time.perf_counter() - start) / args.quizzes * 1e6
+            writer.close()
+            print(f"{size:>10} rollup rebuild {build_s:.1f} s, incremental update {apply_us:.0f} us / quiz")
+
+
+if __name__ == "__main__":
+    main()
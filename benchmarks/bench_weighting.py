@@ -0,0 +1,68 @@
+# 復習モードの重み計算のベンチマーク
+# 実行: python -m benchmarks.bench_weighting
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import weighting
+
+
+def make_data(bank_size, history_size, seed=0):
+    rng = np.random.default_rng(seed)
+    words = pd.Series([f"word{i}" for i in range(bank_size)])
+    seen = rng.choice(bank_size, size=min(history_size, bank_size), replace=False)
+    total = rng.integers(1, 20, size=len(seen))
+    stats = pd.DataFrame({
+        "word": words.iloc[seen].to_numpy(),
+        "correct_count": rng.integers(0, total + 1),
+        "total_count": total,
+        "last_answered_at": time.time() - rng.integers(0, 30 * 86400, size=len(seen)),
+    })
+    stats["accuracy"] = stats["correct_count"] / stats["total_count"]
+    return words, stats
+
+
+def legacy_weights(words, stats):
+    # 変更前の eiken_quiz_app.py と同じ計算
+    return words.apply(lambda word:
+        1.0 if word not in stats["word"].values else
+        max(0.1, 1.0 - stats.loc[stats["word"] == word, "accuracy"].values[0])
+    )
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bank-sizes", type=int, nargs="+", default=[316, 2000, 20000])
+    parser.add_argument("--history-sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--legacy-limit", type=int, default=20_000_000,
+                        help="bank×history がこれを超える場合は従来方式を測らない")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'bank':>8} {'history':>8} {'legacy (ms)':>12} {'vectorized (ms)':>16}")
+    for bank_size in args.bank_sizes:
+        for history_size in args.history_sizes:
+            words, stats = make_data(bank_size, history_size)
+            vectorized, weights = timed(lambda: weighting.compute_weights(words, stats), args.repeat)
+            if bank_size * len(stats) <= args.legacy_limit:
+                legacy, expected = timed(lambda: legacy_weights(words, stats), 1)
+                assert np.allclose(expected.to_numpy(), weights)
+                legacy_text = f"{legacy * 1000:12.1f}"
+            else:
+                legacy_text = f"{'skipped':>12}"
+            print(f"{bank_size:>8} {len(stats):>8} {legacy_text} {vectorized * 1000:16.2f}")
+
+
+if __name__ == "__main__":
+    main()
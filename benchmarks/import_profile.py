@@ -0,0 +1,58 @@
+# アプリの起動時（最初の描画の前）に読み込まれるモジュールごとの import 時間
+#   アプリの先頭にある import 文だけを python -X importtime で新しいプロセスで実行し、
+#   import 文ごとの累計時間と、単体で重いモジュールの上位を出す
+#   （先に読み込まれたモジュールは後の import 文には数えられないので、順番にも意味がある）
+# 実行: python -m benchmarks.import_profile eiken_quiz_app.py streamlit_app_final.py
+import argparse
+import ast
+import subprocess
+import sys
+
+
+def top_level_imports(path):
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    return [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def profile(statements):
+    code = "\n".join(ast.unparse(node) for node in statements)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name[1:].rstrip(), int(self_us), int(cumulative_us)))
+    error = proc.stderr.strip().splitlines()[-1] if proc.returncode else None
+    return rows, error
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("apps", nargs="+")
+    parser.add_argument("--top", type=int, default=10, help="単体で重いモジュールを何件出すか")
+    args = parser.parse_args()
+
+    for app in args.apps:
+        statements = top_level_imports(app)
+        rows, error = profile(statements)
+        # インデントなしの行のうち、アプリの import 文に書かれたもの（ほかは site などインタープリターの起動分）
+        roots = {
+            (alias.name if isinstance(node, ast.Import) else node.module or "").split(".")[0]
+            for node in statements for alias in node.names
+        }
+        direct = [r for r in rows if not r[0].startswith(" ") and r[0].split(".")[0] in roots]
+        total = sum(cumulative for _, _, cumulative in direct)
+        print(f"== {app}: {total / 1000:.0f} ms")
+        for name, _, cumulative in sorted(direct, key=lambda r: -r[2]):
+            print(f"  {cumulative / 1000:9.1f} ms  {name}")
+        print(f"  -- 単体で重いモジュール（上位 {args.top} 件）")
+        for name, self_us, _ in sorted(rows, key=lambda r: -r[1])[:args.top]:
+            print(f"  {self_us / 1000:9.1f} ms  {name.strip()}")
+        if error:
+            print(f"  !! import に失敗しました: {error}")
+
+
+if __name__ == "__main__":
+    main()
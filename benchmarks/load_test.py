@@ -0,0 +1,245 @@
+# 同時に解いている生徒をシミュレートする負荷試験
+#   開始 → N問解答 → 履歴（結果）ページ の流れを、セッションごとに並行実行する
+#   --mode data    : アプリと同じデータ層の関数をスレッドから直接呼ぶ（既定）
+#   --mode apptest : streamlit.testing の AppTest でアプリのスクリプトごと動かす（セッションごとに1プロセス）
+#   --processes    : data モードで Streamlit のレプリカ（プロセス）を複数立てた状況を再現する
+# 実行: python -m benchmarks.load_test --app eiken_quiz_app.py --sessions 40 --questions 10
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import bank_manager
+import question_bank
+import quiz_generator
+import quiz_grading
+import results_db
+import weighting
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def timed(self, step, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.samples.setdefault(step, []).append(elapsed)
+        return result
+
+
+# --- data モード: 各アプリのスタート・解答・履歴の処理をそのまま再現する ---
+
+def eiken_quiz_app_session(writer, bank, username, questions, review, recorder, rng):
+    # 出題用インデックスで問題IDを選び、1問ごとに解答のバイトを記録し、最後に quiz_grading でまとめて採点・保存する
+    def start():
+        if review:
+            stats = results_db.load_user_stats(writer, username)
+            if not stats.empty:
+                table = quiz_generator.AliasTable(weighting.compute_weights(bank.frame["answer"], stats))
+                ids = bank.index.weighted(questions, table, rng)
+                return question_bank.quiz_ids(ids)
+        return question_bank.quiz_ids(bank.index.sample(questions, rng))
+
+    quiz = recorder.timed("start", start)
+    orders = question_bank.choice_orders(rng, bank.rendered, quiz)
+    answers = bytearray()
+    for qid, order in zip(quiz, orders):
+        rendered = bank.rendered[qid]
+        choice = rng.choice(question_bank.ordered_choices(rendered, order))
+        answers.append(question_bank.encode_answer(
+            rendered["choices"], choice, choice == rendered["choices"][rendered["answer_index"]]
+        ))
+
+    def submit():
+        graded = quiz_grading.grade(quiz_grading.new_quiz_id(), quiz, answers, bank.store, bank.rendered)
+        writer.submit(graded, username)
+
+    recorder.timed("submit", submit)
+    recorder.timed("history", results_db.load_user_stats, writer, username)
+    return len(quiz)
+
+
+def streamlit_app_final_session(writer, bank, username, questions, review, recorder, rng):
+    df = bank.frame
+
+    def start():
+        stats = results_db.load_user_stats(writer, username)
+        if stats.empty:
+            return df.iloc[quiz_generator.sample_positions(rng, len(df), questions)]
+        weights = weighting.compute_weights(df["answer"], stats, "low_score")
+        return df.iloc[quiz_generator.weighted_positions(rng, weights, questions)]
+
+    quiz = recorder.timed("start", start).to_dict(orient="records")
+    answers = []
+    for q in quiz:
+        choice = rng.choice(q["choices"].split("|"))
+        answers.append((choice, q["answer"]))
+        recorder.timed("answer", writer.add, username, q["answer"], choice, q["answer"], choice == q["answer"])
+    recorder.timed("review", lambda: sum(1 for selected, correct in answers if selected == correct))
+    return len(quiz)
+
+
+DATA_FLOWS = {
+    "eiken_quiz_app.py": eiken_quiz_app_session,
+    "streamlit_app_final.py": streamlit_app_final_session,
+}
+
+
+def run_data(args, db_path, worker=0):
+    writer = results_db.ResultWriter(db_path)
+    bank = bank_manager.BankVersion(question_bank.load_bank(args.csv))
+    flow = DATA_FLOWS[os.path.basename(args.app)]
+    recorder = Recorder()
+    answered = []
+
+    def session(i):
+        rng = random.Random(args.seed * 100003 + worker * 1009 + i)
+        for _ in range(args.rounds):
+            username = f"student{rng.randrange(args.users)}"
+            answered.append(flow(writer, bank, username, args.questions, args.review, recorder, rng))
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(args.sessions)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    recorder.timed("final flush", writer.flush)
+    elapsed = time.perf_counter() - start
+    writer.close()
+    return recorder.samples, sum(answered), elapsed, writer.lock_waits, writer.lock_errors
+
+
+def _run_data_worker(payload):
+    args, db_path, worker = payload
+    return run_data(args, db_path, worker)
+
+
+# --- apptest モード: AppTest でスクリプトを実行し、ボタン操作で進める ---
+
+def _button(at, label):
+    return next(b for b in at.button if b.label == label)
+
+
+def apptest_session(args, recorder, rng):
+    from streamlit.testing.v1 import AppTest
+
+    app = os.path.basename(args.app)
+    at = recorder.timed("first render", lambda: AppTest.from_file(os.path.abspath(args.app), default_timeout=60).run())
+    username = f"student{rng.randrange(args.users)}"
+    at.text_input[0].input(username).run()
+    at.slider[0].set_value(args.questions).run()
+    if app == "eiken_quiz_app.py" and args.review:
+        at.checkbox[0].check().run()
+    recorder.timed("start", lambda: _button(at, "スタート").click().run())
+
+    answered = 0
+    while at.session_state.page == "quiz":
+        if app == "eiken_quiz_app.py":
+            choice = rng.choice([b for b in at.button if b.label not in ("スタート", "履歴を見る")])
+            recorder.timed("answer", lambda: choice.click().run())
+        else:
+            # 選択肢ボタンは押すと st.rerun() するが、AppTest ではボタンの押下状態が再実行後も残って
+            # 再実行が止まらないので、ボタンが行うのと同じ session_state の更新だけを行う
+            choice = rng.choice([b for b in at.button if b.key and b.key.startswith("choice_")])
+            at.session_state.selected_choice = choice.label
+            at.run()
+            recorder.timed("answer", lambda: _button(at, "✅ 解答する").click().run())
+        answered += 1
+        recorder.timed("next", lambda: _button(at, "➡ 次の問題へ").click().run())
+
+    if app == "eiken_quiz_app.py":
+        _button(at, "🔁 もう一度挑戦").click().run()
+        recorder.timed("history", lambda: _button(at, "履歴を見る").click().run())
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return answered
+
+
+def _run_apptest_worker(payload):
+    # AppTest はスレッドから同時に動かせないので、セッションごとにプロセスを分ける
+    args, i = payload
+    recorder = Recorder()
+    rng = random.Random(args.seed * 100003 + i)
+    answered = sum(apptest_session(args, recorder, rng) for _ in range(args.rounds))
+    return recorder.samples, answered
+
+
+def run_apptest(args):
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.sessions) as pool:
+        outputs = pool.map(_run_apptest_worker, [(args, i) for i in range(args.sessions)])
+    elapsed = time.perf_counter() - start
+    samples = {}
+    for worker_samples, _ in outputs:
+        for step, values in worker_samples.items():
+            samples.setdefault(step, []).extend(values)
+    return samples, sum(answered for _, answered in outputs), elapsed, None, None
+
+
+def report(samples, answered, elapsed, lock_waits, lock_errors):
+    print(f"{'step':>14} {'count':>7} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}")
+    for step, values in samples.items():
+        p50, p95, p99 = np.percentile(np.array(values) * 1000, [50, 95, 99])
+        print(f"{step:>14} {len(values):>7} {p50:9.2f} {p95:9.2f} {p99:9.2f}")
+    print(f"解答数: {answered} 件 / {elapsed:.2f} 秒 = {answered / elapsed:.0f} answers/sec")
+    if lock_waits is not None:
+        print(f"接続の待ち合わせ: {lock_waits} 回 / SQLite のロックエラー: {lock_errors} 回")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app", default="eiken_quiz_app.py", choices=sorted(DATA_FLOWS))
+    parser.add_argument("--mode", default="data", choices=["data", "apptest"])
+    parser.add_argument("--sessions", type=int, default=40, help="同時に解いているセッション数")
+    parser.add_argument("--processes", type=int, default=1, help="data モードのプロセス（レプリカ）数")
+    parser.add_argument("--rounds", type=int, default=3, help="1セッションあたりのクイズ回数")
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--review", action="store_true", help="eiken_quiz_app.py の復習モードで開始する")
+    parser.add_argument("--csv", default="words.csv")
+    parser.add_argument("--db", help="既存の DB をコピーして使う（省略時は空の DB）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.mode == "apptest":
+        # AppTest はアプリのカレントディレクトリの quiz_results.db を使うので、そのまま計測する
+        report(*run_apptest(args))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "load_test.db")
+        if args.db:
+            shutil.copy(args.db, db_path)
+        results_db.init_db(results_db.connect(db_path))
+        if args.processes == 1:
+            report(*run_data(args, db_path))
+            return
+
+        with multiprocessing.Pool(args.processes) as pool:
+            outputs = pool.map(_run_data_worker, [(args, db_path, i) for i in range(args.processes)])
+        samples = {}
+        for worker_samples, *_ in outputs:
+            for step, values in worker_samples.items():
+                samples.setdefault(step, []).extend(values)
+        report(
+            samples,
+            sum(o[1] for o in outputs),
+            max(o[2] for o in outputs),
+            sum(o[3] for o in outputs),
+            sum(o[4] for o in outputs),
+        )
+
+
+if __name__ == "__main__":
+    main()
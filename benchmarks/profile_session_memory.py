@@ -0,0 +1,87 @@
+# 同時に N セッションがクイズを解いているときの session_state のメモリ量
+#   変更前: 行の辞書のリスト（+ 解答の辞書、復習モードは JSON から読んだ行を DataFrame にしてから辞書に戻す）
+#   変更後: 問題IDの配列 + 選択肢の並び順（bytes）+ 解答（1問1バイト）
+# 問題バンク・QuestionStore・表示用の辞書はプロセスで共有するので、計測の前に作っておく
+# tracemalloc の値（プロセス内の増分）と、pickle したときの大きさ（セッションを保存・転送する場合）を出す
+# 実行: python -m benchmarks.profile_session_memory --sessions 100 1000 10000
+import argparse
+import json
+import pickle
+import random
+import tracemalloc
+
+import pandas as pd
+
+import question_bank
+
+
+def old_quiz_session(df, rng, questions):
+    quiz = df.sample(n=questions, random_state=rng.randrange(2**32)).to_dict(orient="records")
+    answers = []
+    for q in quiz:
+        choices = q["choices"].split("|")
+        selected = rng.choice(choices)
+        answers.append({"selected": selected, "correct": q["answer"]})
+    return {"quiz": quiz, "user_answers": answers}
+
+
+def old_review_session(mistakes_json, rng, questions):
+    quiz_base = pd.DataFrame(json.loads(mistakes_json))
+    quiz = quiz_base.sample(min(questions, len(quiz_base)), random_state=rng.randrange(2**32)).to_dict(orient="records")
+    for q in quiz:
+        choices = q["choices"].split("|")
+        q["shuffled_choices"] = rng.sample(choices, len(choices))
+    answers = {i: q["shuffled_choices"][0] for i, q in enumerate(quiz)}
+    return {"quiz": quiz, "answers": answers}
+
+
+def new_session(store, rendered, rng, questions):
+    quiz = question_bank.quiz_ids(rng.sample(store.ids, questions))
+    orders = question_bank.choice_orders(rng, rendered, quiz)
+    answers = bytearray()
+    for qid in quiz:
+        choices = rendered[qid]["choices"]
+        selected = rng.choice(choices)
+        answers.append(question_bank.encode_answer(choices, selected, selected == store.get(qid, "answer")))
+    return {"quiz": quiz, "choice_orders": orders, "user_answers": answers}
+
+
+def measure(build, n):
+    tracemalloc.start()
+    sessions = [build() for _ in range(n)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    pickled = sum(len(pickle.dumps(s)) for s in sessions[:min(n, 1000)]) / min(n, 1000)
+    return current, pickled
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("csv", nargs="?", default="words.csv")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    bank = question_bank.load_bank(args.csv)
+    df = bank.to_frame()
+    store = question_bank.QuestionStore(bank)
+    rendered = question_bank.render_questions(df)
+    mistakes_json = json.dumps(df.sample(n=min(30, len(df)), random_state=args.seed).to_dict(orient="records"),
+                               ensure_ascii=False)
+    cases = {
+        "行の辞書": lambda rng: old_quiz_session(df, rng, args.questions),
+        "行の辞書(復習)": lambda rng: old_review_session(mistakes_json, rng, args.questions),
+        "ID配列": lambda rng: new_session(store, rendered, rng, args.questions),
+    }
+
+    print(f"{'sessions':>9} {'session_state':>16} {'total (MB)':>11} {'per session (B)':>16} {'pickle (B)':>11}")
+    for n in args.sessions:
+        for name, build in cases.items():
+            rng = random.Random(args.seed)
+            total, pickled = measure(lambda: build(rng), n)
+            print(f"{n:>9} {name:>16} {total / 1e6:11.2f} {total / n:16.0f} {pickled:11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# 複数の Streamlit プロセス（レプリカ）が同じ解答DBを使うときの整合性チェック
+#   一時ディレクトリの空の DB を共有して、レプリカごとのプロセスが
+#     1) 全員分の集計をバージョン付きでキャッシュする
+#     2) 自分のユーザーの解答を書き込む
+#     3) ほかのレプリカが書いた解答が、バージョンの変化とキャッシュの読み直しで見えることを確かめる
+#   食い違いがあれば終了コード1にする
+# 実行: python -m benchmarks.replica_check --replicas 4 --answers 200
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+
+import results_db
+import shared_state
+
+
+def replica(args, db_path, index, barrier):
+    writer = results_db.ResultWriter(db_path)
+    watcher = shared_state.VersionWatcher(db_path)
+    users = [f"replica{i}" for i in range(args.replicas)]
+    errors = []
+
+    # 1) admin_view と同じく「集計」を results のバージョンをキーにしてキャッシュする
+    cache = {}
+
+    def all_stats():
+        version = watcher.version("results")
+        if version not in cache:
+            cache[version] = results_db.load_all_stats(writer)
+        return cache[version]
+
+    all_stats()
+    results_version = watcher.version("results")
+    user_versions = {user: watcher.version(shared_state.user_key(user)) for user in users + ["nobody"]}
+    barrier.wait()
+
+    # 2) 自分のユーザーの解答を書き込む（バッチ書き込みのスレッドに任せ、最後に flush する）
+    me = users[index]
+    writer.add_many([(me, f"word{j % 50}", f"word{j % 50}", f"word{j % 50}", j % 3 != 0)
+                     for j in range(args.answers)])
+    writer.flush()
+    barrier.wait()
+
+    # 3) ほかのレプリカの書き込みが見えるか
+    if watcher.version("results") == results_version:
+        errors.append("results のバージョンが変わっていない（古い集計を使い続ける）")
+    after = all_stats()
+    for user in users:
+        if watcher.version(shared_state.user_key(user)) == user_versions[user]:
+            errors.append(f"{user} のバージョンが変わっていない")
+        total = int(after.loc[after["user"] == user, "total_count"].sum())
+        if total != args.answers:
+            errors.append(f"{user} の出題数が {total}（期待値 {args.answers}）")
+    if watcher.version(shared_state.user_key("nobody")) != user_versions["nobody"]:
+        errors.append("書き込みの無いユーザーのバージョンが変わった")
+    if writer.lock_errors:
+        errors.append(f"SQLite のロックエラーが {writer.lock_errors} 回")
+
+    writer.close()
+    watcher.close()
+    return index, errors
+
+
+def _run(payload):
+    return replica(*payload)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--replicas", type=int, default=4)
+    parser.add_argument("--answers", type=int, default=200, help="レプリカごとの解答数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "quiz_results.db")
+        results_db.init_db(results_db.connect(db_path))
+        ctx = multiprocessing.get_context("spawn")
+        barrier = ctx.Manager().Barrier(args.replicas)
+        with ctx.Pool(args.replicas) as pool:
+            outputs = pool.map(_run, [(args, db_path, i, barrier) for i in range(args.replicas)])
+
+    failed = False
+    for index, errors in sorted(outputs):
+        print(f"replica{index}: {'OK' if not errors else 'NG'}")
+        for error in errors:
+            print(f"  - {error}")
+        failed = failed or bool(errors)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import sqlite3
+
+# ログイン用のユーザー情報（bcrypt でハッシュ化したパスワード）を SQLite に保存する
+# ハッシュは登録時に1回だけ作り、アプリは load_credentials で読み込んだものをプロセス内で使い回す
+# パスワードの照合はログインしようとしているユーザーの分だけ行う
+
+CREDENTIALS_PATH = "credentials.db"
+BCRYPT_ROUNDS = 12
+
+
+def connect(path=CREDENTIALS_PATH):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS accounts (
+            username TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            password_hash TEXT NOT NULL
+        )
+    ''')
+    return conn
+
+
+def hash_password(password):
+    import bcrypt
+
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(BCRYPT_ROUNDS)).decode("utf-8")
+
+
+def set_accounts(conn, accounts):
+    # accounts: (ユーザー名, 表示名, パスワード) のリスト。同じユーザー名は上書きする
+    rows = [(username, name, hash_password(password)) for username, name, password in accounts]
+    with conn:
+        conn.executemany('''
+            INSERT INTO accounts (username, name, password_hash) VALUES (?, ?, ?)
+            ON CONFLICT (username) DO UPDATE SET name = excluded.name, password_hash = excluded.password_hash
+        ''', rows)
+    return len(rows)
+
+
+def remove_account(conn, username):
+    with conn:
+        return conn.execute("DELETE FROM accounts WHERE username = ?", (username,)).rowcount
+
+
+def load_credentials(path=CREDENTIALS_PATH, defaults=None):
+    # streamlit_authenticator.Authenticate に渡す形式で返す
+    # まだ誰も登録されていなければ defaults（(ユーザー名, 表示名, パスワード) のリスト）を1回だけ登録する
+    conn = connect(path)
+    try:
+        if defaults and conn.execute("SELECT COUNT(*) FROM accounts").fetchone()[0] == 0:
+            set_accounts(conn, defaults)
+        rows = conn.execute("SELECT username, name, password_hash FROM accounts ORDER BY username").fetchall()
+    finally:
+        conn.close()
+    return {"usernames": {username: {"name": name, "password": password_hash}
+                          for username, name, password_hash in rows}}
+
+
+def verify(credentials, username, password):
+    import bcrypt
+
+    account = credentials["usernames"].get(username)
+    if account is None:
+        return False
+    return bcrypt.checkpw(password.encode("utf-8"), account["password"].encode("utf-8"))
+
+
+if __name__ == "__main__":
+    import argparse
+    import csv
+    import getpass
+
+    parser = argparse.ArgumentParser(description="ログイン用ユーザーの管理コマンド")
+    parser.add_argument("--db", default=CREDENTIALS_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    add_parser = sub.add_parser("add", help="ユーザーを追加する（パスワードは入力を求める）")
+    add_parser.add_argument("username")
+    add_parser.add_argument("name")
+    import_parser = sub.add_parser("import", help="username,name,password の CSV からまとめて登録する")
+    import_parser.add_argument("csv")
+    remove_parser = sub.add_parser("remove", help="ユーザーを削除する")
+    remove_parser.add_argument("username")
+    sub.add_parser("list", help="登録済みのユーザーを表示する")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    if args.command == "add":
+        password = getpass.getpass("パスワード: ")
+        set_accounts(conn, [(args.username, args.name, password)])
+        print(f"{args.username} を登録しました")
+    elif args.command == "import":
+        with open(args.csv, "r", encoding="utf-8-sig", newline="") as f:
+            accounts = [(row["username"], row["name"], row["password"]) for row in csv.DictReader(f)]
+        print(f"{set_accounts(conn, accounts)} 人を登録しました")
+    elif args.command == "remove":
+        print(f"{remove_account(conn, args.username)} 人を削除しました")
+    elif args.command == "list":
+        for username, name in conn.execute("SELECT username, name FROM accounts ORDER BY username"):
+            print(f"{username}\t{name}")
@@ -0,0 +1,140 @@
+import datetime
+import time
+
+# 日ごとの正答数の集計（先生向けの正答率の推移）
+#   ユーザー×日（daily_user_stats）と 単語×日（daily_word_stats）の正解数・出題数を持ち、
+#   解答を保存するのと同じトランザクションで加算する（results_db.insert_answers）
+#   日付は解答時刻をサーバーのローカル時刻で切った "YYYY-MM-DD"（SQLite の date(..., 'localtime') と同じ）
+#   推移の問い合わせは集計テーブルだけを読むので、results の件数ではなく日数分のコストで済む
+
+TABLES = {
+    # 集計の単位 → (テーブル, ID の列, 名前の表, 名前の列)
+    "user": ("daily_user_stats", "user_id", "users", "name"),
+    "word": ("daily_word_stats", "word_id", "words", "word"),
+}
+PERIODS = {
+    # 期間 → 日付を期間の最初の日にそろえる式（週は月曜始まり）
+    "day": "d.day",
+    "week": "date(d.day, '-6 days', 'weekday 1')",
+}
+
+
+def create_tables(conn):
+    for table, key, _, _ in TABLES.values():
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                {key} INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                correct_count INTEGER NOT NULL,
+                total_count INTEGER NOT NULL,
+                PRIMARY KEY ({key}, day)
+            ) WITHOUT ROWID
+        ''')
+        # 全員分・全単語分の推移を日付の範囲で読むためのインデックス
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_day ON {table} (day)")
+
+
+def day_of(answered_at):
+    return time.strftime("%Y-%m-%d", time.localtime(answered_at))
+
+
+def apply_answers(conn, records):
+    # records: (user_id, word_id, is_correct, answered_at) のリスト。トランザクションは呼び出し側で管理する
+    days = {}
+    counts = {"user": {}, "word": {}}
+    for user_id, word_id, is_correct, answered_at in records:
+        day = days.get(answered_at)
+        if day is None:
+            day = days[answered_at] = day_of(answered_at)
+        for by, key in (("user", user_id), ("word", word_id)):
+            correct_count, total_count = counts[by].get((key, day), (0, 0))
+            counts[by][(key, day)] = (correct_count + is_correct, total_count + 1)
+    for by, (table, key, _, _) in TABLES.items():
+        conn.executemany(f'''
+            INSERT INTO {table} ({key}, day, correct_count, total_count) VALUES (?, ?, ?, ?)
+            ON CONFLICT ({key}, day) DO UPDATE SET
+                correct_count = correct_count + excluded.correct_count,
+                total_count = total_count + excluded.total_count
+        ''', [(k, day, c, t) for (k, day), (c, t) in counts[by].items()])
+
+
+def apply_results(conn, after_id=0):
+    # results の id > after_id の行を SQL でまとめて加算する（旧データの移行・作り直し用）
+    for table, key, _, _ in TABLES.values():
+        conn.execute(f'''
+            INSERT INTO {table} ({key}, day, correct_count, total_count)
+            SELECT {key}, date(answered_at, 'unixepoch', 'localtime'), SUM(is_correct), COUNT(*)
+            FROM results
+            WHERE id > ?
+            GROUP BY 1, 2
+            ON CONFLICT ({key}, day) DO UPDATE SET
+                correct_count = correct_count + excluded.correct_count,
+                total_count = total_count + excluded.total_count
+        ''', (after_id,))
+
+
+def rebuild(conn):
+    # results から集計し直す（トランザクションは呼び出し側で管理する）
+    for table, _, _, _ in TABLES.values():
+        conn.execute(f"DELETE FROM {table}")
+    apply_results(conn)
+
+
+def trend(writer, by="user", name=None, start=None, end=None, period="day"):
+    # 期間（日・週）ごとの正解数・出題数・正答率。name を省略すると全員（全単語）分を名前ごとに返す
+    # start / end は日付（datetime.date か "YYYY-MM-DD"）で、両端を含む
+    table, key, names, column = TABLES[by]
+    where = []
+    params = []
+    if name is not None:
+        where.append(f"d.{key} = (SELECT id FROM {names} WHERE {column} = ?)")
+        params.append(name)
+    if start is not None:
+        where.append("d.day >= ?")
+        params.append(str(start))
+    if end is not None:
+        where.append("d.day <= ?")
+        params.append(str(end))
+    query = f'''
+        SELECT n.{column} AS {by}, {PERIODS[period]} AS period,
+               SUM(d.correct_count) AS correct_count, SUM(d.total_count) AS total_count
+        FROM {table} d
+        JOIN {names} n ON n.id = d.{key}
+        {"WHERE " + " AND ".join(where) if where else ""}
+        GROUP BY d.{key}, period
+        ORDER BY period, n.{column}
+    '''
+    df = writer.read_sql(query, tuple(params))
+    df["accuracy"] = df["correct_count"] / df["total_count"]
+    if name is not None:
+        df = df.drop(columns=[by])
+    return df
+
+
+def default_range(days=56, today=None):
+    # 推移のグラフの初期表示（今日までの8週間）
+    today = today or datetime.date.today()
+    return today - datetime.timedelta(days=days - 1), today
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import results_db
+    import shared_state
+
+    parser = argparse.ArgumentParser(description="日ごとの集計（正答率の推移）の管理コマンド")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = sub.add_parser("rebuild", help="results から daily_user_stats / daily_word_stats を作り直す")
+    rebuild_parser.add_argument("db", nargs="?", default=results_db.DB_PATH)
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        conn = results_db.connect(args.db)
+        results_db.init_db(conn)
+        with conn:
+            rebuild(conn)
+            shared_state.bump(conn, ["results"])
+        for table, _, _, _ in TABLES.values():
+            count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            print(f"{table} を再構築しました: {count} 件")
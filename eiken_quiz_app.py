@@ -1,68 +1,101 @@
 import streamlit as st
-import pandas as pd
-import random
-import sqlite3
-from datetime import datetime
-import matplotlib.pyplot as plt
+import numpy as np
+import results_db
+import daily_stats
+import srs_scheduler
+import shared_state
+import weighting
+import question_bank
+import bank_registry
+import history_charts
+import quiz_generator
+import quiz_grading
 
 st.set_page_config(page_title="英単語クイズ", layout="centered")
 
-@st.cache_data
-def load_data():
-    return pd.read_csv("words.csv")
+@st.cache_resource
+def get_registry():
+    # 級ごとの問題バンク（banks/*.csv、無ければ words.csv）。各級は最初に選ばれたときに読み込む
+    # CSV が更新されたら、再起動しなくても新しいクイズから新しい版を使う
+    return bank_registry.BankRegistry()
+
+def load_bank(shard=None, version=None):
+    # version を渡すとクイズを作ったときの版を返す（解いている途中に CSV が更新されても問題が変わらない）
+    return get_registry().get(shard).get(version)
+
+@st.cache_data(max_entries=16)
+def load_data(shard, version):
+    return load_bank(shard, version).frame
+
+def load_index(shard=None, version=None):
+    # 出題用インデックス（問題IDの配列と level / tag で絞り込むためのビットマップ）
+    return load_bank(shard, version).index
+
+def load_store(shard=None, version=None):
+    # 問題ID → 行。セッションには問題IDだけを置き、行はここから必要なときに引く
+    return load_bank(shard, version).store
+
+def load_rendered(shard=None, version=None):
+    # 問題ID → 選択肢リストと表示用 HTML（版ごとに1回だけ作り、再実行時は辞書を引くだけにする）
+    return load_bank(shard, version).rendered
+
+@st.cache_resource(max_entries=64)
+def load_word_pool(shard, version, tags):
+    # 間隔反復の出題候補（正解の単語）と、単語 → 問題ID。級・版・タグの絞り込みごとに1回だけ作る
+    df = load_data(shard, version)
+    candidates = load_index(shard, version).candidates(tag=list(tags) or None)
+    pool = df if candidates is None else df.iloc[candidates]
+    return srs_scheduler.WordPool(pool["answer"].tolist()), pool.drop_duplicates("answer").set_index("answer")["id"]
+
+@st.cache_resource
+def get_writer():
+    # プロセス内で共有する書き込み用接続（起動時に1回だけ作成）
+    return results_db.ResultWriter(results_db.DB_PATH)
 
 def init_db():
-    conn = sqlite3.connect("quiz_results.db")
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS results (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT,
-            timestamp TEXT,
-            word TEXT,
-            selected TEXT,
-            correct TEXT,
-            is_correct INTEGER
+    get_writer()
+
+def submit_quiz(graded, username):
+    # クイズ1回分をまとめて保存する（同じクイズの2回目は保存しない）
+    return get_writer().submit(graded, username)
+
+def finish_quiz():
+    # 答えた問題までを採点して保存する（最後まで解いたときと、途中で終了したとき）
+    # 同じクイズは1回だけ採点・保存する（ダブルクリックで2回呼ばれても2重にならない）
+    graded = st.session_state.graded
+    if graded is None or graded.quiz_id != st.session_state.quiz_id:
+        answers = st.session_state.user_answers
+        graded = quiz_grading.grade(
+            st.session_state.quiz_id, st.session_state.quiz[:len(answers)], answers,
+            load_store(st.session_state.bank_shard, st.session_state.bank_version),
+            load_rendered(st.session_state.bank_shard, st.session_state.bank_version)
         )
-    ''')
-    conn.commit()
-    conn.close()
-
-def save_result(user, word, selected, correct, is_correct):
-    conn = sqlite3.connect("quiz_results.db")
-    cursor = conn.cursor()
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    cursor.execute('''
-        INSERT INTO results (username, timestamp, word, selected, correct, is_correct)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (user, timestamp, word, selected, correct, int(is_correct)))
-    conn.commit()
-    conn.close()
+        st.session_state.graded = graded
+    submit_quiz(graded, st.session_state.username)
+
+@st.cache_resource
+def get_watcher():
+    return shared_state.VersionWatcher(results_db.DB_PATH)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def cached_user_stats(username, version):
+    return results_db.load_user_stats(get_writer(), username)
 
 def load_user_stats(username):
-    conn = sqlite3.connect("quiz_results.db")
-    query = '''
-        SELECT word, SUM(is_correct) AS correct_count, COUNT(*) AS total_count
-        FROM results
-        WHERE username = ?
-        GROUP BY word
-    '''
-    stats = pd.read_sql_query(query, conn, params=(username,))
-    conn.close()
-    if not stats.empty:
-        stats["accuracy"] = stats["correct_count"] / stats["total_count"]
-    return stats
+    # そのユーザーの解答が保存されると（どのレプリカでも）"user:<名前>" の番号が上がるので、そのときだけ読み直す
+    return cached_user_stats(username, get_watcher().version(shared_state.user_key(username)))
 
 def load_all_results(username):
-    conn = sqlite3.connect("quiz_results.db")
-    query = '''
-        SELECT word, selected, correct, is_correct, timestamp
-        FROM results
-        WHERE username = ?
-    '''
-    df = pd.read_sql_query(query, conn, params=(username,))
-    conn.close()
-    return df
+    return results_db.load_all_results(get_writer(), username)
+
+def load_trend(username, start, end, period):
+    # 日ごとの集計テーブルだけを読む（解答の件数によらず日数分）
+    return daily_stats.trend(get_writer(), "user", username, start, end, period)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def accuracy_chart(username, version, page, page_size, _stats):
+    # (ユーザー, 集計のバージョン, ページ) ごとに PNG を作って覚えておく（_stats はキーに含めない）
+    return history_charts.accuracy_chart_png(history_charts.page_slice(_stats, page, page_size))
 
 def compute_accuracy(df):
     stats = df.groupby("word").agg(
@@ -72,6 +105,27 @@ def compute_accuracy(df):
     stats["accuracy"] = stats["correct"] / stats["total"]
     return stats.reset_index()
 
+CHOICE_BUTTON_STYLE = """
+    <style>
+        div.stButton > button {
+            background-color: #e0f0ff;
+            margin-bottom: 8px;
+        }
+    </style>
+"""
+
+REVIEW_WEIGHTS = {
+    "正答率が低い単語": "accuracy",
+    "しばらく解いていない単語": "recency",
+    "出題回数が少ない単語": "attempts",
+    "復習の期限が来た単語（間隔反復）": "srs",
+}
+
+TREND_PERIODS = {
+    "日ごと": "day",
+    "週ごと": "week",
+}
+
 # データベース初期化
 init_db()
 
@@ -83,42 +137,97 @@ if "quiz" not in st.session_state:
 if "current_q_idx" not in st.session_state:
     st.session_state.current_q_idx = 0
 if "user_answers" not in st.session_state:
-    st.session_state.user_answers = []
+    st.session_state.user_answers = bytearray()
 if "answered" not in st.session_state:
     st.session_state.answered = False
 if "username" not in st.session_state:
     st.session_state.username = ""
 if "review_mode" not in st.session_state:
     st.session_state.review_mode = False
+if "rng" not in st.session_state:
+    st.session_state.rng = question_bank.new_session_rng()
+if "choice_orders" not in st.session_state:
+    st.session_state.choice_orders = []
+if "bank_shard" not in st.session_state:
+    st.session_state.bank_shard = None
+if "bank_version" not in st.session_state:
+    st.session_state.bank_version = None
+if "quiz_id" not in st.session_state:
+    st.session_state.quiz_id = None
+if "graded" not in st.session_state:
+    st.session_state.graded = None
+if "review_weight" not in st.session_state:
+    st.session_state.review_weight = "正答率が低い単語"
 
 # スタートページ
 if st.session_state.page == "start":
     st.title("📝 英単語クイズ")
     st.session_state.username = st.text_input("あなたの名前を入力してください：", value=st.session_state.username)
+    shards = {get_registry().label(name): name for name in get_registry().names()}
+    if len(shards) > 1:
+        labels = list(shards)
+        current = [label for label, name in shards.items() if name == st.session_state.bank_shard]
+        label = st.selectbox("級・問題集を選んでください", labels, index=labels.index(current[0]) if current else 0)
+        st.session_state.bank_shard = shards[label]
+    else:
+        st.session_state.bank_shard = next(iter(shards.values()))
+    error = get_registry().get(st.session_state.bank_shard).error
+    if error is not None:
+        # 更新された CSV を読み込めなかった（前の版のまま出題している）
+        st.warning(f"問題ファイルの更新を読み込めませんでした。前の版の問題で出題します：{error}")
+    tags = load_index(st.session_state.bank_shard).values("tag")
+    quiz_tags = st.multiselect("タグで絞り込む（空ならすべて）", tags) if tags else []
     num_questions = st.slider("出題する問題数を選んでください", min_value=1, max_value=50, value=10)
 
     st.session_state.review_mode = st.checkbox("復習モードをオンにする（正答率が低い単語を優先）", value=st.session_state.review_mode)
+    if st.session_state.review_mode:
+        st.session_state.review_weight = st.selectbox(
+            "優先のしかた",
+            list(REVIEW_WEIGHTS),
+            index=list(REVIEW_WEIGHTS).index(st.session_state.review_weight)
+        )
 
     col1, col2 = st.columns(2)
     with col1:
         if st.button("スタート") and st.session_state.username.strip():
-            df = load_data()
-            if st.session_state.review_mode:
+            shard = st.session_state.bank_shard
+            version = load_bank(shard).version
+            df = load_data(shard, version)
+            index = load_index(shard, version)
+            # タグで絞り込んだ行の位置（絞り込みなしなら None）
+            candidates = index.candidates(tag=quiz_tags or None)
+            if st.session_state.review_mode and REVIEW_WEIGHTS[st.session_state.review_weight] == "srs":
+                word_pool, word_ids = load_word_pool(shard, version, tuple(quiz_tags))
+                words = srs_scheduler.pick_session(
+                    get_writer(), st.session_state.username, word_pool, num_questions,
+                    rng=st.session_state.rng
+                )
+                ids = word_ids.loc[words].tolist()
+            elif st.session_state.review_mode:
                 stats = load_user_stats(st.session_state.username)
                 if not stats.empty:
-                    df["weight"] = df["answer"].apply(lambda word: 
-                        1.0 if word not in stats["word"].values else 
-                        max(0.1, 1.0 - stats.loc[stats["word"] == word, "accuracy"].values[0])
+                    weights = weighting.compute_weights(
+                        df["answer"], stats, REVIEW_WEIGHTS[st.session_state.review_weight]
                     )
-                    df = df.sample(n=num_questions, weights=df["weight"], replace=True)
+                    if candidates is not None:
+                        # 絞り込みに入らない行は出題しない
+                        weights = np.where(np.isin(np.arange(len(df)), candidates), weights, 0.0)
+                    table = quiz_generator.AliasTable(weights)
+                    ids = index.weighted(num_questions, table, st.session_state.rng)
                 else:
-                    df = df.sample(n=num_questions)
+                    ids = index.sample(num_questions, st.session_state.rng, tag=quiz_tags or None)
             else:
-                df = df.sample(n=num_questions)
-
-            st.session_state.quiz = df.to_dict(orient="records")
+                ids = index.sample(num_questions, st.session_state.rng, tag=quiz_tags or None)
+
+            st.session_state.quiz = question_bank.quiz_ids(ids)
+            st.session_state.bank_version = version
+            st.session_state.quiz_id = quiz_grading.new_quiz_id()
+            st.session_state.graded = None
+            st.session_state.choice_orders = question_bank.choice_orders(
+                st.session_state.rng, load_rendered(shard, version), st.session_state.quiz
+            )
             st.session_state.current_q_idx = 0
-            st.session_state.user_answers = []
+            st.session_state.user_answers = bytearray()
             st.session_state.page = "quiz"
             st.session_state.answered = False
             st.rerun()
@@ -132,7 +241,8 @@ if st.session_state.page == "start":
 elif st.session_state.page == "quiz":
     quiz = st.session_state.quiz
     idx = st.session_state.current_q_idx
-    current_q = quiz[idx]
+    current_q = load_store(st.session_state.bank_shard, st.session_state.bank_version)[quiz[idx]]
+    rendered = load_rendered(st.session_state.bank_shard, st.session_state.bank_version)[quiz[idx]]
 
     st.progress((idx + 1) / len(quiz), text=f"進捗: {int((idx + 1) / len(quiz) * 100)}%")
 
@@ -143,36 +253,30 @@ elif st.session_state.page == "quiz":
             background-color:rgba(240, 248, 255, 0.7); 
             color:inherit;
         '>
-            <b>Q{idx + 1}:</b><br>{current_q['sentence_with_blank'].replace(chr(10), '<br>')}
+            <b>Q{idx + 1}:</b><br>{rendered['sentence_html']}
         </div>
         """, unsafe_allow_html=True)
 
     st.markdown("<br>", unsafe_allow_html=True)
 
-    choices = current_q["choices"].split("|")
-    random.seed(idx)
-    choices = random.sample(choices, len(choices))
+    choices = question_bank.ordered_choices(rendered, st.session_state.choice_orders[idx])
 
     if not st.session_state.answered:
+        st.markdown(CHOICE_BUTTON_STYLE, unsafe_allow_html=True)
         for choice in choices:
             button_key = f"{idx}_{choice}"
-            button_style = """
-                <style>
-                    div.stButton > button {
-                        background-color: #e0f0ff;
-                        margin-bottom: 8px;
-                    }
-                </style>
-            """
-            st.markdown(button_style, unsafe_allow_html=True)
             if st.button(choice, key=button_key, use_container_width=True):
                 correct = current_q["answer"]
-                st.session_state.user_answers.append({"selected": choice, "correct": correct})
+                st.session_state.user_answers.append(
+                    question_bank.encode_answer(rendered["choices"], choice, choice == correct)
+                )
                 st.session_state.answered = True
-                save_result(st.session_state.username, correct, choice, correct, choice == correct)
+                if len(st.session_state.user_answers) == len(quiz):
+                    # 最後の問題に答えたらクイズ全体を採点し、解答をまとめて保存する
+                    finish_quiz()
                 st.rerun()
     else:
-        selected = st.session_state.user_answers[-1]["selected"]
+        selected, _ = question_bank.decode_answer(rendered["choices"], st.session_state.user_answers[-1])
         correct = current_q["answer"]
         if selected == correct:
             st.success(f"✅ 正解！ {correct}")
@@ -180,8 +284,8 @@ elif st.session_state.page == "quiz":
             st.error(f"❌ 不正解... 正解は {correct}")
 
         st.markdown(f"**意味：** {current_q['meaning_jp']}")
-        if pd.notna(current_q["sentence_jp"]):
-            st.markdown(f"**和訳：** {current_q['sentence_jp'].replace(chr(10), '<br>')}", unsafe_allow_html=True)
+        if rendered["translation_html"] is not None:
+            st.markdown(f"**和訳：** {rendered['translation_html']}", unsafe_allow_html=True)
 
         if st.button("➡ 次の問題へ"):
             if idx + 1 < len(quiz):
@@ -192,23 +296,36 @@ elif st.session_state.page == "quiz":
                 st.session_state.page = "review"
                 st.rerun()
 
+    # 途中でやめるときは、ここまでに答えた問題だけを採点して保存する
+    # （解答はクイズの終わりにまとめて保存するので、このボタンを押さずにページを閉じると保存されない）
+    if len(st.session_state.user_answers) < len(quiz) and st.button("⏹ ここで終了して採点する"):
+        if st.session_state.user_answers:
+            finish_quiz()
+            st.session_state.page = "review"
+        else:
+            st.session_state.page = "start"
+        st.rerun()
+
 # 結果ページ
 elif st.session_state.page == "review":
     st.title("📊 結果と復習")
-    score = sum(1 for ans in st.session_state.user_answers if ans["selected"] == ans["correct"])
-    total = len(st.session_state.user_answers)
-    st.markdown(f"### 正解数： {score} / {total}")
+    graded = st.session_state.graded
+    st.markdown(f"### 正解数： {graded.score} / {graded.total}")
 
     st.markdown("---")
     st.markdown("### ❗ 間違えた問題の復習")
-    for i, (q, ans) in enumerate(zip(st.session_state.quiz, st.session_state.user_answers)):
-        if ans["selected"] != ans["correct"]:
+    rendered_questions = load_rendered(st.session_state.bank_shard, st.session_state.bank_version)
+    store = load_store(st.session_state.bank_shard, st.session_state.bank_version)
+    for i, qid, selected, answer, is_correct in graded.items():
+        if not is_correct:
+            rendered = rendered_questions[qid]
+            q = store[qid]
             st.markdown(f"**Q{i+1}:** {q['sentence_with_blank']}")
-            st.markdown(f"- あなたの答え: {ans['selected']}")
-            st.markdown(f"- 正解: **{ans['correct']}**")
+            st.markdown(f"- あなたの答え: {selected}")
+            st.markdown(f"- 正解: **{answer}**")
             st.markdown(f"- 意味: {q['meaning_jp']}")
-            if pd.notna(q['sentence_jp']):
-                st.markdown(f"- 和訳: {q['sentence_jp'].replace(chr(10), '<br>')}", unsafe_allow_html=True)
+            if rendered["translation_html"] is not None:
+                st.markdown(f"- 和訳: {rendered['translation_html']}", unsafe_allow_html=True)
 
     if st.button("🔁 もう一度挑戦"):
         for key in st.session_state.keys():
@@ -223,7 +340,7 @@ elif st.session_state.page == "history":
     if stats.empty:
         st.info("履歴がありません。まずはクイズを解いてみましょう。")
     else:
-        stats = stats.sort_values(by="accuracy")
+        stats = stats.sort_values(by=["accuracy", "word"])
         st.dataframe(stats[["word", "correct_count", "total_count", "accuracy"]].rename(columns={
             "word": "単語",
             "correct_count": "正解数",
@@ -231,23 +348,35 @@ elif st.session_state.page == "history":
             "accuracy": "正答率"
         }), use_container_width=True)
 
-        import matplotlib.ticker as mtick
-        import matplotlib.font_manager as fm
-
-        # 日本語フォント設定（文字化け対策）
-        plt.rcParams["font.family"] = "DejaVu Sans"
-
-        # 単語ごとの正答率グラフ（横向き）
+        # 単語ごとの正答率グラフ（正答率の低い順にページ分けして表示）
         st.subheader("📊 単語ごとの正答率")
-        fig, ax = plt.subplots(figsize=(8, len(stats) * 0.4))
-
-        ax.barh(stats["word"], stats["accuracy"], color="#6fa8dc")
-        ax.set_xlabel("正答率")
-        ax.set_xlim(0, 1.0)
-        ax.xaxis.set_major_formatter(mtick.PercentFormatter(1.0))
+        col1, col2, col3 = st.columns(3)
+        chart_type = col1.radio("グラフ", ["画像", "Streamlit"], horizontal=True)
+        page_size = col2.selectbox("1ページの単語数", history_charts.PAGE_SIZES)
+        page = col3.number_input(
+            "ページ", min_value=1, max_value=history_charts.page_count(stats, page_size), value=1
+        )
 
-        plt.tight_layout()
-        st.pyplot(fig)
+        if chart_type == "画像":
+            version = history_charts.stats_version(stats)
+            st.image(accuracy_chart(st.session_state.username, version, page, page_size, stats))
+        else:
+            st.bar_chart(history_charts.page_slice(stats, page, page_size).set_index("word")["accuracy"])
+
+        # 正答率の推移
+        st.subheader("📈 正答率の推移")
+        col1, col2 = st.columns(2)
+        period = TREND_PERIODS[col1.radio("集計の単位", list(TREND_PERIODS), horizontal=True)]
+        dates = col2.date_input("期間", value=daily_stats.default_range())
+        # 期間を消したときは初期の8週間、終わりの日を選んでいる途中は1日だけを表示する
+        if not dates:
+            dates = daily_stats.default_range()
+        start, end = dates if len(dates) == 2 else (dates[0], dates[0])
+        trend = load_trend(st.session_state.username, start, end, period)
+        if trend.empty:
+            st.info("この期間の解答はありません。")
+        else:
+            st.line_chart(trend.set_index("period")["accuracy"])
 
 
     if st.button("⬅ ホームに戻る"):
@@ -0,0 +1,45 @@
+import io
+
+# 履歴ページの「単語ごとの正答率」グラフ
+# PNG の作成はキャッシュが無いときだけ行い、matplotlib もそのときに初めて読み込む
+# キャッシュのキーは (ユーザー, 集計のバージョン, ページ) で、集計が変わらない限り同じ画像を使い回す
+
+PAGE_SIZES = [20, 50, 100]
+BAR_HEIGHT = 0.3  # 1単語あたりの高さ（インチ）
+
+
+def stats_version(stats):
+    # load_user_stats の結果から、解答が増えたら必ず変わる値を作る
+    if stats.empty:
+        return (0, 0, 0)
+    return (len(stats), int(stats["total_count"].sum()), int(stats["last_answered_at"].max()))
+
+
+def page_count(stats, page_size):
+    return max(1, -(-len(stats) // page_size))
+
+
+def page_slice(stats, page, page_size):
+    # stats は表示順（正答率の低い順など）に並べてから渡す。page は 1 始まり
+    start = (page - 1) * page_size
+    return stats.iloc[start:start + page_size]
+
+
+def accuracy_chart_png(stats):
+    from matplotlib import rc_context
+    from matplotlib.figure import Figure
+    from matplotlib.ticker import PercentFormatter
+
+    # pyplot を使わずに Figure を直接作る（グローバルな状態を持たないのでスレッドから呼んでもよい）
+    with rc_context({"font.family": "DejaVu Sans"}):
+        fig = Figure(figsize=(8, max(2.0, len(stats) * BAR_HEIGHT + 1.0)))
+        ax = fig.subplots()
+        # 上から正答率の低い順に並べる
+        ax.barh(stats["word"].iloc[::-1], stats["accuracy"].iloc[::-1], color="#6fa8dc")
+        ax.set_xlabel("正答率")
+        ax.set_xlim(0, 1.0)
+        ax.xaxis.set_major_formatter(PercentFormatter(1.0))
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", dpi=80)
+    return buffer.getvalue()
@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import history_store
+
+# user_history/ の履歴をファイルごとに流し読みして (ユーザー, 単語) → 出題数・正解数 に集計する
+# ファイルごとの集計結果を (mtime, サイズ) と一緒に覚えておき、再読み込み時は変わったファイルだけ読む
+
+PARALLEL_MIN_FILES = 32  # これより少ないときはプロセスを起動するほうが遅いので順番に読む
+
+
+def aggregate_file(path):
+    counts = {}
+    for record in history_store.iter_records(path):
+        attempts, corrects = counts.get(record["word"], (0, 0))
+        counts[record["word"]] = (attempts + 1, corrects + int(bool(record["correct"])))
+    return counts
+
+
+def file_signature(path):
+    # .jsonl がまだ無いユーザーは移行前の .json を見る
+    for candidate in (path, history_store.legacy_path(path)):
+        if candidate and os.path.exists(candidate):
+            stat = os.stat(candidate)
+            return [candidate, stat.st_mtime_ns, stat.st_size]
+    return None
+
+
+class HistoryAggregator:
+    def __init__(self, directory, workers=0, cache_path=None):
+        self.directory = directory
+        self.workers = workers
+        self.cache_path = cache_path
+        self.lock = threading.Lock()
+        # ユーザー名 → (ファイルの署名, {単語: (出題数, 正解数)})
+        self.partials = {}
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                self.partials = {
+                    user: (signature, {word: tuple(c) for word, c in counts.items()})
+                    for user, (signature, counts) in json.load(f).items()
+                }
+
+    def refresh(self):
+        with self.lock:
+            histories = history_store.list_histories(self.directory) if os.path.isdir(self.directory) else {}
+            changed = {}
+            for user, path in histories.items():
+                signature = file_signature(path)
+                cached = self.partials.get(user)
+                if cached is None or cached[0] != signature:
+                    changed[user] = (signature, path)
+
+            users = list(changed)
+            paths = [changed[user][1] for user in users]
+            if self.workers > 1 and len(paths) >= PARALLEL_MIN_FILES:
+                with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                    results = list(pool.map(aggregate_file, paths, chunksize=8))
+            else:
+                results = [aggregate_file(path) for path in paths]
+
+            for user, counts in zip(users, results):
+                self.partials[user] = (changed[user][0], counts)
+            for user in set(self.partials) - set(histories):
+                del self.partials[user]
+
+            if changed and self.cache_path:
+                self._save_cache()
+            return len(changed)
+
+    def _save_cache(self):
+        tmp_path = f"{self.cache_path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.partials, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+    @property
+    def total_records(self):
+        return sum(attempts for _, counts in self.partials.values() for attempts, _ in counts.values())
+
+    def users(self):
+        return sorted(self.partials)
+
+    def summary(self, user=None):
+        users = [user] if user is not None else self.users()
+        rows = [
+            (name, word, attempts, corrects)
+            for name in users if name in self.partials
+            for word, (attempts, corrects) in self.partials[name][1].items()
+        ]
+        summary = pd.DataFrame(rows, columns=["user", "word", "attempts", "corrects"])
+        summary["accuracy (%)"] = (summary["corrects"] / summary["attempts"] * 100).round(1)
+        return summary
@@ -0,0 +1,210 @@
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows ではファイルロックなしで動かす
+    fcntl = None
+
+# 解答履歴を JSON Lines（1行1レコード）で追記保存する
+# 追記は O(書き込む件数) で、ファイル全体の読み込み・書き直しはしない
+# 旧形式（リスト全体を1つの JSON にした *_history.json）は最初の追記時に自動で移行する
+
+COMPACT_INTERVAL = 24 * 60 * 60  # 秒
+RESUBMIT_WINDOW = 256 * 1024  # バイト（同じクイズの2回目の追記かを調べるファイル末尾の範囲）
+
+
+def history_path(directory, username):
+    return os.path.join(directory, f"{username}_history.jsonl")
+
+
+def legacy_path(path):
+    return path[:-len(".jsonl")] + ".json" if path.endswith(".jsonl") else None
+
+
+def list_histories(directory):
+    # ユーザー名 → 履歴ファイル。移行前の .json しかないユーザーも含める
+    histories = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith("_history.jsonl"):
+            histories[name[:-len("_history.jsonl")]] = os.path.join(directory, name)
+        elif name.endswith("_history.json"):
+            histories.setdefault(name[:-len("_history.json")], os.path.join(directory, name[:-5] + ".jsonl"))
+    return histories
+
+
+def _lock(f):
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+
+def _unlock(f):
+    if fcntl:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _open_locked(path):
+    # ロック待ちの間に compact() でファイルが差し替えられていたら開き直す
+    while True:
+        f = open(path, "a", encoding="utf-8")
+        _lock(f)
+        try:
+            if os.fstat(f.fileno()).st_ino == os.stat(path).st_ino:
+                return f
+        except FileNotFoundError:
+            pass
+        _unlock(f)
+        f.close()
+
+
+def _encode(entries):
+    return "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+
+
+def _read_lines(f):
+    for line in f:
+        # 改行で終わっていない行は書き込み途中なので読まない
+        if not line.endswith("\n"):
+            break
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            continue
+
+
+def _migrate_locked(path):
+    # 呼び出し側が path のロックを取っていること
+    old = legacy_path(path)
+    if not old or not os.path.exists(old):
+        return
+    with open(old, "r", encoding="utf-8") as legacy:
+        records = json.load(legacy)
+    with open(path, "r", encoding="utf-8") as current:
+        records += list(_read_lines(current))
+    _rewrite(path, records)
+    os.replace(old, old + ".migrated")
+
+
+def _rewrite(path, records):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(_encode(records))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _submitted_locked(path, quiz_id):
+    # 呼び出し側が path のロックを取っていること
+    # 答え合わせの2回目はすぐ後に来るので、ファイル全体ではなく末尾だけを調べる
+    marker = json.dumps({"quiz_id": quiz_id}, ensure_ascii=False)[1:-1].encode("utf-8")
+    with open(path, "rb") as f:
+        f.seek(max(0, os.fstat(f.fileno()).st_size - RESUBMIT_WINDOW))
+        return marker in f.read()
+
+
+def append(path, entries, quiz_id=None):
+    # quiz_id を渡すと、同じ quiz_id の行がすでにあれば追記せずに False を返す
+    # （entries の各行に "quiz_id" を入れておくこと。quiz_grading.GradedQuiz.history_records）
+    if not entries:
+        return False
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    data = _encode(entries)
+    f = _open_locked(path)
+    try:
+        if legacy_path(path) and os.path.exists(legacy_path(path)):
+            _migrate_locked(path)
+            f.close()
+            f = _open_locked(path)
+        if quiz_id is not None and _submitted_locked(path, quiz_id):
+            return False
+        # 1回の write でまとめて書くので、同時に追記しても行が混ざらない
+        f.write(data)
+        f.flush()
+    finally:
+        _unlock(f)
+        f.close()
+    maybe_compact(path)
+    return True
+
+
+def iter_records(path):
+    if not os.path.exists(path):
+        old = legacy_path(path)
+        if old and os.path.exists(old):
+            with open(old, "r", encoding="utf-8") as f:
+                yield from json.load(f)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        yield from _read_lines(f)
+
+
+def load_records(path):
+    return list(iter_records(path))
+
+
+def compact(path):
+    # 壊れた行（書き込み途中で落ちた等）を取り除き、ファイルを書き直す
+    if not os.path.exists(path):
+        return 0
+    f = _open_locked(path)
+    try:
+        with open(path, "r", encoding="utf-8") as current:
+            records = list(_read_lines(current))
+        _rewrite(path, records)
+    finally:
+        _unlock(f)
+        f.close()
+    with open(path + ".compacted", "w"):
+        pass
+    return len(records)
+
+
+def maybe_compact(path, interval=COMPACT_INTERVAL):
+    stamp = path + ".compacted"
+    try:
+        last = os.path.getmtime(stamp)
+    except FileNotFoundError:
+        # 初回は基準時刻だけ記録する
+        with open(stamp, "w"):
+            pass
+        return False
+    if time.time() - last < interval:
+        return False
+    compact(path)
+    return True
+
+
+def migrate_directory(directory):
+    migrated = 0
+    for name in sorted(os.listdir(directory)):
+        if name.endswith("_history.json"):
+            path = os.path.join(directory, name[:-len(".json")] + ".jsonl")
+            f = _open_locked(path)
+            try:
+                _migrate_locked(path)
+            finally:
+                _unlock(f)
+                f.close()
+            migrated += 1
+    return migrated
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="解答履歴（JSON Lines）の管理コマンド")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = sub.add_parser("migrate", help="*_history.json を *_history.jsonl に移行する")
+    migrate_parser.add_argument("directory", nargs="?", default="user_history")
+    compact_parser = sub.add_parser("compact", help="履歴ファイルを詰め直す")
+    compact_parser.add_argument("paths", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        count = migrate_directory(args.directory)
+        print(f"{count} 件の履歴ファイルを移行しました")
+    elif args.command == "compact":
+        for path in args.paths:
+            print(f"{path}: {compact(path)} 件")
@@ -0,0 +1,362 @@
+import hashlib
+import html
+import json
+import mmap
+import os
+import random
+from array import array
+
+import numpy as np
+import pandas as pd
+
+import bank_ingest
+
+# words.csv をコンパイルした問題バンク（.bank ファイル）の作成と読み込み
+#
+# ファイル構成（すべて64バイト境界にそろえる）:
+#   MAGIC(8) + ヘッダー長(8, little endian) + ヘッダーJSON
+#   各列の文字列ID配列（int32, 欠損は -1）、choices（int32, 行数×最大選択肢数, 余りは -1）
+#   answer_index（int8, choices の中の正解の位置）、has_translation（bool, 和訳があるか）
+#   文字列のオフセット配列（int64）と UTF-8 の文字列本体
+# 読み込みは mmap で行うので、同じファイルを開いたワーカープロセス間でページが共有される
+
+MAGIC = b"EIKENBK1"
+FORMAT_VERSION = 3
+ALIGN = 64
+TEXT_COLUMNS = ["word", "answer", "sentence_with_blank", "meaning_jp", "sentence_jp", "level", "tag"]
+
+
+def default_bank_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".bank"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_info(csv_path):
+    stat = os.stat(csv_path)
+    return {"path": os.path.basename(csv_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+            "sha256": file_sha256(csv_path)}
+
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def compile_frame(df, out_path, source=None, rejects=0):
+    # df は bank_ingest.ingest で検証・正規化した DataFrame
+    strings = {}
+
+    def intern(value):
+        if not isinstance(value, str):
+            return -1
+        sid = strings.get(value)
+        if sid is None:
+            sid = strings[value] = len(strings)
+        return sid
+
+    arrays = {}
+    if "id" in df:
+        arrays["id"] = df["id"].to_numpy(dtype=np.int64)
+    else:
+        arrays["id"] = np.arange(1, len(df) + 1, dtype=np.int64)
+    for column in TEXT_COLUMNS:
+        values = df[column] if column in df else [None] * len(df)
+        arrays[column] = np.fromiter((intern(v) for v in values), dtype=np.int32, count=len(df))
+
+    split_choices = [c.split("|") if isinstance(c, str) else [] for c in df["choices"]]
+    max_choices = max((len(c) for c in split_choices), default=0)
+    choices = np.full((len(df), max_choices), -1, dtype=np.int32)
+    for i, row in enumerate(split_choices):
+        choices[i, :len(row)] = [intern(c) for c in row]
+    arrays["choices"] = choices
+    arrays["answer_index"] = df["answer_index"].to_numpy(dtype=np.int8)
+    arrays["has_translation"] = df["has_translation"].to_numpy(dtype=np.bool_)
+
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    arrays["string_offsets"] = offsets
+    blob = b"".join(encoded)
+
+    # ヘッダーの長さが決まらないと配列の位置が決まらないので、先に配列の相対位置を計算する
+    layout = {}
+    position = 0
+    for name, array in arrays.items():
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": position}
+        position = _align(position + array.nbytes)
+    blob_offset = position
+
+    header = {
+        "format": FORMAT_VERSION,
+        "rows": len(df),
+        "max_choices": max_choices,
+        "source": source,
+        "rejects": rejects,
+        "arrays": layout,
+        "strings": {"offset": blob_offset, "size": len(blob)},
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    data_start = _align(len(MAGIC) + 8 + len(header_bytes))
+
+    tmp_path = f"{out_path}.tmp-{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.seek(data_start + blob_offset)
+        f.write(blob)
+    # 読み込み中のプロセスがあっても壊れないように、書き終えてから差し替える
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def compile_bank(csv_path="words.csv", out_path=None):
+    out_path = out_path or default_bank_path(csv_path)
+    source = _source_info(csv_path)
+    df, rejects = bank_ingest.ingest(bank_ingest.read_csv(csv_path))
+    bank_ingest.write_report(rejects, bank_ingest.default_report_path(csv_path))
+    if df.empty:
+        # 1問も取り込めなかったときは .bank を書き換えず、前にコンパイルしたファイルを残す
+        raise ValueError(f"{csv_path} から取り込める問題がありません（{len(rejects)} 行を除外）")
+    return compile_frame(df, out_path, source, len(rejects))
+
+
+def read_header(bank_path):
+    with open(bank_path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{bank_path} は問題バンクファイルではありません")
+        size = int.from_bytes(f.read(8), "little")
+        return json.loads(f.read(size).decode("utf-8"))
+
+
+def is_stale(csv_path, bank_path=None):
+    bank_path = bank_path or default_bank_path(csv_path)
+    if not os.path.exists(bank_path):
+        return True
+    try:
+        header = read_header(bank_path)
+    except (OSError, ValueError):
+        return True
+    source = header.get("source") or {}
+    if header.get("format") != FORMAT_VERSION:
+        return True
+    stat = os.stat(csv_path)
+    if source.get("size") == stat.st_size and source.get("mtime_ns") == stat.st_mtime_ns:
+        return False
+    # 更新時刻だけ変わった（チェックアウトし直した等）場合は中身のハッシュで判断する
+    return source.get("sha256") != file_sha256(csv_path)
+
+
+class Bank:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header_size = int.from_bytes(self._mmap[len(MAGIC):len(MAGIC) + 8], "little")
+        self.header = json.loads(self._mmap[len(MAGIC) + 8:len(MAGIC) + 8 + header_size].decode("utf-8"))
+        data_start = _align(len(MAGIC) + 8 + header_size)
+
+        self.arrays = {}
+        for name, spec in self.header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"]))
+            array = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=data_start + spec["offset"])
+            self.arrays[name] = array.reshape(spec["shape"])
+        self._offsets = self.arrays["string_offsets"]
+        self._strings_start = data_start + self.header["strings"]["offset"]
+        self._decoded = None
+
+    def __len__(self):
+        return self.header["rows"]
+
+    @property
+    def ids(self):
+        return self.arrays["id"]
+
+    def string(self, sid):
+        if sid < 0:
+            return None
+        if self._decoded is not None:
+            return self._decoded[sid]
+        start = self._strings_start + int(self._offsets[sid])
+        end = self._strings_start + int(self._offsets[sid + 1])
+        return self._mmap[start:end].decode("utf-8")
+
+    def _all_strings(self):
+        # to_frame などで全件必要になったときだけまとめてデコードする
+        if self._decoded is None:
+            blob = self._mmap[self._strings_start:self._strings_start + self.header["strings"]["size"]]
+            offsets = self._offsets.tolist()
+            self._decoded = [blob[a:b].decode("utf-8") for a, b in zip(offsets, offsets[1:])]
+        return self._decoded
+
+    def text(self, column, i):
+        return self.string(int(self.arrays[column][i]))
+
+    def choices(self, i):
+        return [self.string(int(sid)) for sid in self.arrays["choices"][i] if sid >= 0]
+
+    def row(self, i):
+        record = {"id": int(self.ids[i])}
+        for column in TEXT_COLUMNS:
+            record[column] = self.text(column, i)
+        record["choices"] = "|".join(self.choices(i))
+        record["answer_index"] = int(self.arrays["answer_index"][i])
+        record["has_translation"] = bool(self.arrays["has_translation"][i])
+        return record
+
+    def to_frame(self):
+        strings = self._all_strings()
+
+        def lookup(sids):
+            return [strings[sid] if sid >= 0 else None for sid in sids.tolist()]
+
+        data = {"id": self.ids.copy()}
+        for column in TEXT_COLUMNS:
+            data[column] = lookup(self.arrays[column])
+        data["choices"] = ["|".join(s for s in row if s is not None) for row in
+                           map(lookup, self.arrays["choices"])]
+        data["answer_index"] = self.arrays["answer_index"].copy()
+        data["has_translation"] = self.arrays["has_translation"].copy()
+        return pd.DataFrame(data)[["id", "word", "answer", "choices", "sentence_with_blank",
+                                    "meaning_jp", "sentence_jp", "answer_index", "has_translation",
+                                    "level", "tag"]]
+
+
+def render_question(row):
+    # 画面表示に使う選択肢リストと HTML を作る（再実行のたびに split / replace しないように）
+    # 和訳の有無などの確認は取り込み時（bank_ingest）に済んでいる
+    return {
+        "choices": row["choices"].split("|"),
+        "answer_index": row["answer_index"],
+        "sentence_html": html.escape(row["sentence_with_blank"]).replace("\n", "<br>"),
+        "translation_html": html.escape(row["sentence_jp"]).replace("\n", "<br>") if row["has_translation"] else None,
+    }
+
+
+def render_questions(df):
+    return {row["id"]: render_question(row) for row in df.to_dict(orient="records")}
+
+
+class RenderedQuestions:
+    # 問題ID → render_question の結果。初めて出題されたときに作って覚え、以降の再実行では辞書を引くだけにする
+    # （級ごとに数千問あっても、読み込み時に全問を作らない）
+    def __init__(self, store, rendered=None):
+        self.store = store
+        self.rendered = dict(rendered or {})
+
+    def __len__(self):
+        return len(self.store)
+
+    def __getitem__(self, qid):
+        rendered = self.rendered.get(qid)
+        if rendered is None:
+            rendered = self.rendered[qid] = render_question(self.store[qid])
+        return rendered
+
+
+def new_session_rng():
+    # セッションごとの乱数生成器（プロセス共通の random を再シードしない）
+    return random.Random(int.from_bytes(os.urandom(8), "little"))
+
+
+class QuestionStore:
+    # 問題ID → 行（辞書）。プロセスで1つを共有する読み取り専用のストアで、行は必要になったときに bank から引く
+    def __init__(self, bank):
+        self.bank = bank
+        self.ids = bank.ids.tolist()
+        self.positions = {qid: i for i, qid in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, qid):
+        return qid in self.positions
+
+    def __getitem__(self, qid):
+        return self.bank.row(self.positions[qid])
+
+    def get(self, qid, column):
+        return self.bank.text(column, self.positions[qid])
+
+
+# セッションに置くのは問題IDの配列と、解答1問につき1バイトだけにする
+#   解答のバイト = 元の並びでの選択肢の番号（下位7ビット）+ 正解なら 0x80
+CORRECT_FLAG = 0x80
+NO_ANSWER = 0x7F
+
+
+def quiz_ids(ids):
+    return array("q", ids)
+
+
+def encode_answer(choices, selected, is_correct=False):
+    code = choices.index(selected) if selected in choices else NO_ANSWER
+    return code | CORRECT_FLAG if is_correct else code
+
+
+def decode_answer(choices, code):
+    index = code & ~CORRECT_FLAG
+    return (choices[index] if index < len(choices) else ""), bool(code & CORRECT_FLAG)
+
+
+def choice_orders(rng, rendered, quiz):
+    # クイズ作成時に問題ごとの選択肢の並び順を決めておく（bytes = 小さな整数の配列）
+    orders = []
+    for qid in quiz:
+        n = len(rendered[qid]["choices"])
+        orders.append(bytes(rng.sample(range(n), n)))
+    return orders
+
+
+def ordered_choices(rendered_question, order):
+    return [rendered_question["choices"][j] for j in order]
+
+
+def load_bank(csv_path="words.csv", bank_path=None):
+    bank_path = bank_path or default_bank_path(csv_path)
+    if os.path.exists(csv_path) and is_stale(csv_path, bank_path):
+        compile_bank(csv_path, bank_path)
+    return Bank(bank_path)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="問題バンク（.bank ファイル）の管理コマンド")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_parser = sub.add_parser("build", help="CSV から問題バンクを作成する")
+    build_parser.add_argument("csv", nargs="?", default="words.csv")
+    build_parser.add_argument("-o", "--output")
+    check_parser = sub.add_parser("check", help="問題バンクが CSV より古くないか確認する")
+    check_parser.add_argument("csv", nargs="?", default="words.csv")
+    check_parser.add_argument("-b", "--bank")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        try:
+            path = compile_bank(args.csv, args.output)
+        except ValueError as e:
+            print(e)
+            raise SystemExit(1)
+        start = time.perf_counter()
+        bank = Bank(path)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{path}: {len(bank)} 問, {os.path.getsize(path)} バイト（読み込み {elapsed:.2f} ms）")
+        if bank.header["rejects"]:
+            print(f"除外した行: {bank.header['rejects']} 行（{bank_ingest.default_report_path(args.csv)}）")
+    elif args.command == "check":
+        if is_stale(args.csv, args.bank):
+            print("問題バンクが古いか存在しません。build を実行してください。")
+            raise SystemExit(1)
+        print("問題バンクは最新です")
@@ -0,0 +1,145 @@
+import numpy as np
+
+# 出題する問題を選ぶためのインデックス
+#   sample    : 重複なしで k 問（Floyd の方法なので問題数 n によらず O(k)）
+#   weighted  : 重み付きで k 問（エイリアステーブルを1回作れば1問 O(1)）
+#   weighted_positions : 重み付きで重複なしに k 問（全件に1回のベクトル演算）
+#   絞り込み  : level / tag などの列の値ごとにビットマップ（np.packbits）を持ち、AND / OR で候補を作る
+# 返すのは問題ID（bank の id 列）のリストで、行の辞書は作らない
+
+INDEX_COLUMNS = ["level", "tag"]
+CANDIDATE_CACHE_SIZE = 256
+
+
+def sample_positions(rng, n, k):
+    # range(n) から重複なしで k 個（Floyd の方法のあと、並び順を O(k) でシャッフルする）
+    k = min(k, n)
+    chosen = set()
+    picked = []
+    for j in range(n - k, n):
+        t = rng.randrange(j + 1)
+        if t in chosen:
+            t = j
+        chosen.add(t)
+        picked.append(t)
+    rng.shuffle(picked)
+    return picked
+
+
+def weighted_positions(rng, weights, k):
+    # 重み付きで重複なしに k 個（Efraimidis-Spirakis: キー log(u) / w の大きい順に k 個を1回のベクトル演算で選ぶ）
+    weights = np.asarray(weights, dtype=np.float64)
+    k = min(k, len(weights))
+    if k <= 0:
+        return []
+    keys = np.log(np.random.default_rng(rng.getrandbits(64)).random(len(weights))) / weights
+    top = np.argpartition(-keys, k - 1)[:k]
+    return top[np.argsort(-keys[top])].tolist()
+
+
+class AliasTable:
+    # Vose のエイリアス法。作成は O(n)、1回の抽選は O(1)
+    def __init__(self, weights):
+        weights = np.asarray(weights, dtype=np.float64)
+        total = weights.sum()
+        if len(weights) == 0 or not total > 0:
+            raise ValueError("重みの合計が0です")
+        n = len(weights)
+        prob = weights * (n / total)
+        alias = np.arange(n)
+        small = np.flatnonzero(prob < 1.0)
+        large = np.flatnonzero(prob >= 1.0)
+        # 小さい側と大きい側をまとめて組にして埋めていく（組ごとに大きい側は別の要素なので同時に更新できる）
+        while len(small) >= 64 and len(large) >= 64:
+            m = min(len(small), len(large))
+            s, l = small[:m], large[:m]
+            alias[s] = l
+            prob[l] -= 1.0 - prob[s]
+            still_large = prob[l] >= 1.0
+            small = np.concatenate([small[m:], l[~still_large]])
+            large = np.concatenate([large[m:], l[still_large]])
+        # 残りが少ないとき（大きな重みが少数ある場合など）は1組ずつ処理する
+        small, large = small.tolist(), large.tolist()
+        while small and large:
+            s, l = small.pop(), large.pop()
+            alias[s] = l
+            prob[l] -= 1.0 - prob[s]
+            (small if prob[l] < 1.0 else large).append(l)
+        # 丸め誤差で残ったものは確率1にする
+        prob[small + large] = 1.0
+
+        self.prob = prob.tolist()
+        self.alias = alias.tolist()
+
+    def __len__(self):
+        return len(self.prob)
+
+    def draw(self, rng):
+        i = rng.randrange(len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
+class QuizIndex:
+    def __init__(self, ids, attributes=None):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self._id_list = self.ids.tolist()
+        self._positions = {qid: i for i, qid in enumerate(self._id_list)}
+        # (列, 値) → 該当する行のビットマップ
+        self.bitmaps = {}
+        for column, values in (attributes or {}).items():
+            values = np.asarray(values, dtype=object)
+            for value in dict.fromkeys(values.tolist()):
+                if value is None or value != value:
+                    continue
+                self.bitmaps[(column, value)] = np.packbits(values == value)
+        self._candidates = {}
+
+    @classmethod
+    def from_frame(cls, df, columns=INDEX_COLUMNS):
+        ids = df["id"] if "id" in df else np.arange(1, len(df) + 1)
+        return cls(ids, {column: df[column].to_numpy() for column in columns if column in df})
+
+    def __len__(self):
+        return len(self._id_list)
+
+    def values(self, column):
+        return sorted(value for c, value in self.bitmaps if c == column)
+
+    def positions(self, ids):
+        return [self._positions[qid] for qid in ids]
+
+    def candidates(self, **filters):
+        # 列どうしは AND、1つの列に複数の値を渡したときは OR。絞り込みなしなら None（全件）
+        filters = {c: v for c, v in filters.items() if v is not None}
+        if not filters:
+            return None
+        key = tuple(sorted(
+            (c, tuple(v) if isinstance(v, (list, tuple, set)) else (v,)) for c, v in filters.items()
+        ))
+        cached = self._candidates.get(key)
+        if cached is not None:
+            return cached
+
+        empty = np.zeros((len(self) + 7) // 8, dtype=np.uint8)
+        bits = None
+        for column, values in key:
+            column_bits = empty
+            for value in values:
+                column_bits = column_bits | self.bitmaps.get((column, value), empty)
+            bits = column_bits if bits is None else bits & column_bits
+        positions = np.flatnonzero(np.unpackbits(bits, count=len(self)))
+
+        if len(self._candidates) >= CANDIDATE_CACHE_SIZE:
+            self._candidates.clear()
+        self._candidates[key] = positions
+        return positions
+
+    def sample(self, k, rng, **filters):
+        candidates = self.candidates(**filters)
+        if candidates is None:
+            return [self._id_list[i] for i in sample_positions(rng, len(self), k)]
+        return [self._id_list[candidates[i]] for i in sample_positions(rng, len(candidates), k)]
+
+    def weighted(self, k, table, rng):
+        # 重複あり（df.sample(weights=..., replace=True) と同じ）。table は行の並びでの AliasTable
+        return [self._id_list[table.draw(rng)] for _ in range(k)]
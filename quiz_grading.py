@@ -0,0 +1,77 @@
+import time
+import uuid
+
+import numpy as np
+
+import question_bank
+
+# クイズ全体の答え合わせ
+#   解答（1問1バイト、下位7ビットが選択肢の番号）と bank の answer_index を numpy でまとめて比べ、1問ずつ if で判定しない
+#   結果は GradedQuiz にまとめ、結果ページの表示・解答の保存（results_db / history_store）はこれだけを使う
+#   クイズを作るときに UUID（quiz_id）を付け、答え合わせが2回押されても保存は1回だけにする
+
+
+def new_quiz_id():
+    return uuid.uuid4().hex
+
+
+class GradedQuiz:
+    def __init__(self, quiz_id, quiz, words, selected, answers, correct, graded_at):
+        self.quiz_id = quiz_id
+        self.quiz = quiz  # 問題IDのリスト
+        self.words = words  # 表示と JSON 履歴用
+        self.selected = selected  # 選んだ答え（未解答は ""）
+        self.answers = answers  # 正解
+        self.correct = correct  # 正誤（numpy の bool 配列）
+        self.graded_at = graded_at
+        self.score = int(correct.sum())
+        self.total = len(quiz)
+
+    @property
+    def mistakes(self):
+        # 間違えた問題のID
+        return [qid for qid, ok in zip(self.quiz, self.correct.tolist()) if not ok]
+
+    def items(self):
+        # (問題番号, 問題ID, 選んだ答え, 正解, 正誤)
+        return zip(range(self.total), self.quiz, self.selected, self.answers, self.correct.tolist())
+
+    def result_rows(self, username):
+        # results_db.insert_answers に渡す行。単語の列には正解の形（answer）を入れる
+        # （重み付け・間隔反復・集計は answer で引くので、word と answer が違う行も履歴が分かれない）
+        return [
+            (username, answer, selected, answer, int(ok), self.graded_at)
+            for selected, answer, ok in zip(self.selected, self.answers, self.correct.tolist())
+        ]
+
+    def history_records(self):
+        # history_store に追記する行（quiz_id で同じクイズの2回目の追記を見分ける）
+        # JSON 履歴は従来どおり word 列で記録する（絞り込み復習は df["word"] で引く）
+        return [
+            {"word": word, "correct": ok, "quiz_id": self.quiz_id}
+            for word, ok in zip(self.words, self.correct.tolist())
+        ]
+
+
+def grade(quiz_id, quiz, answers, store, rendered_questions, graded_at=None):
+    # quiz: 問題IDの配列、answers: 解答のバイト列（question_bank.encode_answer）
+    quiz = list(quiz)
+    positions = np.fromiter((store.positions[qid] for qid in quiz), dtype=np.int64, count=len(quiz))
+    codes = np.frombuffer(bytes(answers), dtype=np.uint8)[:len(quiz)] & question_bank.NO_ANSWER
+    if len(codes) < len(quiz):
+        # 最後まで解かなかった問題は未解答として不正解にする
+        codes = np.concatenate([codes, np.full(len(quiz) - len(codes), question_bank.NO_ANSWER, dtype=np.uint8)])
+    correct = codes == store.bank.arrays["answer_index"][positions]
+
+    selected = []
+    for qid, code in zip(quiz, codes.tolist()):
+        choices = rendered_questions[qid]["choices"]
+        selected.append(choices[code] if code < len(choices) else "")
+    return GradedQuiz(
+        quiz_id, quiz,
+        [store.get(qid, "word") for qid in quiz],
+        selected,
+        [store.get(qid, "answer") for qid in quiz],
+        correct,
+        int(time.time()) if graded_at is None else graded_at,
+    )
@@ -0,0 +1,170 @@
+import os
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+import history_store
+import results_db
+import srs_scheduler
+
+# 解答結果を Parquet に書き出して保管し、まとめて読み戻すためのモジュール
+# 書き出しは results をチャンクごとに読み、日付またはユーザーで分けたディレクトリ（date=2024-05-01/ など）に書く
+# 読み戻しは1つのトランザクションで executemany し、最後に間隔反復の状態を作り直す
+
+CHUNK_SIZE = 100_000
+MAX_PARTITIONS = 100_000  # 1つのチャンクに含まれてよい日付・ユーザーの数（pyarrow の既定は 1024）
+PARTITIONS = ["date", "user"]
+
+RESULTS_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("user", pa.string()),
+    ("word", pa.string()),
+    ("selected", pa.string()),
+    ("correct", pa.string()),
+    ("is_correct", pa.int8()),
+    ("answered_at", pa.int64()),  # UNIX 時刻（秒）
+    ("date", pa.string()),  # 解答日（ローカル時刻）。date で分けるときはディレクトリ名になる
+])
+
+# JSON 履歴には正解の単語と解答時刻が無いので、書き出しのみ
+HISTORY_SCHEMA = pa.schema([
+    ("user", pa.string()),
+    ("word", pa.string()),
+    ("selected", pa.string()),
+    ("is_correct", pa.int8()),
+])
+
+IMPORT_COLUMNS = ["user", "word", "selected", "correct", "is_correct", "answered_at"]
+
+
+def _write(batches, schema, out_dir, partition, chunk_size):
+    # 書き出し先に既にファイルがあればエラーにする（古いアーカイブと混ざらないように）
+    ds.write_dataset(
+        batches, out_dir, schema=schema, format="parquet",
+        partitioning=ds.partitioning(pa.schema([schema.field(partition)]), flavor="hive"),
+        basename_template="part-{i}.parquet",
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+        max_partitions=MAX_PARTITIONS, max_rows_per_group=chunk_size,
+    )
+
+
+def _record_batch(rows, schema):
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(zip(*rows), schema)],
+        schema=schema
+    )
+
+
+def export_results(db_path, out_dir, partition="date", chunk_size=CHUNK_SIZE):
+    conn = results_db.connect(db_path)
+    try:
+        cursor = conn.execute('''
+            SELECT r.id, u.name, w.word, s.word, c.word, r.is_correct, r.answered_at,
+                   date(r.answered_at, 'unixepoch', 'localtime')
+            FROM results r
+            JOIN users u ON u.id = r.user_id
+            JOIN words w ON w.id = r.word_id
+            JOIN words s ON s.id = r.selected_id
+            JOIN words c ON c.id = r.correct_id
+            ORDER BY r.id
+        ''')
+        counted = []
+
+        def batches():
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                counted.append(len(rows))
+                yield _record_batch(rows, RESULTS_SCHEMA)
+
+        _write(batches(), RESULTS_SCHEMA, out_dir, partition, chunk_size)
+    finally:
+        conn.close()
+    return sum(counted)
+
+
+def export_histories(directory, out_dir, chunk_size=CHUNK_SIZE):
+    counted = []
+
+    def batches():
+        rows = []
+        for user, path in history_store.list_histories(directory).items():
+            for record in history_store.iter_records(path):
+                rows.append((user, record["word"], record.get("selected"), int(bool(record["correct"]))))
+                if len(rows) >= chunk_size:
+                    counted.append(len(rows))
+                    yield _record_batch(rows, HISTORY_SCHEMA)
+                    rows = []
+        if rows:
+            counted.append(len(rows))
+            yield _record_batch(rows, HISTORY_SCHEMA)
+
+    _write(batches(), HISTORY_SCHEMA, out_dir, "user", chunk_size)
+    return sum(counted)
+
+
+def _partition_key(src_dir):
+    # export_results で書いたディレクトリ（date=... または user=...）から分け方を調べる
+    for name in sorted(os.listdir(src_dir)):
+        key = name.partition("=")[0]
+        if key in PARTITIONS and os.path.isdir(os.path.join(src_dir, name)):
+            return key
+    raise ValueError(f"export_results で書き出したディレクトリではありません: {src_dir}")
+
+
+def import_results(db_path, src_dir, chunk_size=CHUNK_SIZE):
+    # 解答は追記するだけで、同じアーカイブを2回読み込むと2重になる
+    key = _partition_key(src_dir)
+    dataset = ds.dataset(
+        src_dir, format="parquet",
+        partitioning=ds.partitioning(pa.schema([(key, pa.string())]), flavor="hive")
+    )
+    conn = results_db.connect(db_path)
+    results_db.init_db(conn)
+    user_ids, word_ids = {}, {}
+    imported = 0
+    try:
+        with conn:
+            for batch in dataset.to_batches(columns=IMPORT_COLUMNS, batch_size=chunk_size):
+                columns = [batch.column(name).to_pylist() for name in IMPORT_COLUMNS]
+                rows = list(zip(*columns))
+                # 間隔反復の状態は時刻順に再生する必要があるので、最後にまとめて作り直す
+                results_db.insert_answers(conn, rows, user_ids, word_ids, schedule=False)
+                imported += len(rows)
+            if imported:
+                srs_scheduler.rebuild(conn)
+    finally:
+        conn.close()
+    return imported
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="解答結果の Parquet への書き出し・読み戻し")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_parser = sub.add_parser("export-results", help="results を日付またはユーザーごとの Parquet に書き出す")
+    export_parser.add_argument("out_dir")
+    export_parser.add_argument("--db", default=results_db.DB_PATH)
+    export_parser.add_argument("--partition", choices=PARTITIONS, default="date")
+    export_parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    histories_parser = sub.add_parser("export-histories", help="JSON 履歴をユーザーごとの Parquet に書き出す")
+    histories_parser.add_argument("out_dir")
+    histories_parser.add_argument("--directory", default="user_history")
+    histories_parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    import_parser = sub.add_parser("import-results", help="export-results で書き出した Parquet を results に追加する")
+    import_parser.add_argument("src_dir")
+    import_parser.add_argument("--db", default=results_db.DB_PATH)
+    import_parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    if args.command == "export-results":
+        count = export_results(args.db, args.out_dir, args.partition, args.chunk_size)
+        print(f"{count} 件を {args.out_dir} に書き出しました")
+    elif args.command == "export-histories":
+        count = export_histories(args.directory, args.out_dir, args.chunk_size)
+        print(f"{count} 件を {args.out_dir} に書き出しました")
+    elif args.command == "import-results":
+        count = import_results(args.db, args.src_dir, args.chunk_size)
+        print(f"{count} 件を {args.db} に読み込みました")
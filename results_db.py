@@ -0,0 +1,544 @@
+import atexit
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+import daily_stats
+import shared_state
+import srs_scheduler
+
+# 解答結果の書き込みをまとめて行うための共有モジュール
+# プロセスごとに1本のWAL接続を持ち、INSERTはバッファにためて
+# バックグラウンドスレッドが件数または時間でまとめて書き込む
+
+# 複数のプロセス（レプリカ）で動かすときは、全プロセスで同じファイルを EIKEN_RESULTS_DB で指定する
+DB_PATH = os.environ.get("EIKEN_RESULTS_DB", "quiz_results.db")
+BATCH_SIZE = 100
+FLUSH_INTERVAL = 0.5  # 秒
+
+
+def connect(path=DB_PATH):
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+SCHEMA_VERSION = 7
+MIGRATE_CHUNK_SIZE = 5000
+MIGRATE_PAUSE = 0.05  # 秒（チャンク間で書き込みを他の接続に譲る）
+
+
+def _migrate_v2(conn):
+    # 旧スキーマ（文字列を毎行保存する results）は results_legacy に退避し、
+    # 中身は migrate_legacy() で少しずつ新テーブルへ移す
+    has_legacy = conn.execute(
+        "SELECT 1 FROM pragma_table_info('results') WHERE name = 'username'"
+    ).fetchone()
+    if has_legacy:
+        conn.execute("ALTER TABLE results RENAME TO results_legacy")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS words (
+            id INTEGER PRIMARY KEY,
+            word TEXT NOT NULL UNIQUE
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS results (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            word_id INTEGER NOT NULL REFERENCES words (id),
+            selected_id INTEGER NOT NULL REFERENCES words (id),
+            correct_id INTEGER NOT NULL REFERENCES words (id),
+            is_correct INTEGER NOT NULL,
+            answered_at INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_results_user_word
+        ON results (user_id, word_id, is_correct)
+    ''')
+
+
+def _migrate_v3(conn):
+    # ユーザー×単語ごとの集計を持つテーブル。解答の保存と同じトランザクションで更新する
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS user_word_stats (
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            word_id INTEGER NOT NULL REFERENCES words (id),
+            correct_count INTEGER NOT NULL,
+            total_count INTEGER NOT NULL,
+            last_answered_at INTEGER NOT NULL,
+            PRIMARY KEY (user_id, word_id)
+        ) WITHOUT ROWID
+    ''')
+    rebuild_user_word_stats(conn)
+
+
+def _migrate_v4(conn):
+    # 間隔反復の状態は解答の順序に依存するので、既存の結果を再生して作る
+    srs_scheduler.create_tables(conn)
+    srs_scheduler.rebuild(conn)
+
+
+def _migrate_v5(conn):
+    # レプリカ間でキャッシュを捨てるタイミングを知らせるためのバージョン番号
+    shared_state.create_tables(conn)
+
+
+def _migrate_v6(conn):
+    # 答え合わせ済みのクイズ。quiz_id が主キーなので、同じクイズの解答を2回保存しない
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS graded_quizzes (
+            quiz_id TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            score INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            graded_at INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+
+def _migrate_v7(conn):
+    # 日ごとの集計（正答率の推移）。既存の結果から作っておく
+    daily_stats.create_tables(conn)
+    daily_stats.rebuild(conn)
+
+
+# (バージョン, 移行関数) の順に並べる。バージョン1はバージョン管理前の旧スキーマ
+MIGRATIONS = [
+    (2, _migrate_v2),
+    (3, _migrate_v3),
+    (4, _migrate_v4),
+    (5, _migrate_v5),
+    (6, _migrate_v6),
+    (7, _migrate_v7),
+]
+
+
+def init_db(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+    # 複数プロセスが同時に起動しても移行が1回だけ走るように書き込みロックを取ってから確認する
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for target, migrate in MIGRATIONS:
+            if version < target:
+                migrate(conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+UPSERT_STATS_SQL = '''
+    INSERT INTO user_word_stats (user_id, word_id, correct_count, total_count, last_answered_at)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (user_id, word_id) DO UPDATE SET
+        correct_count = correct_count + excluded.correct_count,
+        total_count = total_count + excluded.total_count,
+        last_answered_at = MAX(last_answered_at, excluded.last_answered_at)
+'''
+
+
+def rebuild_user_word_stats(conn):
+    # results から集計し直す（トランザクションは呼び出し側で管理する）
+    conn.execute("DELETE FROM user_word_stats")
+    conn.execute('''
+        INSERT INTO user_word_stats (user_id, word_id, correct_count, total_count, last_answered_at)
+        SELECT user_id, word_id, SUM(is_correct), COUNT(*), MAX(answered_at)
+        FROM results
+        GROUP BY user_id, word_id
+    ''')
+
+
+def check_user_word_stats(conn):
+    # results から計算した値と user_word_stats が食い違う (user_id, word_id) を返す
+    return conn.execute('''
+        WITH raw AS (
+            SELECT user_id, word_id, SUM(is_correct) AS correct_count, COUNT(*) AS total_count
+            FROM results
+            GROUP BY user_id, word_id
+        )
+        SELECT raw.user_id, raw.word_id, raw.correct_count, raw.total_count,
+               s.correct_count, s.total_count
+        FROM raw
+        LEFT JOIN user_word_stats s USING (user_id, word_id)
+        WHERE s.total_count IS NULL
+           OR s.correct_count != raw.correct_count
+           OR s.total_count != raw.total_count
+        UNION ALL
+        SELECT s.user_id, s.word_id, NULL, NULL, s.correct_count, s.total_count
+        FROM user_word_stats s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM results r WHERE r.user_id = s.user_id AND r.word_id = s.word_id
+        )
+    ''').fetchall()
+
+
+def has_legacy_results(conn):
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'results_legacy'"
+    ).fetchone()
+    return row is not None
+
+
+def migrate_legacy_chunk(conn, chunk_size=MIGRATE_CHUNK_SIZE):
+    # 移した行は同じトランザクションで results_legacy から消すので、途中で止めても再開できる
+    with conn:
+        row = conn.execute('''
+            SELECT COUNT(*), MAX(id) FROM (
+                SELECT id FROM results_legacy ORDER BY id LIMIT ?
+            )
+        ''', (chunk_size,)).fetchone()
+        count, max_id = row
+        if not count:
+            return 0
+        last_result_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM results").fetchone()[0]
+        conn.execute('''
+            INSERT OR IGNORE INTO users (name)
+            SELECT DISTINCT COALESCE(username, '') FROM results_legacy WHERE id <= ?
+        ''', (max_id,))
+        conn.execute('''
+            INSERT OR IGNORE INTO words (word)
+            SELECT COALESCE(word, '') FROM results_legacy WHERE id <= ?
+            UNION SELECT COALESCE(selected, '') FROM results_legacy WHERE id <= ?
+            UNION SELECT COALESCE(correct, '') FROM results_legacy WHERE id <= ?
+        ''', (max_id, max_id, max_id))
+        conn.execute('''
+            INSERT INTO results (user_id, word_id, selected_id, correct_id, is_correct, answered_at)
+            SELECT u.id, w.id, s.id, c.id, COALESCE(l.is_correct, 0),
+                   COALESCE(CAST(strftime('%s', l.timestamp, 'utc') AS INTEGER), 0)
+            FROM results_legacy l
+            JOIN users u ON u.name = COALESCE(l.username, '')
+            JOIN words w ON w.word = COALESCE(l.word, '')
+            JOIN words s ON s.word = COALESCE(l.selected, '')
+            JOIN words c ON c.word = COALESCE(l.correct, '')
+            WHERE l.id <= ?
+            ORDER BY l.id
+        ''', (max_id,))
+        conn.execute('''
+            INSERT INTO user_word_stats (user_id, word_id, correct_count, total_count, last_answered_at)
+            SELECT u.id, w.id, SUM(COALESCE(l.is_correct, 0)), COUNT(*),
+                   MAX(COALESCE(CAST(strftime('%s', l.timestamp, 'utc') AS INTEGER), 0))
+            FROM results_legacy l
+            JOIN users u ON u.name = COALESCE(l.username, '')
+            JOIN words w ON w.word = COALESCE(l.word, '')
+            WHERE l.id <= ?
+            GROUP BY u.id, w.id
+            ON CONFLICT (user_id, word_id) DO UPDATE SET
+                correct_count = correct_count + excluded.correct_count,
+                total_count = total_count + excluded.total_count,
+                last_answered_at = MAX(last_answered_at, excluded.last_answered_at)
+        ''', (max_id,))
+        daily_stats.apply_results(conn, last_result_id)
+        users = [name for (name,) in conn.execute('''
+            SELECT DISTINCT COALESCE(username, '') FROM results_legacy WHERE id <= ?
+        ''', (max_id,))]
+        shared_state.bump(conn, ["results"] + [shared_state.user_key(name) for name in users])
+        conn.execute("DELETE FROM results_legacy WHERE id <= ?", (max_id,))
+    return count
+
+
+def migrate_legacy(conn, chunk_size=MIGRATE_CHUNK_SIZE, pause=MIGRATE_PAUSE, progress=None):
+    # 稼働中のクイズを止めないよう、短いトランザクションに分けて移す
+    total = 0
+    while has_legacy_results(conn):
+        moved = migrate_legacy_chunk(conn, chunk_size)
+        if not moved:
+            with conn:
+                conn.execute("DROP TABLE results_legacy")
+            break
+        total += moved
+        if progress:
+            progress(total)
+        time.sleep(pause)
+    return total
+
+
+def lookup_ids(conn, table, column, cache, names):
+    missing = {name for name in names if name not in cache}
+    if missing:
+        conn.executemany(
+            f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)",
+            [(name,) for name in missing]
+        )
+        for name in missing:
+            cache[name] = conn.execute(
+                f"SELECT id FROM {table} WHERE {column} = ?", (name,)
+            ).fetchone()[0]
+
+
+def insert_answers(conn, rows, user_ids, word_ids, schedule=True):
+    # rows: (ユーザー, 単語, 選んだ答え, 正解, 正誤, 解答時刻) のリスト。トランザクションは呼び出し側で管理する
+    # user_ids / word_ids は名前 → ID のキャッシュ（呼び出し側で持ち回る）
+    lookup_ids(conn, "users", "name", user_ids, [row[0] for row in rows])
+    lookup_ids(conn, "words", "word", word_ids, [w for row in rows for w in row[1:4]])
+    records = [
+        (user_ids[user], word_ids[word], word_ids[selected], word_ids[correct],
+         is_correct, answered_at)
+        for user, word, selected, correct, is_correct, answered_at in rows
+    ]
+    conn.executemany('''
+        INSERT INTO results (user_id, word_id, selected_id, correct_id, is_correct, answered_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', records)
+
+    # バッチ内で同じ単語をまとめてから集計テーブルに加算する
+    stats = {}
+    for user_id, word_id, _, _, is_correct, answered_at in records:
+        correct_count, total_count, last = stats.get((user_id, word_id), (0, 0, 0))
+        stats[(user_id, word_id)] = (correct_count + is_correct, total_count + 1, max(last, answered_at))
+    conn.executemany(UPSERT_STATS_SQL, [
+        (user_id, word_id, correct_count, total_count, last)
+        for (user_id, word_id), (correct_count, total_count, last) in stats.items()
+    ])
+    daily_stats.apply_answers(conn, [
+        (user_id, word_id, is_correct, answered_at)
+        for user_id, word_id, _, _, is_correct, answered_at in records
+    ])
+    if schedule:
+        srs_scheduler.apply_answers(conn, [
+            (user_id, word_id, is_correct, answered_at)
+            for user_id, word_id, _, _, is_correct, answered_at in records
+        ])
+    # ほかのレプリカのキャッシュを無効にする
+    shared_state.bump(conn, ["results"] + [shared_state.user_key(row[0]) for row in rows])
+
+
+def record_quiz(conn, quiz_id, user, rows, user_ids, word_ids, score=None):
+    # クイズ1回分の解答をまとめて保存する。同じ quiz_id が保存済みなら何もせず False を返す
+    # トランザクションは呼び出し側で管理する（記録と解答の保存を同じトランザクションで行う）
+    lookup_ids(conn, "users", "name", user_ids, [user])
+    graded_at = max((row[5] for row in rows), default=int(time.time()))
+    if score is None:
+        score = sum(row[4] for row in rows)
+    cursor = conn.execute('''
+        INSERT OR IGNORE INTO graded_quizzes (quiz_id, user_id, score, total, graded_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (quiz_id, user_ids[user], score, len(rows), graded_at))
+    if not cursor.rowcount:
+        return False
+    if rows:
+        insert_answers(conn, rows, user_ids, word_ids)
+    return True
+
+
+class ResultWriter:
+    def __init__(self, path=DB_PATH, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.conn = connect(path)
+        # 接続はスレッド間で共有するのでロックで排他する
+        self.db_lock = threading.Lock()
+        # 負荷試験用の計測値（接続の取り合い・SQLite のロックエラーの回数）
+        self.lock_waits = 0
+        self.lock_errors = 0
+        self.cond = threading.Condition()
+        self.buffer = []
+        self.closed = False
+        # 名前 → 整数IDのキャッシュ（users / words は追記のみなので失効しない）
+        self.user_ids = {}
+        self.word_ids = {}
+
+        with self.db_lock:
+            init_db(self.conn)
+
+        self.thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def add(self, user, word, selected, correct, is_correct):
+        self.add_many([(user, word, selected, correct, is_correct)])
+
+    def add_many(self, answers):
+        answered_at = int(time.time())
+        rows = [
+            (user, word, selected, correct, int(is_correct), answered_at)
+            for user, word, selected, correct, is_correct in answers
+        ]
+        with self.cond:
+            self.buffer.extend(rows)
+            closed = self.closed
+            if len(self.buffer) >= self.batch_size:
+                self.cond.notify()
+        # 終了後に届いた結果は取りこぼさないようにその場で書き込む
+        if closed:
+            self.flush()
+
+    def submit(self, graded, username):
+        # 答え合わせ（quiz_grading.GradedQuiz）の解答をバッファを通さず1つのトランザクションで保存する
+        # 戻り値: 保存したら True、同じクイズが保存済み（2回目の答え合わせ）なら False
+        # 先にバッファを書き込んでおき、間隔反復の状態が解答の順に更新されるようにする
+        self.flush()
+        with self.locked():
+            with self.conn:
+                return record_quiz(
+                    self.conn, graded.quiz_id, username, graded.result_rows(username),
+                    self.user_ids, self.word_ids, graded.score
+                )
+
+    @contextlib.contextmanager
+    def locked(self):
+        if not self.db_lock.acquire(blocking=False):
+            self.lock_waits += 1
+            self.db_lock.acquire()
+        try:
+            yield self.conn
+        finally:
+            self.db_lock.release()
+
+    def flush(self):
+        with self.locked():
+            with self.cond:
+                rows, self.buffer = self.buffer, []
+            if not rows:
+                return 0
+            try:
+                with self.conn:
+                    self._insert(rows)
+            except sqlite3.Error as e:
+                if "locked" in str(e):
+                    self.lock_errors += 1
+                # 失敗した分はバッファに戻して次回に書き直す
+                with self.cond:
+                    self.buffer[:0] = rows
+                raise
+            return len(rows)
+
+    def _insert(self, rows):
+        insert_answers(self.conn, rows, self.user_ids, self.word_ids)
+
+    def read_sql(self, query, params=()):
+        # 未書き込みの結果を先に反映させてから読む（自分の解答がすぐ履歴に出るように）
+        self.flush()
+        with self.locked():
+            return pd.read_sql_query(query, self.conn, params=params)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                if not self.closed and len(self.buffer) < self.batch_size:
+                    self.cond.wait(self.flush_interval)
+                closed = self.closed
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # 書き込みに失敗しても次の周期で再試行できるようにスレッドは止めない
+                pass
+            if closed:
+                return
+
+    def close(self):
+        with self.cond:
+            if self.closed:
+                return
+            self.closed = True
+            self.cond.notify()
+        self.thread.join()
+        self.flush()
+
+
+def load_user_stats(writer, username):
+    query = '''
+        SELECT w.word, s.correct_count, s.total_count, s.last_answered_at
+        FROM user_word_stats s
+        JOIN words w ON w.id = s.word_id
+        WHERE s.user_id = (SELECT id FROM users WHERE name = ?)
+    '''
+    stats = writer.read_sql(query, (username,))
+    # 解答がないユーザーでも列はそろえる（storage のほかの保存先と同じ）
+    stats["accuracy"] = stats["correct_count"] / stats["total_count"]
+    return stats
+
+
+def load_all_stats(writer):
+    query = '''
+        SELECT u.name AS user, w.word, s.correct_count, s.total_count, s.last_answered_at
+        FROM user_word_stats s
+        JOIN users u ON u.id = s.user_id
+        JOIN words w ON w.id = s.word_id
+    '''
+    stats = writer.read_sql(query)
+    stats["accuracy"] = stats["correct_count"] / stats["total_count"]
+    return stats
+
+
+def load_all_results(writer, username, start=None, end=None):
+    # start / end（UNIX 時刻）を渡すとその範囲の解答だけを読む。日ごとの推移は daily_stats.trend を使う
+    query = '''
+        SELECT w.word, s.word AS selected, c.word AS correct, r.is_correct,
+               datetime(r.answered_at, 'unixepoch', 'localtime') AS timestamp
+        FROM results r
+        JOIN words w ON w.id = r.word_id
+        JOIN words s ON s.id = r.selected_id
+        JOIN words c ON c.id = r.correct_id
+        WHERE r.user_id = (SELECT id FROM users WHERE name = ?)
+          AND r.answered_at >= ? AND r.answered_at < ?
+        ORDER BY r.answered_at, r.id
+    '''
+    return writer.read_sql(query, (
+        username, 0 if start is None else start, 2 ** 62 if end is None else end
+    ))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="quiz_results.db の管理コマンド")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = sub.add_parser("migrate", help="旧スキーマの解答結果を新スキーマへ移行する")
+    migrate_parser.add_argument("db", nargs="?", default=DB_PATH)
+    migrate_parser.add_argument("--chunk-size", type=int, default=MIGRATE_CHUNK_SIZE)
+    migrate_parser.add_argument("--pause", type=float, default=MIGRATE_PAUSE)
+    rebuild_parser = sub.add_parser("rebuild-stats", help="user_word_stats を results から作り直す")
+    rebuild_parser.add_argument("db", nargs="?", default=DB_PATH)
+    check_parser = sub.add_parser("check-stats", help="user_word_stats と results の集計を突き合わせる")
+    check_parser.add_argument("db", nargs="?", default=DB_PATH)
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        conn = connect(args.db)
+        init_db(conn)
+        moved = migrate_legacy(
+            conn, args.chunk_size, args.pause,
+            progress=lambda total: print(f"移行済み: {total} 件", flush=True)
+        )
+        if moved:
+            # 旧データは新しい解答より後から入るので、間隔反復の状態は時刻順に再生し直す
+            with conn:
+                srs_scheduler.rebuild(conn)
+        print(f"完了: {moved} 件を移行しました（スキーマ v{SCHEMA_VERSION}）")
+    elif args.command == "rebuild-stats":
+        conn = connect(args.db)
+        init_db(conn)
+        with conn:
+            rebuild_user_word_stats(conn)
+            shared_state.bump(conn, ["results"])
+        count = conn.execute("SELECT COUNT(*) FROM user_word_stats").fetchone()[0]
+        print(f"user_word_stats を再構築しました: {count} 件")
+    elif args.command == "check-stats":
+        conn = connect(args.db)
+        init_db(conn)
+        mismatches = check_user_word_stats(conn)
+        for user_id, word_id, raw_correct, raw_total, correct_count, total_count in mismatches[:20]:
+            print(f"user_id={user_id} word_id={word_id} results={raw_correct}/{raw_total} "
+                  f"stats={correct_count}/{total_count}")
+        if mismatches:
+            print(f"不一致: {len(mismatches)} 件（rebuild-stats で修復できます）")
+            raise SystemExit(1)
+        print("user_word_stats は results と一致しています")
@@ -0,0 +1,66 @@
+import os
+import sqlite3
+import threading
+
+# 複数の Streamlit プロセス（レプリカ）で共有する状態のバージョン番号
+#   解答DB（SQLite, WAL）の shared_versions に名前ごとの番号を持ち、書き込んだ側が同じトランザクションで1つ上げる
+#   読む側は番号をキャッシュのキーに含めるので、どのレプリカで書かれても次の再実行で読み直される
+#   名前: "results"（解答全体）、"user:<ユーザー名>"（そのユーザーの解答）
+# ファイル（問題バンクなど）は (inode, mtime, サイズ) をそのままバージョンとして使う
+
+
+def create_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS shared_versions (
+            key TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+
+def bump(conn, keys):
+    # トランザクションは呼び出し側で管理する
+    conn.executemany('''
+        INSERT INTO shared_versions (key, version) VALUES (?, 1)
+        ON CONFLICT (key) DO UPDATE SET version = version + 1
+    ''', [(key,) for key in dict.fromkeys(keys)])
+
+
+def user_key(username):
+    return f"user:{username}"
+
+
+def file_version(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class VersionWatcher:
+    # 読み取り専用の接続を1本持ち、PRAGMA data_version が変わったとき（= ほかの接続がコミットしたとき）だけ
+    # 番号を読み直す。変わっていなければ SQL を実行せずに覚えている番号を返す
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.lock = threading.Lock()
+        self.data_version = None
+        self.cache = {}
+
+    def version(self, key):
+        with self.lock:
+            data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self.data_version:
+                self.data_version = data_version
+                self.cache.clear()
+            if key not in self.cache:
+                try:
+                    row = self.conn.execute("SELECT version FROM shared_versions WHERE key = ?", (key,)).fetchone()
+                except sqlite3.OperationalError:
+                    # まだ移行前で表が無い
+                    row = None
+                self.cache[key] = row[0] if row else 0
+            return self.cache[key]
+
+    def close(self):
+        self.conn.close()
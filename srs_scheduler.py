@@ -0,0 +1,205 @@
+import random
+import time
+
+# 間隔反復（SM-2 方式）の出題スケジューラー
+# ユーザー×単語ごとに ease / interval / due を srs_state に持ち、
+# (user_id, due_at) のインデックスを期限の近い順に、出題できる N 語が見つかるまで LIMIT 件ずつ読む
+
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+RELEARN_INTERVAL = 10 / (24 * 60)  # 間違えた単語は10分後にもう一度出す（日単位）
+QUALITY_CORRECT = 4
+QUALITY_WRONG = 1
+
+
+def create_tables(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS srs_state (
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            word_id INTEGER NOT NULL REFERENCES words (id),
+            ease REAL NOT NULL,
+            interval_days REAL NOT NULL,
+            reps INTEGER NOT NULL,
+            lapses INTEGER NOT NULL,
+            due_at INTEGER NOT NULL,
+            last_answered_at INTEGER NOT NULL,
+            PRIMARY KEY (user_id, word_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_srs_state_due
+        ON srs_state (user_id, due_at)
+    ''')
+
+
+def sm2(state, is_correct, answered_at):
+    ease, interval_days, reps, lapses = state
+    quality = QUALITY_CORRECT if is_correct else QUALITY_WRONG
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    if is_correct:
+        reps += 1
+        if reps == 1:
+            interval_days = 1.0
+        elif reps == 2:
+            interval_days = 6.0
+        else:
+            interval_days = interval_days * ease
+    else:
+        reps = 0
+        lapses += 1
+        interval_days = RELEARN_INTERVAL
+    due_at = int(answered_at + interval_days * 86400)
+    return (ease, interval_days, reps, lapses), due_at
+
+
+def apply_answers(conn, records):
+    # records: (user_id, word_id, is_correct, answered_at) のリスト。トランザクションは呼び出し側で管理する
+    states = {}
+    for user_id, word_id, is_correct, answered_at in sorted(records, key=lambda r: r[3]):
+        key = (user_id, word_id)
+        if key not in states:
+            row = conn.execute('''
+                SELECT ease, interval_days, reps, lapses, due_at, last_answered_at
+                FROM srs_state WHERE user_id = ? AND word_id = ?
+            ''', key).fetchone()
+            states[key] = ((row[0], row[1], row[2], row[3]), row[4], row[5]) if row else \
+                ((INITIAL_EASE, 0.0, 0, 0), 0, 0)
+        state, _, _ = states[key]
+        state, due_at = sm2(state, is_correct, answered_at)
+        states[key] = (state, due_at, answered_at)
+
+    conn.executemany('''
+        INSERT OR REPLACE INTO srs_state
+            (user_id, word_id, ease, interval_days, reps, lapses, due_at, last_answered_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (user_id, word_id, ease, interval_days, reps, lapses, due_at, last)
+        for (user_id, word_id), ((ease, interval_days, reps, lapses), due_at, last) in states.items()
+    ])
+
+
+def rebuild(conn, chunk_size=50000):
+    # results を時刻順に再生して srs_state を作り直す（トランザクションは呼び出し側で管理する）
+    conn.execute("DELETE FROM srs_state")
+    cursor = conn.execute('''
+        SELECT user_id, word_id, is_correct, answered_at
+        FROM results
+        ORDER BY answered_at, id
+    ''')
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        apply_answers(conn, rows)
+
+
+DUE_PAGE_SIZE = 64  # 期限順に読むときの1回の件数（出題できない単語を読み飛ばす分を見込んで N より多めに読む）
+FRESH_ATTEMPTS = 8  # まだ解いていない単語を1語選ぶのに、無作為に引き直す回数の上限
+
+
+class WordPool:
+    # 出題できる単語（重複なし）。有無の確認と無作為な抽出を、どちらも単語数によらず O(1) で行う
+    # 級・タグの絞り込みごとに1回作って使い回す（pick_session のたびに作らない）
+    def __init__(self, words):
+        self.words = list(dict.fromkeys(words))
+        self.members = frozenset(self.words)
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.members
+
+
+def _walk_due(conn, user_id, page_size):
+    # (user_id, due_at) のインデックスを期限の近い順に、(due_at, word_id) の続きから LIMIT 件ずつ読む
+    after = (float("-inf"), 0)
+    while True:
+        rows = conn.execute('''
+            SELECT w.word, s.due_at, s.word_id
+            FROM srs_state s
+            JOIN words w ON w.id = s.word_id
+            WHERE s.user_id = ? AND (s.due_at, s.word_id) > (?, ?)
+            ORDER BY s.due_at, s.word_id
+            LIMIT ?
+        ''', (user_id, after[0], after[1], page_size)).fetchall()
+        for word, due_at, _ in rows:
+            yield word, due_at
+        if len(rows) < page_size:
+            return
+        after = rows[-1][1:]
+
+
+def _has_state(conn, user_id, word):
+    return conn.execute('''
+        SELECT 1 FROM srs_state
+        WHERE user_id = ? AND word_id = (SELECT id FROM words WHERE word = ?)
+    ''', (user_id, word)).fetchone() is not None
+
+
+def pick_session(writer, username, bank_words, n, now=None, rng=random):
+    # 期限切れの単語 → まだ解いていない単語 → 期限が近い単語 の順に N 件選ぶ
+    # bank_words（WordPool か単語のリスト）に無い単語は、状態があっても選ばない（別の級・タグでの絞り込み・問題の削除）
+    # 状態は期限の近い順に出題できる N 語が見つかるまでしか読まず、まだ解いていない単語は無作為に引いて確かめるので、
+    # ユーザーの状態の件数にも問題数にもよらず、おおむね N 件分のコストで済む
+    now = time.time() if now is None else now
+    pool = bank_words if isinstance(bank_words, WordPool) else WordPool(bank_words)
+    writer.flush()
+    due = []
+    fresh = []
+    with writer.locked() as conn:
+        row = conn.execute("SELECT id FROM users WHERE name = ?", (username,)).fetchone()
+        if row is not None:
+            for word, due_at in _walk_due(conn, row[0], max(DUE_PAGE_SIZE, 2 * n)):
+                if word in pool:
+                    due.append((word, due_at))
+                    if len(due) >= n:
+                        break
+        overdue = [word for word, due_at in due if due_at <= now]
+        if len(overdue) >= n:
+            return overdue[:n]
+
+        # まだ解いていない単語を無作為に引く（解いたことのある単語・選んだ単語は引き直す）
+        chosen = {word for word, _ in due}
+        need = min(n - len(overdue), len(pool))
+        for _ in range(need * FRESH_ATTEMPTS):
+            if len(fresh) >= need:
+                break
+            word = pool.words[rng.randrange(len(pool))]
+            if word in chosen:
+                continue
+            chosen.add(word)
+            if row is None or not _has_state(conn, row[0], word):
+                fresh.append(word)
+        if len(fresh) < need:
+            # ほとんど解き終えた絞り込みでは引き当たらないので、無作為な位置から順に残りを探す
+            start = rng.randrange(len(pool))
+            for i in range(len(pool)):
+                if len(fresh) >= need:
+                    break
+                word = pool.words[(start + i) % len(pool)]
+                if word not in chosen and (row is None or not _has_state(conn, row[0], word)):
+                    chosen.add(word)
+                    fresh.append(word)
+    upcoming = [word for word, due_at in due if due_at > now]
+    return (overdue + fresh + upcoming)[:n]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import results_db
+
+    parser = argparse.ArgumentParser(description="間隔反復スケジュールの管理コマンド")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = sub.add_parser("rebuild", help="results から srs_state を作り直す")
+    rebuild_parser.add_argument("db", nargs="?", default=results_db.DB_PATH)
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        conn = results_db.connect(args.db)
+        results_db.init_db(conn)
+        with conn:
+            rebuild(conn)
+        count = conn.execute("SELECT COUNT(*) FROM srs_state").fetchone()[0]
+        print(f"srs_state を再構築しました: {count} 件")
@@ -0,0 +1,131 @@
+import abc
+import os
+import threading
+
+import pandas as pd
+
+import history_stats
+import history_store
+import results_db
+
+# 解答結果の保存先を切り替えるための共通インターフェース
+#   record_answers(answers) : answers は (ユーザー, 単語, 選んだ答え, 正解, 正誤) のリスト
+#   user_stats(username)    : word / correct_count / total_count / accuracy
+#   all_stats()             : user / word / correct_count / total_count / accuracy
+# 保存先は "sqlite:quiz_results.db"、"jsonl:user_history"、"memory:" のような文字列で指定する
+
+STATS_COLUMNS = ["word", "correct_count", "total_count", "accuracy"]
+
+
+def _stats_frame(rows, columns):
+    stats = pd.DataFrame(rows, columns=columns)
+    stats["accuracy"] = stats["correct_count"] / stats["total_count"]
+    return stats
+
+
+class Storage(abc.ABC):
+    @abc.abstractmethod
+    def record_answers(self, answers):
+        pass
+
+    @abc.abstractmethod
+    def user_stats(self, username):
+        pass
+
+    @abc.abstractmethod
+    def all_stats(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class SqliteStorage(Storage):
+    def __init__(self, path=results_db.DB_PATH, **writer_options):
+        self.writer = results_db.ResultWriter(path, **writer_options)
+
+    def record_answers(self, answers):
+        self.writer.add_many(answers)
+
+    def user_stats(self, username):
+        return results_db.load_user_stats(self.writer, username)[STATS_COLUMNS]
+
+    def all_stats(self):
+        return results_db.load_all_stats(self.writer)[["user"] + STATS_COLUMNS]
+
+    def flush(self):
+        self.writer.flush()
+
+    def close(self):
+        self.writer.close()
+
+
+class JsonlStorage(Storage):
+    def __init__(self, directory="user_history", workers=0, cache_path=None):
+        self.directory = directory
+        self.aggregator = history_stats.HistoryAggregator(directory, workers=workers, cache_path=cache_path)
+
+    def record_answers(self, answers):
+        by_user = {}
+        for user, word, selected, correct, is_correct in answers:
+            by_user.setdefault(user, []).append({"word": word, "selected": selected, "correct": bool(is_correct)})
+        for user, entries in by_user.items():
+            history_store.append(history_store.history_path(self.directory, user), entries)
+
+    def _rows(self, users=None):
+        # 変わった履歴ファイルだけを1回読み直してから集計する。users を省略すると全員分
+        self.aggregator.refresh()
+        if users is None:
+            users = self.aggregator.users()
+        return [
+            (user, word, corrects, attempts)
+            for user in users if user in self.aggregator.partials
+            for word, (attempts, corrects) in self.aggregator.partials[user][1].items()
+        ]
+
+    def user_stats(self, username):
+        rows = [row[1:] for row in self._rows([username])]
+        return _stats_frame(rows, ["word", "correct_count", "total_count"])
+
+    def all_stats(self):
+        return _stats_frame(self._rows(), ["user", "word", "correct_count", "total_count"])
+
+
+class MemoryStorage(Storage):
+    def __init__(self):
+        self.lock = threading.Lock()
+        # ユーザー → {単語: (正解数, 出題数)}
+        self.counts = {}
+
+    def record_answers(self, answers):
+        with self.lock:
+            for user, word, selected, correct, is_correct in answers:
+                words = self.counts.setdefault(user, {})
+                correct_count, total_count = words.get(word, (0, 0))
+                words[word] = (correct_count + int(is_correct), total_count + 1)
+
+    def user_stats(self, username):
+        with self.lock:
+            rows = [(word, c, t) for word, (c, t) in self.counts.get(username, {}).items()]
+        return _stats_frame(rows, ["word", "correct_count", "total_count"])
+
+    def all_stats(self):
+        with self.lock:
+            rows = [(user, word, c, t) for user, words in self.counts.items() for word, (c, t) in words.items()]
+        return _stats_frame(rows, ["user", "word", "correct_count", "total_count"])
+
+
+def open_storage(url, **options):
+    kind, _, location = url.partition(":")
+    if kind == "sqlite":
+        return SqliteStorage(location or results_db.DB_PATH, **options)
+    if kind == "jsonl":
+        location = location or "user_history"
+        options.setdefault("cache_path", os.path.join(location, ".aggregate_cache.json"))
+        return JsonlStorage(location, **options)
+    if kind == "memory":
+        return MemoryStorage()
+    raise ValueError(f"不明な保存先です: {url}")
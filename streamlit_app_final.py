@@ -1,57 +1,47 @@
 import streamlit as st
-import pandas as pd
-import random
-import os
-import sqlite3
-from datetime import datetime
+import functools
+import question_bank
+import bank_manager
+import quiz_generator
+import results_db
+import weighting
 
 st.set_page_config(page_title="英単語クイズ", layout="centered")
 
-@st.cache_data
-def load_data():
-    return pd.read_csv("words.csv")
+@st.cache_resource
+def get_banks():
+    # 問題バンクの版の管理（words.csv が更新されたら、再起動しなくても新しいクイズから新しい版を使う）
+    return bank_manager.BankManager("words.csv")
+
+def load_bank(version=None):
+    # version を渡すとクイズを作ったときの版を返す（解いている途中に CSV が更新されても問題が変わらない）
+    return get_banks().get(version)
+
+@st.cache_data(max_entries=4)
+def load_data(version):
+    return load_bank(version).frame
+
+def load_store(version=None):
+    # 問題ID → 行。セッションには問題IDだけを置き、行はここから必要なときに引く
+    return load_bank(version).store
+
+def load_rendered(version=None):
+    # 問題ID → 選択肢リストと表示用 HTML（版ごとに1回だけ作り、再実行時は辞書を引くだけにする）
+    return load_bank(version).rendered
+
+@st.cache_resource
+def get_writer():
+    # プロセス内で共有する書き込み用接続（起動時に1回だけ作成）
+    return results_db.ResultWriter(results_db.DB_PATH)
 
 def init_db():
-    conn = sqlite3.connect("quiz_results.db")
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS results (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT,
-            timestamp TEXT,
-            word TEXT,
-            selected TEXT,
-            correct TEXT,
-            is_correct INTEGER
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    get_writer()
 
 def save_result(user, word, selected, correct, is_correct):
-    conn = sqlite3.connect("quiz_results.db")
-    cursor = conn.cursor()
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    cursor.execute('''
-        INSERT INTO results (username, timestamp, word, selected, correct, is_correct)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (user, timestamp, word, selected, correct, int(is_correct)))
-    conn.commit()
-    conn.close()
+    get_writer().add(user, word, selected, correct, is_correct)
 
 def load_user_stats(username):
-    conn = sqlite3.connect("quiz_results.db")
-    query = '''
-        SELECT word, SUM(is_correct) AS correct_count, COUNT(*) AS total_count
-        FROM results
-        WHERE username = ?
-        GROUP BY word
-    '''
-    stats = pd.read_sql_query(query, conn, params=(username,))
-    conn.close()
-    if not stats.empty:
-        stats["accuracy"] = stats["correct_count"] / stats["total_count"]
-    return stats
+    return results_db.load_user_stats(get_writer(), username)
 
 init_db()
 
@@ -60,32 +50,46 @@ for key, value in {
     "page": "start",
     "quiz": [],
     "current_q_idx": 0,
-    "user_answers": [],
+    "user_answers": bytearray(),
     "answered": False,
     "username": "",
-    "selected_choice": None
+    "selected_choice": None,
+    "choice_orders": [],
+    "bank_version": None
 }.items():
     if key not in st.session_state:
         st.session_state[key] = value
+if "rng" not in st.session_state:
+    st.session_state.rng = question_bank.new_session_rng()
 
 # スタートページ
 if st.session_state.page == "start":
     st.title("📝 英単語クイズ")
     st.session_state.username = st.text_input("あなたの名前を入力してください：", value=st.session_state.username)
     num_questions = st.slider("出題する問題数を選んでください", min_value=1, max_value=50, value=10)
+    low_score_percent = st.slider("この正答率（%）未満の単語を多めに出題する", min_value=0, max_value=100,
+                                  value=int(weighting.LOW_SCORE_THRESHOLD * 100), step=5)
 
     if st.button("スタート") and st.session_state.username.strip():
-        df = load_data()
+        version = load_bank().version
+        df = load_data(version)
         stats = load_user_stats(st.session_state.username)
 
-        if not stats.empty:
-            low_score_words = stats[stats["accuracy"] < 0.5]["word"].tolist()
-            df = df[df["answer"].isin(low_score_words + df["answer"].tolist())]
-
-        quiz = df.sample(frac=1).head(num_questions).to_dict(orient="records")
+        if stats.empty:
+            # 全件をシャッフルせず、必要な問題数だけ選ぶ
+            positions = quiz_generator.sample_positions(st.session_state.rng, len(df), num_questions)
+        else:
+            # 苦手な単語の重みを上げて、重複なしで選ぶ
+            weights = weighting.compute_weights(df["answer"], stats, functools.partial(
+                weighting.low_score_weight, threshold=low_score_percent / 100
+            ))
+            positions = quiz_generator.weighted_positions(st.session_state.rng, weights, num_questions)
+        quiz = question_bank.quiz_ids(df["id"].to_numpy()[positions].tolist())
         st.session_state.quiz = quiz
+        st.session_state.bank_version = version
+        st.session_state.choice_orders = question_bank.choice_orders(st.session_state.rng, load_rendered(version), quiz)
         st.session_state.current_q_idx = 0
-        st.session_state.user_answers = []
+        st.session_state.user_answers = bytearray()
         st.session_state.page = "quiz"
         st.session_state.answered = False
         st.session_state.selected_choice = None
@@ -95,16 +99,15 @@ if st.session_state.page == "start":
 elif st.session_state.page == "quiz":
     quiz = st.session_state.quiz
     current_idx = st.session_state.current_q_idx
-    current_q = quiz[current_idx]
+    current_q = load_store(st.session_state.bank_version)[quiz[current_idx]]
+    rendered = load_rendered(st.session_state.bank_version)[quiz[current_idx]]
 
     percent_complete = int((current_idx + 1) / len(quiz) * 100)
     st.progress((current_idx + 1) / len(quiz), text=f"進捗: {percent_complete}%")
 
-    st.markdown(f"<b>Q{current_idx + 1}:</b><br>{current_q['sentence_with_blank'].replace(chr(10), '<br>')}", unsafe_allow_html=True)
+    st.markdown(f"<b>Q{current_idx + 1}:</b><br>{rendered['sentence_html']}", unsafe_allow_html=True)
 
-    choices = current_q["choices"].split("|")
-    random.seed(current_idx)
-    choices = random.sample(choices, len(choices))
+    choices = question_bank.ordered_choices(rendered, st.session_state.choice_orders[current_idx])
 
     selected = st.session_state.get("selected_choice", None)
     cols = st.columns(2)
@@ -117,7 +120,9 @@ elif st.session_state.page == "quiz":
         if st.button("✅ 解答する"):
             correct = current_q["answer"]
             is_correct = (selected == correct)
-            st.session_state.user_answers.append({"selected": selected, "correct": correct})
+            st.session_state.user_answers.append(
+                question_bank.encode_answer(rendered["choices"], selected, is_correct)
+            )
             save_result(st.session_state.username, correct, selected, correct, is_correct)
             st.session_state.answered = True
             st.rerun()
@@ -129,8 +134,8 @@ elif st.session_state.page == "quiz":
         else:
             st.error(f"✖ 不正解... 正解は {correct}")
         st.markdown(f"**意味：** {current_q['meaning_jp']}")
-        if pd.notna(current_q['sentence_jp']):
-            st.markdown(f"**和訳：** {current_q['sentence_jp'].replace(chr(10), '<br>')}", unsafe_allow_html=True)
+        if rendered["translation_html"] is not None:
+            st.markdown(f"**和訳：** {rendered['translation_html']}", unsafe_allow_html=True)
 
         if st.button("➡ 次の問題へ"):
             st.session_state.current_q_idx += 1
@@ -143,20 +148,25 @@ elif st.session_state.page == "quiz":
 # 復習・結果画面
 elif st.session_state.page == "review":
     st.title("📊 結果と復習")
-    score = sum(1 for ans in st.session_state.user_answers if ans["selected"] == ans["correct"])
+    score = sum(1 for code in st.session_state.user_answers if code & question_bank.CORRECT_FLAG)
     total = len(st.session_state.user_answers)
     st.markdown(f"### 正解数： {score} / {total}")
 
     st.markdown("---")
     st.markdown("### ❗ 復習（間違えた問題）")
-    for i, (q, ans) in enumerate(zip(st.session_state.quiz, st.session_state.user_answers)):
-        if ans["selected"] != ans["correct"]:
+    rendered_questions = load_rendered(st.session_state.bank_version)
+    store = load_store(st.session_state.bank_version)
+    for i, (qid, code) in enumerate(zip(st.session_state.quiz, st.session_state.user_answers)):
+        rendered = rendered_questions[qid]
+        selected, is_correct = question_bank.decode_answer(rendered["choices"], code)
+        if not is_correct:
+            q = store[qid]
             st.markdown(f"**Q{i+1}:** {q['sentence_with_blank']}")
-            st.markdown(f"- あなたの答え: {ans['selected']}")
-            st.markdown(f"- 正解: **{ans['correct']}**")
+            st.markdown(f"- あなたの答え: {selected}")
+            st.markdown(f"- 正解: **{q['answer']}**")
             st.markdown(f"- 意味: {q['meaning_jp']}")
-            if pd.notna(q['sentence_jp']):
-                st.markdown(f"- 和訳: {q['sentence_jp'].replace(chr(10), '<br>')}", unsafe_allow_html=True)
+            if rendered["translation_html"] is not None:
+                st.markdown(f"- 和訳: {rendered['translation_html']}", unsafe_allow_html=True)
 
     if st.button("🔁 もう一度挑戦"):
         for key in ["page", "quiz", "user_answers", "current_q_idx", "answered", "selected_choice"]:
@@ -1,12 +1,29 @@
 import streamlit as st
-import pandas as pd
-import random
+import question_bank
+import bank_manager
 
 st.set_page_config(page_title="英単語クイズ", layout="centered")
 
-@st.cache_data
-def load_data():
-    return pd.read_csv("words.csv")
+@st.cache_resource
+def get_banks():
+    # 問題バンクの版の管理（words.csv が更新されたら、再起動しなくても新しいクイズから新しい版を使う）
+    return bank_manager.BankManager("words.csv")
+
+def load_bank(version=None):
+    # version を渡すとクイズを作ったときの版を返す（解いている途中に CSV が更新されても問題が変わらない）
+    return get_banks().get(version)
+
+def load_index(version=None):
+    # 出題用インデックス（問題IDの配列と絞り込み用ビットマップ）
+    return load_bank(version).index
+
+def load_store(version=None):
+    # 問題ID → 行。セッションには問題IDだけを置き、行はここから必要なときに引く
+    return load_bank(version).store
+
+def load_rendered(version=None):
+    # 問題ID → 選択肢リストと表示用 HTML（版ごとに1回だけ作り、再実行時は辞書を引くだけにする）
+    return load_bank(version).rendered
 
 # セッション状態初期化
 if "page" not in st.session_state:
@@ -16,9 +33,15 @@ if "quiz" not in st.session_state:
 if "current_q_idx" not in st.session_state:
     st.session_state.current_q_idx = 0
 if "user_answers" not in st.session_state:
-    st.session_state.user_answers = []
+    st.session_state.user_answers = bytearray()
 if "answered" not in st.session_state:
     st.session_state.answered = False
+if "rng" not in st.session_state:
+    st.session_state.rng = question_bank.new_session_rng()
+if "bank_version" not in st.session_state:
+    st.session_state.bank_version = None
+if "choice_orders" not in st.session_state:
+    st.session_state.choice_orders = []
 
 # スタート画面
 if st.session_state.page == "start":
@@ -26,11 +49,13 @@ if st.session_state.page == "start":
     num_questions = st.slider("出題する問題数を選んでください", min_value=1, max_value=50, value=10)
 
     if st.button("スタート"):
-        df = load_data()
-        quiz = df.sample(frac=1).head(num_questions).to_dict(orient="records")
+        version = load_bank().version
+        quiz = question_bank.quiz_ids(load_index(version).sample(num_questions, st.session_state.rng))
         st.session_state.quiz = quiz
+        st.session_state.bank_version = version
+        st.session_state.choice_orders = question_bank.choice_orders(st.session_state.rng, load_rendered(version), quiz)
         st.session_state.current_q_idx = 0
-        st.session_state.user_answers = []
+        st.session_state.user_answers = bytearray()
         st.session_state.page = "quiz"
         st.session_state.answered = False
         st.rerun()
@@ -39,7 +64,8 @@ if st.session_state.page == "start":
 elif st.session_state.page == "quiz":
     quiz = st.session_state.quiz
     current_idx = st.session_state.current_q_idx
-    current_q = quiz[current_idx]
+    current_q = load_store(st.session_state.bank_version)[quiz[current_idx]]
+    rendered = load_rendered(st.session_state.bank_version)[quiz[current_idx]]
 
     # 進捗バー（上部）
     st.progress((current_idx + 1) / len(quiz))
@@ -52,21 +78,21 @@ elif st.session_state.page == "quiz":
             background-color:rgba(240, 248, 255, 0.7); 
             color:inherit;
         '>
-            <b>Q{current_idx + 1}:</b><br>{current_q['sentence_with_blank'].replace(chr(10), '<br>')}
+            <b>Q{current_idx + 1}:</b><br>{rendered['sentence_html']}
         </div>
         """, unsafe_allow_html=True)
 
     # 選択肢の表示（シャッフル）
-    choices = current_q["choices"].split("|")
-    random.seed(current_idx)  # 再現性のため
-    choices = random.sample(choices, len(choices))
+    choices = question_bank.ordered_choices(rendered, st.session_state.choice_orders[current_idx])
 
     selected = st.radio("選択肢を選んでください：", choices, key=f"answer_{current_idx}")
 
     # 解答ボタン（未回答時のみ表示）
     if not st.session_state.answered and st.button("✅ 解答する"):
         correct = current_q["answer"]
-        st.session_state.user_answers.append({"selected": selected, "correct": correct})
+        st.session_state.user_answers.append(
+            question_bank.encode_answer(rendered["choices"], selected, selected == correct)
+        )
         st.session_state.answered = True
 
         if selected == correct:
@@ -79,10 +105,8 @@ elif st.session_state.page == "quiz":
 
         # 解説
         st.markdown(f"**意味：** {current_q['meaning_jp']}")
-        sentence_jp = current_q['sentence_jp']
-        if pd.notna(sentence_jp):
-            sentence_jp = sentence_jp.replace("\n", "<br>")
-            st.markdown(f"**和訳：** {sentence_jp}", unsafe_allow_html=True)
+        if rendered["translation_html"] is not None:
+            st.markdown(f"**和訳：** {rendered['translation_html']}", unsafe_allow_html=True)
         else:
             st.markdown("**和訳：** （和訳なし）")
 
@@ -100,26 +124,31 @@ elif st.session_state.page == "quiz":
 # 結果画面
 elif st.session_state.page == "review":
     st.title("📊 結果と復習")
-    score = sum(1 for ans in st.session_state.user_answers if ans["selected"] == ans["correct"])
+    score = sum(1 for code in st.session_state.user_answers if code & question_bank.CORRECT_FLAG)
     total = len(st.session_state.user_answers)
     st.markdown(f"### 正解数： {score} / {total}")
 
     # 間違えた問題
     st.markdown("---")
     st.markdown("### ❗ 復習（間違えた問題）")
-    for i, (q, ans) in enumerate(zip(st.session_state.quiz, st.session_state.user_answers)):
-        if ans["selected"] != ans["correct"]:
+    rendered_questions = load_rendered(st.session_state.bank_version)
+    store = load_store(st.session_state.bank_version)
+    for i, (qid, code) in enumerate(zip(st.session_state.quiz, st.session_state.user_answers)):
+        rendered = rendered_questions[qid]
+        selected, is_correct = question_bank.decode_answer(rendered["choices"], code)
+        if not is_correct:
+            q = store[qid]
             st.markdown(f"**Q{i+1}:** {q['sentence_with_blank']}")
-            st.markdown(f"- あなたの答え: {ans['selected']}")
-            st.markdown(f"- 正解: **{ans['correct']}**")
+            st.markdown(f"- あなたの答え: {selected}")
+            st.markdown(f"- 正解: **{q['answer']}**")
             st.markdown(f"- 意味: {q['meaning_jp']}")
-            if pd.notna(q['sentence_jp']):
-                st.markdown(f"- 和訳: {q['sentence_jp'].replace(chr(10), '<br>')}", unsafe_allow_html=True)
+            if rendered["translation_html"] is not None:
+                st.markdown(f"- 和訳: {rendered['translation_html']}", unsafe_allow_html=True)
 
     if st.button("🔁 もう一度挑戦"):
         st.session_state.page = "start"
         st.session_state.quiz = []
-        st.session_state.user_answers = []
+        st.session_state.user_answers = bytearray()
         st.session_state.current_q_idx = 0
         st.session_state.answered = False
         st.rerun()
@@ -1,45 +1,55 @@
 
 import streamlit as st
 import pandas as pd
-import random
 import json
 import os
-import plotly.express as px
+import question_bank
+import bank_manager
+import history_store
+import quiz_grading
 
 MISTAKE_FILE = "last_mistakes.json"
-HISTORY_FILE = "answer_history.json"
+HISTORY_FILE = "answer_history.jsonl"
 
 def save_mistakes(mistakes):
+    # mistakes は間違えた問題のIDのリスト
     with open(MISTAKE_FILE, "w", encoding="utf-8") as f:
         json.dump(mistakes, f, ensure_ascii=False, indent=2)
 
 def load_mistakes():
     if os.path.exists(MISTAKE_FILE):
         with open(MISTAKE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+            mistakes = json.load(f)
+        # 以前の形式（行の辞書のリスト）は問題IDに読み替える
+        return [m.get("id") if isinstance(m, dict) else m for m in mistakes]
     return []
 
-def append_history(entries):
-    history = []
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            history = json.load(f)
-    history.extend(entries)
-    with open(HISTORY_FILE, "w", encoding="utf-8") as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
+def append_history(entries, quiz_id=None):
+    # 同じ quiz_id のクイズが追記済みなら何もせず False を返す
+    return history_store.append(HISTORY_FILE, entries, quiz_id)
 
 def load_history():
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return []
+    return history_store.load_records(HISTORY_FILE)
+
+@st.cache_resource
+def get_banks():
+    # 問題バンクの版の管理（words.csv が更新されたら、再起動しなくても新しいクイズから新しい版を使う）
+    return bank_manager.BankManager("words.csv")
+
+def load_bank(version=None):
+    # version を渡すとクイズを作ったときの版を返す（解いている途中に CSV が更新されても問題が変わらない）
+    return get_banks().get(version)
 
-@st.cache_data
-def load_data():
-    df = pd.read_csv("words.csv", encoding="utf-8-sig")
-    return df
+def load_store(version=None):
+    # 問題ID → 行。セッションには問題IDだけを置き、行はここから必要なときに引く
+    return load_bank(version).store
 
-df = load_data()
+def load_rendered(version=None):
+    # 問題ID → 選択肢リストと表示用 HTML（版ごとに1回だけ作り、再実行時は辞書を引くだけにする）
+    return load_bank(version).rendered
+
+if "rng" not in st.session_state:
+    st.session_state.rng = question_bank.new_session_rng()
 
 st.title("📘 英検単語クイズ（復習・正答率付き）")
 
@@ -58,6 +68,9 @@ if mode == "正答率グラフを見る":
         summary["accuracy"] = (summary["corrects"] / summary["attempts"] * 100).round(1)
         st.dataframe(summary.sort_values("accuracy"))
 
+        # plotly は重いので、このページを開いたときに初めて読み込む
+        import plotly.express as px
+
         fig = px.bar(
             summary.sort_values("accuracy"),
             x="accuracy",
@@ -70,14 +83,15 @@ if mode == "正答率グラフを見る":
     st.stop()
 
 # --- クイズ or 復習モード ---
+version = load_bank().version
 if mode == "復習モード":
-    mistakes = load_mistakes()
+    mistakes = [qid for qid in load_mistakes() if qid in load_store(version)]
     if not mistakes:
         st.warning("復習する問題はありません。")
         st.stop()
-    quiz_base = pd.DataFrame(mistakes)
+    quiz_base = mistakes
 else:
-    quiz_base = df.copy()
+    quiz_base = load_store(version).ids
 
 max_questions = len(quiz_base)
 if max_questions == 0:
@@ -90,53 +104,54 @@ else:
     quiz_size = st.slider("出題数を選んでください", 1, max_questions, min(5, max_questions), key="quiz_size_slider")
 
 if st.button("▶ クイズを始める"):
-    selected = quiz_base.sample(quiz_size).to_dict(orient="records")
-    for q in selected:
-        q["shuffled_choices"] = random.sample(q["choices"].split("|"), 4)
-    st.session_state["quiz"] = selected
-    st.session_state["answers"] = {}
+    quiz = question_bank.quiz_ids(st.session_state.rng.sample(quiz_base, quiz_size))
+    st.session_state["quiz"] = quiz
+    st.session_state["bank_version"] = version
+    st.session_state["choice_orders"] = question_bank.choice_orders(st.session_state.rng, load_rendered(version), quiz)
+    st.session_state["answers"] = bytearray(len(quiz))
+    st.session_state["quiz_id"] = quiz_grading.new_quiz_id()
     st.session_state["mode"] = mode
 
 if "quiz" in st.session_state:
     st.subheader("📝 問題")
+    store = load_store(st.session_state.get("bank_version"))
+    rendered_questions = load_rendered(st.session_state.get("bank_version"))
 
-    for i, q in enumerate(st.session_state["quiz"]):
+    for i, qid in enumerate(st.session_state["quiz"]):
+        q = store[qid]
+        rendered = rendered_questions[qid]
         st.markdown(f"**Q{i+1}: {q['sentence_with_blank']}**")
         user_answer = st.radio(
             f"選択肢を選んでください - Q{i+1}",
-            q["shuffled_choices"],
+            question_bank.ordered_choices(rendered, st.session_state["choice_orders"][i]),
             key=f"answer_{i}"
         )
-        st.session_state["answers"][i] = user_answer
+        st.session_state["answers"][i] = question_bank.encode_answer(rendered["choices"], user_answer)
 
     if st.button("✅ 答え合わせ"):
-        score = 0
-        new_mistakes = []
-        history_log = []
-
+        graded = st.session_state.get("graded")
+        if graded is None or graded.quiz_id != st.session_state.get("quiz_id"):
+            # クイズ全体をまとめて採点する（答えを変えて押し直しても、最初の答え合わせの結果を使う）
+            graded = quiz_grading.grade(
+                st.session_state.get("quiz_id"), st.session_state["quiz"], st.session_state["answers"],
+                store, rendered_questions
+            )
+            st.session_state["graded"] = graded
+        # 同じクイズの2回目（ダブルクリック・押し直し）は履歴に追記しない
+        if append_history(graded.history_records(), graded.quiz_id):
+            save_mistakes(graded.mistakes)
+
+    graded = st.session_state.get("graded")
+    if graded is not None and graded.quiz_id == st.session_state.get("quiz_id"):
         st.subheader("📊 結果")
 
-        for i, q in enumerate(st.session_state["quiz"]):
-            correct = q["correct"]
-            user = st.session_state["answers"].get(i, "")
-            is_correct = user == correct
-
+        for i, qid, user, correct, is_correct in graded.items():
+            q = store[qid]
             st.markdown(f"**Q{i+1}: {q['sentence_with_blank']}**")
             st.write(f"あなたの答え: {user} → {'✅ 正解' if is_correct else f'❌ 不正解（正解は: {correct}）'}")
             st.write(f"意味: {q['meaning_jp']}")
-            st.write(f"和訳: {q['sentence_jp']}")
+            if q["has_translation"]:
+                st.write(f"和訳: {q['sentence_jp']}")
             st.markdown("---")
 
-            history_log.append({
-                "word": q["word"],
-                "correct": is_correct
-            })
-
-            if not is_correct:
-                new_mistakes.append(q)
-            else:
-                score += 1
-
-        st.success(f"あなたのスコア: {score} / {len(st.session_state['quiz'])}")
-        save_mistakes(new_mistakes)
-        append_history(history_log)
+        st.success(f"あなたのスコア: {graded.score} / {graded.total}")
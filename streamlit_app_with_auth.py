@@ -1,30 +1,52 @@
 
 import streamlit as st
 import pandas as pd
-import random
+import copy
 import json
 import os
 import streamlit_authenticator as stauth
+import credential_store
+import question_bank
+import bank_manager
+import history_store
+import quiz_grading
 
 # --- 初期設定 ---
 USER_HISTORY_DIR = "user_history"
 
-# --- 正しいユーザー情報形式 ---
-usernames = ["student1", "student2", "student3"]
-names = ["Student One", "Student Two", "Student Three"]
-passwords = ["1234", "1234", "1234"]  # 仮パスワード（本番ではハッシュ保存）
+@st.cache_resource
+def get_banks():
+    # 問題バンクの版の管理（words.csv が更新されたら、再起動しなくても新しいクイズから新しい版を使う）
+    return bank_manager.BankManager("words.csv")
 
-hashed_passwords = stauth.Hasher(passwords).generate()
+def load_bank(version=None):
+    # version を渡すとクイズを作ったときの版を返す（解いている途中に CSV が更新されても問題が変わらない）
+    return get_banks().get(version)
 
-credentials = {
-    "usernames": {
-        username: {
-            "name": name,
-            "password": hashed
-        }
-        for username, name, hashed in zip(usernames, names, hashed_passwords)
-    }
-}
+def load_store(version=None):
+    # 問題ID → 行。セッションには問題IDだけを置き、行はここから必要なときに引く
+    return load_bank(version).store
+
+def load_rendered(version=None):
+    # 問題ID → 選択肢リストと表示用 HTML（版ごとに1回だけ作り、再実行時は辞書を引くだけにする）
+    return load_bank(version).rendered
+
+# --- ユーザー情報 ---
+# ユーザーは `python credential_store.py add` / `import` で登録する（パスワードは登録時にハッシュ化される）
+# まだ誰も登録されていないときだけ、以下の仮ユーザーを登録する
+DEMO_USERS = [
+    ("student1", "Student One", "1234"),
+    ("student2", "Student Two", "1234"),
+    ("student3", "Student Three", "1234"),
+]
+
+@st.cache_resource
+def load_credentials():
+    # ハッシュ済みのユーザー情報をプロセスで1回だけ読み込む（再実行のたびに bcrypt しない）
+    return credential_store.load_credentials(credential_store.CREDENTIALS_PATH, defaults=DEMO_USERS)
+
+# streamlit_authenticator が書き換えてもキャッシュに影響しないようにコピーを渡す
+credentials = copy.deepcopy(load_credentials())
 
 authenticator = stauth.Authenticate(
     credentials,
@@ -45,11 +67,9 @@ elif authentication_status:
 
     st.title("📘 英検単語クイズ")
 
-    df = pd.read_csv("words.csv", encoding="utf-8-sig")
-
     # 履歴ファイルの準備
     os.makedirs(USER_HISTORY_DIR, exist_ok=True)
-    history_path = os.path.join(USER_HISTORY_DIR, f"{username}_history.json")
+    history_path = history_store.history_path(USER_HISTORY_DIR, username)
     mistake_path = os.path.join(USER_HISTORY_DIR, f"{username}_mistakes.json")
 
     def load_json(filepath):
@@ -65,7 +85,7 @@ elif authentication_status:
     mode = st.radio("モードを選択してください", ["クイズを解く", "復習モード", "正答率グラフを見る"])
 
     if mode == "正答率グラフを見る":
-        history = pd.DataFrame(load_json(history_path))
+        history = pd.DataFrame(history_store.load_records(history_path))
         if history.empty:
             st.info("まだ履歴がありません。クイズを解いてください。")
         else:
@@ -78,14 +98,17 @@ elif authentication_status:
             st.bar_chart(data=summary.set_index("word")[["accuracy"]])
         st.stop()
 
-    elif mode == "復習モード":
-        mistakes = load_json(mistake_path)
+    version = load_bank().version
+    if mode == "復習モード":
+        # 間違えた問題のIDのリスト（以前の形式の行の辞書は問題IDに読み替える）
+        mistakes = [m.get("id") if isinstance(m, dict) else m for m in load_json(mistake_path)]
+        mistakes = [qid for qid in mistakes if qid in load_store(version)]
         if not mistakes:
             st.warning("復習する問題はありません。")
             st.stop()
-        quiz_base = pd.DataFrame(mistakes)
+        quiz_base = mistakes
     else:
-        quiz_base = df.copy()
+        quiz_base = load_store(version).ids
 
     if len(quiz_base) == 0:
         st.error("出題できる問題がありません。")
@@ -93,54 +116,57 @@ elif authentication_status:
 
     quiz_size = st.slider("出題数を選んでください", 1, len(quiz_base), min(5, len(quiz_base)), key="quiz_size_slider")
 
+    if "rng" not in st.session_state:
+        st.session_state.rng = question_bank.new_session_rng()
+
     if st.button("▶ クイズを始める"):
-        selected = quiz_base.sample(quiz_size).to_dict(orient="records")
-        for q in selected:
-            q["shuffled_choices"] = random.sample(q["choices"].split("|"), 4)
-        st.session_state["quiz"] = selected
-        st.session_state["answers"] = {}
+        quiz = question_bank.quiz_ids(st.session_state.rng.sample(quiz_base, quiz_size))
+        st.session_state["quiz"] = quiz
+        st.session_state["bank_version"] = version
+        st.session_state["choice_orders"] = question_bank.choice_orders(st.session_state.rng, load_rendered(version), quiz)
+        st.session_state["answers"] = bytearray(len(quiz))
+        st.session_state["quiz_id"] = quiz_grading.new_quiz_id()
 
     if "quiz" in st.session_state:
         st.subheader("📝 問題")
+        store = load_store(st.session_state.get("bank_version"))
+        rendered_questions = load_rendered(st.session_state.get("bank_version"))
 
-        for i, q in enumerate(st.session_state["quiz"]):
+        for i, qid in enumerate(st.session_state["quiz"]):
+            q = store[qid]
+            rendered = rendered_questions[qid]
             st.markdown(f"**Q{i+1}: {q['sentence_with_blank']}**")
             user_answer = st.radio(
                 f"選択肢を選んでください - Q{i+1}",
-                q["shuffled_choices"],
+                question_bank.ordered_choices(rendered, st.session_state["choice_orders"][i]),
                 key=f"answer_{i}"
             )
-            st.session_state["answers"][i] = user_answer
+            st.session_state["answers"][i] = question_bank.encode_answer(rendered["choices"], user_answer)
 
         if st.button("✅ 答え合わせ"):
-            score = 0
-            new_mistakes = []
-            history_log = []
-
+            graded = st.session_state.get("graded")
+            if graded is None or graded.quiz_id != st.session_state.get("quiz_id"):
+                # クイズ全体をまとめて採点する（答えを変えて押し直しても、最初の答え合わせの結果を使う）
+                graded = quiz_grading.grade(
+                    st.session_state.get("quiz_id"), st.session_state["quiz"], st.session_state["answers"],
+                    store, rendered_questions
+                )
+                st.session_state["graded"] = graded
+            # 同じクイズの2回目（ダブルクリック・押し直し）は履歴に追記しない
+            if history_store.append(history_path, graded.history_records(), graded.quiz_id):
+                save_json(mistake_path, graded.mistakes)
+
+        graded = st.session_state.get("graded")
+        if graded is not None and graded.quiz_id == st.session_state.get("quiz_id"):
             st.subheader("📊 結果")
 
-            for i, q in enumerate(st.session_state["quiz"]):
-                correct = q["correct"]
-                user = st.session_state["answers"].get(i, "")
-                is_correct = user == correct
-
+            for i, qid, user, correct, is_correct in graded.items():
+                q = store[qid]
                 st.markdown(f"**Q{i+1}: {q['sentence_with_blank']}**")
                 st.write(f"あなたの答え: {user} → {'✅ 正解' if is_correct else f'❌ 不正解（正解は: {correct}）'}")
                 st.write(f"意味: {q['meaning_jp']}")
-                st.write(f"和訳: {q['sentence_jp']}")
+                if q["has_translation"]:
+                    st.write(f"和訳: {q['sentence_jp']}")
                 st.markdown("---")
 
-                history_log.append({
-                    "word": q["word"],
-                    "correct": is_correct
-                })
-
-                if not is_correct:
-                    new_mistakes.append(q)
-                else:
-                    score += 1
-
-            st.success(f"あなたのスコア: {score} / {len(st.session_state['quiz'])}")
-            prev_history = load_json(history_path)
-            save_json(history_path, prev_history + history_log)
-            save_json(mistake_path, new_mistakes)
+            st.success(f"あなたのスコア: {graded.score} / {graded.total}")
@@ -0,0 +1,69 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+# 復習モードの出題重みを計算する
+# 単語ごとの集計（load_user_stats の結果）を1回だけ突き合わせ、NumPy配列でまとめて計算する
+
+MIN_WEIGHT = 0.1
+RECENCY_DAYS = 7.0  # この日数以上解いていない単語は重み1.0
+LOW_SCORE_THRESHOLD = 0.5  # これ未満の正答率の単語を苦手とみなす
+LOW_SCORE_BOOST = 4.0  # 苦手な単語を何倍出やすくするか
+
+
+def accuracy_weight(correct, total, last, seen, now):
+    # 正答率が低いほど重くする（従来の 1 - 正答率 と同じ）
+    accuracy = np.divide(correct, total, out=np.zeros(len(total)), where=total > 0)
+    return np.where(seen, np.maximum(MIN_WEIGHT, 1.0 - accuracy), 1.0)
+
+
+def recency_weight(correct, total, last, seen, now):
+    # 最後に解いてから時間がたった単語ほど重くする
+    days = (now - last) / 86400.0
+    return np.where(seen, np.clip(days / RECENCY_DAYS, MIN_WEIGHT, 1.0), 1.0)
+
+
+def attempts_weight(correct, total, last, seen, now):
+    # 出題回数が少ない単語ほど重くする
+    return np.where(seen, np.maximum(MIN_WEIGHT, 1.0 / (1.0 + total)), 1.0)
+
+
+def low_score_weight(correct, total, last, seen, now, threshold=LOW_SCORE_THRESHOLD, boost=LOW_SCORE_BOOST):
+    # 正答率がしきい値未満の単語だけを boost 倍にする（しきい値を変えるときは functools.partial で渡す）
+    accuracy = np.divide(correct, total, out=np.zeros(len(total)), where=total > 0)
+    return np.where(seen & (accuracy < threshold), boost, 1.0)
+
+
+WEIGHT_FUNCTIONS = {
+    "accuracy": accuracy_weight,
+    "recency": recency_weight,
+    "attempts": attempts_weight,
+    "low_score": low_score_weight,
+}
+
+
+def compute_weights(words, stats, method="accuracy", now=None):
+    weight_fn = WEIGHT_FUNCTIONS[method] if isinstance(method, str) else method
+    words = pd.Index(words)
+    if now is None:
+        now = time.time()
+
+    # 問題ごとに stats の行位置を引く（未出題は -1）
+    positions = pd.Index(stats["word"]).get_indexer(words) if len(stats) else np.full(len(words), -1)
+    seen = positions >= 0
+    safe = np.where(seen, positions, 0)
+
+    def column(name):
+        if name not in stats or not len(stats):
+            return np.zeros(len(words))
+        values = stats[name].to_numpy(dtype=float)
+        return np.where(seen, values[safe], 0.0)
+
+    return weight_fn(
+        column("correct_count"),
+        column("total_count"),
+        column("last_answered_at"),
+        seen,
+        now,
+    )